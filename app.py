@@ -1,59 +1,101 @@
 import streamlit as st
 import pandas as pd
-import json
 from pathlib import Path
+from src import dashboard_data
 
 st.set_page_config(page_title="Dashboard Cambial", page_icon="💱", layout="wide")
 
 st.title("💱 Dashboard de Cotações Cambiais com LLM")
 st.markdown("Pipeline **raw → silver → gold** com enriquecimento via LLM.")
 
+gold_path = Path("data/gold")
+MAX_POINTS = 500
+
 # ============================
-# Carregar dados do gold
+# Camada de dados com cache
 # ============================
-gold_path = Path("data/gold")
+# Todas as leituras recebem a assinatura do gold (mtime/tamanho dos arquivos):
+# interações com widgets reaproveitam o cache; arquivos novos o invalidam.
+@st.cache_data(show_spinner=False)
+def cached_currencies(signature):
+    return dashboard_data.available_currencies(gold_path)
+
+@st.cache_data(show_spinner=False)
+def cached_bounds(signature):
+    return dashboard_data.date_bounds(gold_path)
+
+@st.cache_data(show_spinner=False)
+def cached_rates(signature, currencies, start, end):
+    return dashboard_data.load_rates(gold_path, list(currencies), start, end)
 
-# Carrega todos os arquivos Parquet
-parquet_files = sorted(gold_path.glob("*.parquet"))
-if parquet_files:
-    dfs = [pd.read_parquet(f) for f in parquet_files]
-    df = pd.concat(dfs, ignore_index=True)
+@st.cache_data(show_spinner=False)
+def cached_intervals(signature):
+    return dashboard_data.available_intervals(gold_path)
 
-    # Converte a coluna date para datetime, se necessário
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
+@st.cache_data(show_spinner=False)
+def cached_bars(signature, interval, currencies, start, end):
+    return dashboard_data.load_bars(gold_path, interval, list(currencies), start, end)
 
-    st.subheader("📊 Dados processados (Parquet)")
-    st.dataframe(df.head())
+@st.cache_data(show_spinner=False)
+def cached_chart(signature, interval, currencies, start, end, max_points):
+    if interval:
+        df = cached_bars(signature, interval, currencies, start, end)
+    else:
+        df = cached_rates(signature, currencies, start, end)
+    return dashboard_data.downsample(df, max_points=max_points)
 
-    if "date" in df.columns:
-        st.line_chart(df.set_index("date").select_dtypes("number"))
+@st.cache_data(show_spinner=False)
+def cached_insights(signature):
+    return dashboard_data.load_insights(gold_path)
+
+signature = dashboard_data.gold_signature(gold_path)
+
+# ============================
+# Filtros interativos
+# ============================
+moedas = cached_currencies(signature)
+first_date, last_date = cached_bounds(signature)
 
+if moedas:
+    st.sidebar.header("Filtros")
+    default = [m for m in ("BRL", "EUR") if m in moedas] or moedas[:1]
+    selecionadas = st.sidebar.multiselect("Escolha as moedas:", moedas, default=default)
+    periodo = st.sidebar.date_input(
+        "Período:", value=(first_date, last_date), min_value=first_date, max_value=last_date
+    )
+    start, end = periodo if isinstance(periodo, (tuple, list)) and len(periodo) == 2 else (first_date, last_date)
+    # Barras OHLC pré-agregadas (src.bars), quando existirem; senão o gold diário
+    granularidades = {"Diária (gold)": None, **{f"Barras {i}": i for i in cached_intervals(signature)}}
+    interval = granularidades[st.sidebar.selectbox("Granularidade:", list(granularidades))]
+
+    # ============================
+    # Dados do gold (filtrados na leitura)
+    # ============================
+    if selecionadas:
+        if interval:
+            df = cached_bars(signature, interval, tuple(selecionadas), start, end)
+        else:
+            df = cached_rates(signature, tuple(selecionadas), start, end)
+
+        st.subheader("📊 Dados processados (Parquet)")
+        st.dataframe(df.head())
+
+        st.subheader(f"📈 Evolução: {', '.join(selecionadas)}" + (f" (fechamento {interval})" if interval else ""))
+        chart = cached_chart(signature, interval, tuple(selecionadas), start, end, MAX_POINTS)
+        st.line_chart(chart)
+        if len(df) > len(chart) * max(1, chart.shape[1]):
+            st.caption(f"Série reduzida para até {MAX_POINTS} pontos por moeda (LTTB).")
+    else:
+        st.info("Selecione ao menos uma moeda.")
 else:
     st.warning("Nenhum arquivo Parquet encontrado em /data/gold")
 
 # ============================
 # Carregar insights do LLM
 # ============================
-insight_files = sorted(gold_path.glob("*insights*.json"))
-if insight_files:
+all_insights = cached_insights(signature)
+if all_insights:
     st.subheader("🤖 Insights do LLM")
-    all_insights = {}
-    for f in insight_files:
-        with open(f, "r", encoding="utf-8") as file:
-            insights = json.load(file)
-            all_insights.update(insights)
     st.json(all_insights)
 else:
     st.info("Nenhum arquivo de insights do LLM encontrado em /data/gold")
-
-# ============================
-# Filtros interativos
-# ============================
-if parquet_files:
-    st.sidebar.header("Filtros")
-    moedas = [c for c in df.columns if c not in ["date"]]
-    if moedas:
-        moeda = st.sidebar.selectbox("Escolha uma moeda:", moedas)
-        st.subheader(f"📈 Evolução da moeda: {moeda}")
-        st.line_chart(df.set_index("date")[moeda])
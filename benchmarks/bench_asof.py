@@ -0,0 +1,63 @@
+"""
+Benchmark do índice as-of: N moedas x D dias x K coletas por dia e lotes de consultas aleatórias.
+Uso: python -m benchmarks.bench_asof --currencies 160 --days 365 --snapshots 24 --queries 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.asof import AsOfIndex
+
+
+def synthetic_snapshots(currencies=160, days=365, snapshots=24, seed=7):
+    rng = np.random.default_rng(seed)
+    codes = np.array([f"C{i:03d}" for i in range(currencies)], dtype=object)
+    step = 86400 // snapshots
+    ts = 1704067200 + np.arange(days * snapshots, dtype="int64") * step
+    return pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": np.tile(codes, len(ts)),
+        "rate": rng.lognormal(0, 1, len(ts) * currencies),
+        "retrieved_at": np.repeat(ts, currencies),
+    })
+
+
+def run(currencies=160, days=365, snapshots=24, queries=1_000_000, seed=7):
+    df = synthetic_snapshots(currencies, days, snapshots, seed)
+    index = AsOfIndex()
+
+    start = time.perf_counter()
+    index.add(df)
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed + 1)
+    codes = [f"C{i:03d}" for i in range(currencies)]
+    ids = np.array([index.pair_id("USD", c) for c in codes])[rng.integers(0, currencies, queries)]
+    ts = rng.integers(df["retrieved_at"].min(), df["retrieved_at"].max(), queries)
+
+    start = time.perf_counter()
+    index.lookup_ids(ids, ts)
+    batch = time.perf_counter() - start
+
+    targets = np.array(codes, dtype=object)[rng.integers(0, currencies, 10_000)]
+    start = time.perf_counter()
+    for target, t in zip(targets, ts[:10_000]):
+        index.lookup("USD", target, t)
+    single = (time.perf_counter() - start) / 10_000
+
+    print(f"pontos no índice: {len(index):,} (construção {build:.2f}s)")
+    print(f"lote por ids:     {queries / batch:,.0f} consultas/s ({queries:,} em {batch:.3f}s)")
+    print(f"consulta isolada: {single * 1e6:.1f} µs")
+    return queries / batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do índice as-of")
+    parser.add_argument("--currencies", type=int, default=160)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--snapshots", type=int, default=24)
+    parser.add_argument("--queries", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.currencies, args.days, args.snapshots, args.queries)
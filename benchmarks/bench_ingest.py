@@ -0,0 +1,46 @@
+"""
+Benchmark offline: loop serial de fetch_exchange_rates vs ingest.fetch_many.
+Uso: python -m benchmarks.bench_ingest --bases 40 --latency 0.05 --workers 16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src import ingest
+from tests.fixtures.stub_server import StubExchangeServer
+
+
+def run(n_bases=40, latency=0.05, workers=16):
+    bases = [f"B{i:02d}" for i in range(n_bases)]
+    with tempfile.TemporaryDirectory() as tmp, StubExchangeServer(latency=latency) as server:
+        ingest.BASE_URL = server.base_url
+        ingest.API_KEY = "bench"
+
+        # Diretórios separados: sem estado de coleta anterior (ETag/hash) entre as duas fases
+        ingest.RAW_DIR = os.path.join(tmp, "serial")
+        os.makedirs(ingest.RAW_DIR)
+        start = time.perf_counter()
+        for base in bases:
+            ingest.fetch_exchange_rates(base_currency=base)
+        serial = time.perf_counter() - start
+
+        ingest.RAW_DIR = os.path.join(tmp, "many")
+        os.makedirs(ingest.RAW_DIR)
+        start = time.perf_counter()
+        ingest.fetch_many(bases, max_workers=workers)
+        concurrent = time.perf_counter() - start
+
+    print(f"serial:     {serial:.3f}s ({n_bases / serial:.1f} req/s)")
+    print(f"fetch_many: {concurrent:.3f}s ({n_bases / concurrent:.1f} req/s)")
+    print(f"speedup:    {serial / concurrent:.1f}x")
+    return serial, concurrent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de ingestão em lote")
+    parser.add_argument("--bases", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+    run(args.bases, args.latency, args.workers)
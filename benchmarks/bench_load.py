@@ -0,0 +1,81 @@
+"""
+Benchmark de carga de um ano de histórico na tabela exchange_rates.
+Compara o caminho antigo (DELETE por dia + to_sql multi) com load.bulk_upsert.
+Por padrão roda sobre uma cópia de exchange_rate.db; use --in-place para o arquivo real.
+Uso: python -m benchmarks.bench_load --days 365
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from src import load
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "..", "exchange_rate.db")
+
+
+def year_of_history(days=365, currencies=160, seed=42):
+    rng = np.random.default_rng(seed)
+    codes = [f"C{i:03d}" for i in range(currencies)]
+    dates = pd.date_range("2024-01-01", periods=days).strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": np.tile(codes, days),
+        "rate": rng.lognormal(0, 1, days * currencies).round(6),
+        "retrieved_at": 1704067200,
+        "date": np.repeat(dates, currencies),
+        "run_id": "bench",
+        "pipeline_version": "1.0",
+    })
+
+
+def legacy_load(df, db_uri):
+    for date_str, day in df.groupby("date"):
+        engine = create_engine(db_uri)
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM exchange_rates WHERE date = :date"), {"date": date_str})
+        day.to_sql("exchange_rates", con=engine, if_exists="append", method="multi", index=False, chunksize=1000)
+        engine.dispose()
+
+
+def run(days=365, currencies=160, in_place=False):
+    df = year_of_history(days, currencies)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        shutil.copy(DB_FILE, legacy_db)
+        target_db = DB_FILE if in_place else os.path.join(tmp, "bulk.db")
+        if not in_place:
+            shutil.copy(DB_FILE, target_db)
+
+        start = time.perf_counter()
+        legacy_load(df, f"sqlite:///{legacy_db}")
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load.bulk_upsert(df, f"sqlite:///{target_db}")
+        bulk = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load.bulk_upsert(df, f"sqlite:///{target_db}")
+        rerun = time.perf_counter() - start
+
+    rows = len(df)
+    print(f"linhas:                {rows}")
+    print(f"legado (por dia):      {legacy:.3f}s ({rows / legacy:,.0f} linhas/s)")
+    print(f"bulk_upsert:           {bulk:.3f}s ({rows / bulk:,.0f} linhas/s)")
+    print(f"bulk_upsert (reexec.): {rerun:.3f}s ({rows / rerun:,.0f} linhas/s)")
+    return legacy, bulk, rerun
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga no banco")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--currencies", type=int, default=160)
+    parser.add_argument("--in-place", action="store_true", help="Grava no exchange_rate.db real")
+    args = parser.parse_args()
+    run(args.days, args.currencies, args.in_place)
@@ -0,0 +1,87 @@
+"""
+Tempo de inicialização dos CLIs e módulos do pipeline, medido com `python -X importtime`.
+Cada alvo roda em um processo novo (melhor de `repeat` execuções); o relatório traz o
+tempo total, o tempo gasto em importações e os pacotes mais pesados.
+
+Uso:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --top 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# alvo: código executado no processo novo
+TARGETS = {
+    "cli --help": "import sys; sys.argv = ['src', '--help']; import runpy; runpy.run_module('src', run_name='__main__')",
+    "main": "import main",
+    "src.ingest": "import src.ingest",
+    "src.transform": "import src.transform",
+    "src.load": "import src.load",
+    "src.llm_enrich": "import src.llm_enrich",
+}
+
+HEAVY = ["pandas", "pyarrow", "sqlalchemy", "openai", "requests"]
+
+
+def parse_importtime(stderr):
+    """Linhas do -X importtime -> [(pacote, self_us, cumulative_us, nível)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        level = (len(name) - len(name.lstrip())) // 2 - 1
+        rows.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return rows
+
+
+def measure(code, repeat=3):
+    """Melhor execução: {wall_seconds, import_seconds, top (pacotes de 1º nível), heavy}"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        wall = time.perf_counter() - start
+        if proc.returncode not in (0, None):
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        if best is None or wall < best["wall_seconds"]:
+            rows = parse_importtime(proc.stderr)
+            top_level = sorted((r for r in rows if r[3] == 0), key=lambda r: r[2], reverse=True)
+            loaded = {r[0].split(".")[0] for r in rows}
+            best = {
+                "wall_seconds": round(wall, 4),
+                "import_seconds": round(sum(r[1] for r in rows) / 1e6, 4),
+                "top": [(name, round(cumulative / 1e6, 4)) for name, _, cumulative, _ in top_level],
+                "heavy": [name for name in HEAVY if name in loaded],
+            }
+    return best
+
+
+def run(targets=None, repeat=3, top=5):
+    results = {}
+    for name in targets or TARGETS:
+        result = measure(TARGETS[name], repeat)
+        results[name] = result
+        print(f"{name:<15} {result['wall_seconds']:>7.3f}s  importações {result['import_seconds']:>7.3f}s  "
+              f"pesados: {', '.join(result['heavy']) or '-'}")
+        for package, seconds in result["top"][:top]:
+            print(f"    {package:<30} {seconds:>7.3f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo de inicialização (python -X importtime)")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), help="Alvos medidos (padrão: todos)")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por alvo (vale a melhor)")
+    parser.add_argument("--top", type=int, default=5, help="Pacotes mais pesados listados por alvo")
+    args = parser.parse_args()
+
+    run(args.targets, repeat=args.repeat, top=args.top)
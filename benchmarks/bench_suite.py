@@ -0,0 +1,212 @@
+"""
+Suíte de benchmarks do pipeline com dados sintéticos (N moedas x D dias x K coletas).
+Mede parsing da ingestão, transform, aggregate_silver_files, barras OHLC, carga no banco,
+calculate_metrics, enriquecimento (LLM simulado) e leitura do dashboard.
+Roda offline: nenhuma chamada HTTP ou ao LLM é feita.
+
+Uso:
+    python -m benchmarks.bench_suite run --scales small medium
+    python -m benchmarks.bench_suite compare --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")  # o LLM nunca é chamado (simulate_llm=True)
+
+import pandas as pd
+
+from benchmarks import synthetic
+from src import ingest, transform, load, llm_enrich, dashboard_data, compact_schema, bars
+
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "history.json")
+
+# (moedas, dias, coletas por dia)
+SCALES = {
+    "small": (20, 7, 4),
+    "medium": (160, 30, 8),
+    "large": (160, 90, 24),
+    "history": (160, 3 * 365, 1),  # 3 anos diários: calculate_metrics sobre histórico longo
+}
+
+STAGES = ["ingest_parse", "transform", "aggregate", "bars", "db_load", "metrics", "enrich", "dashboard"]
+
+
+def _timed(results, name, func, rows_of=len):
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    rows = rows_of(value)
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+    }
+    return value
+
+
+def run_scale(currencies, days, snapshots, seed=42):
+    """Executa todas as etapas em um diretório temporário e devolve {etapa: medidas}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw")
+        silver_dir = os.path.join(tmp, "silver")
+        gold_dir = os.path.join(tmp, "gold")
+        os.makedirs(gold_dir)
+        raw_files = synthetic.generate(raw_dir, currencies, days, snapshots, seed)
+
+        saved = load.SILVER_DIR, load.GOLD_DIR, load.DB_URI
+        load.SILVER_DIR, load.GOLD_DIR, load.DB_URI = silver_dir, gold_dir, None
+        try:
+            _run_stages(results, tmp, raw_files, silver_dir, gold_dir)
+        finally:
+            load.SILVER_DIR, load.GOLD_DIR, load.DB_URI = saved
+    return results
+
+
+def _run_stages(results, tmp, raw_files, silver_dir, gold_dir):
+    _timed(results, "ingest_parse",
+           lambda: pd.concat([ingest.load_local_file(f) for f in raw_files], ignore_index=True))
+
+    silver_files = []
+
+    def run_transform():
+        silver_files[:] = transform.transform_files(
+            raw_files, silver_dir=silver_dir, rejects_dir=os.path.join(tmp, "rejects")
+        )
+        return sum(len(pd.read_parquet(f, columns=["rate"])) for f in silver_files)
+    silver_rows = _timed(results, "transform", run_transform, rows_of=lambda rows: rows)
+
+    dates = sorted({os.path.basename(f)[:10] for f in raw_files})
+    gold_files = _timed(results, "aggregate",
+                        lambda: [load.aggregate_silver_files(date_str=d) for d in dates],
+                        rows_of=lambda files: sum(len(pd.read_parquet(f, columns=["rate"])) for f in files))
+    gold = pd.concat([compact_schema.read_frame(f) for f in gold_files], ignore_index=True)
+
+    _timed(results, "bars", lambda: bars.update_bars(silver_files, bars_dir=os.path.join(gold_dir, "bars")),
+           rows_of=lambda _: silver_rows)
+
+    db_uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    _timed(results, "db_load", lambda: load.bulk_upsert(gold, db_uri), rows_of=lambda rows: rows)
+    load.get_engine.cache_clear()
+
+    _timed(results, "metrics", lambda: llm_enrich.calculate_metrics(gold), rows_of=lambda _: len(gold))
+    _timed(results, "enrich", lambda: llm_enrich.enrich_with_llm(gold, run_id="bench", simulate_llm=True),
+           rows_of=lambda _: len(gold))
+
+    def run_dashboard():
+        codes = dashboard_data.available_currencies(gold_dir)[:5]
+        first, last = dashboard_data.date_bounds(gold_dir)
+        df = dashboard_data.load_rates(gold_dir, codes, first, last)
+        dashboard_data.downsample(df, max_points=500)
+        return df
+    _timed(results, "dashboard", run_dashboard)
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(history, path=HISTORY_FILE):
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_file, path)
+
+
+def run(scales=("small",), repeat=1, history_file=HISTORY_FILE, seed=42):
+    """Roda as escalas pedidas (melhor de `repeat` execuções por etapa) e acrescenta ao histórico"""
+    history = load_history(history_file)
+    entries = []
+    for scale in scales:
+        currencies, days, snapshots = SCALES[scale]
+        best = {}
+        for _ in range(repeat):
+            for stage, result in run_scale(currencies, days, snapshots, seed).items():
+                if stage not in best or result["seconds"] < best[stage]["seconds"]:
+                    best[stage] = result
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "scale": scale,
+            "shape": {"currencies": currencies, "days": days, "snapshots": snapshots},
+            "stages": best,
+        }
+        entries.append(entry)
+        print(f"[{scale}] {currencies} moedas x {days} dias x {snapshots} coletas")
+        for stage in STAGES:
+            r = best[stage]
+            print(f"  {stage:<13} {r['seconds']:>8.3f}s  {r['rows']:>9,} linhas  {r['rows_per_second'] or 0:>12,.0f} linhas/s")
+    save_history(history + entries, history_file)
+    return entries
+
+
+def compare(history, threshold=0.2, scale=None, min_seconds=0.05):
+    """
+    Compara a última execução de cada escala com a anterior.
+    Retorna a lista de regressões (etapas mais lentas que a base além de `threshold`).
+    Etapas abaixo de `min_seconds` nas duas execuções são só ruído e não são sinalizadas.
+    """
+    regressions = []
+    for name in sorted({e["scale"] for e in history if scale in (None, e["scale"])}):
+        runs = [e for e in history if e["scale"] == name]
+        if len(runs) < 2:
+            print(f"[{name}] apenas uma execução no histórico")
+            continue
+        base, current = runs[-2], runs[-1]
+        print(f"[{name}] {base.get('revision')} -> {current.get('revision')}")
+        for stage, result in current["stages"].items():
+            before = base["stages"].get(stage)
+            if not before or not before["seconds"]:
+                continue
+            change = result["seconds"] / before["seconds"] - 1
+            regressed = change > threshold and max(result["seconds"], before["seconds"]) >= min_seconds
+            flag = "REGRESSÃO" if regressed else ""
+            print(f"  {stage:<13} {before['seconds']:>8.3f}s -> {result['seconds']:>8.3f}s  {change:+7.1%}  {flag}")
+            if regressed:
+                regressions.append({"scale": name, "stage": stage, "change": round(change, 4)})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline com dados sintéticos")
+    parser.add_argument("--history", default=HISTORY_FILE, help="Arquivo JSON com o histórico")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Executa a suíte e grava no histórico")
+    run_parser.add_argument("--scales", nargs="+", default=["small"], choices=sorted(SCALES))
+    run_parser.add_argument("--repeat", type=int, default=1, help="Execuções por escala (vale a melhor)")
+    run_parser.add_argument("--seed", type=int, default=42)
+
+    compare_parser = sub.add_parser("compare", help="Compara a última execução com a anterior")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Piora relativa tolerada (0.2 = 20%%)")
+    compare_parser.add_argument("--scale", choices=sorted(SCALES))
+    compare_parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignora etapas mais rápidas que isso")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.scales, repeat=args.repeat, history_file=args.history, seed=args.seed)
+    else:
+        found = compare(load_history(args.history), threshold=args.threshold, scale=args.scale,
+                        min_seconds=args.min_seconds)
+        if found:
+            print(f"{len(found)} regressão(ões) acima de {args.threshold:.0%}")
+            sys.exit(1)
@@ -0,0 +1,59 @@
+"""
+Gerador determinístico de snapshots brutos: N moedas x D dias x K coletas por dia.
+Os arquivos seguem o formato da ExchangeRate API (com _metadata), como os de data/raw.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def currency_codes(currencies):
+    """Códigos reais (aceitos pelo esquema compacto) e, passando da tabela, fictícios C001..."""
+    from src.compact_schema import CURRENCY_CODES
+
+    real = [c for c in CURRENCY_CODES if c != "USD"]
+    return ["USD"] + real[:currencies - 1] + [f"C{i:03d}" for i in range(len(real) + 1, currencies)]
+
+
+def rate_paths(currencies=160, days=30, snapshots=8, seed=42, invalid_ratio=0.001):
+    """Passeio aleatório log-normal (snapshots x moedas); uma fração pequena de taxas inválidas"""
+    rng = np.random.default_rng(seed)
+    n = days * snapshots
+    start = rng.lognormal(0, 1.5, currencies)
+    returns = rng.normal(0, 0.002, (n, currencies))
+    rates = start * np.exp(np.cumsum(returns, axis=0))
+    rates[:, 0] = 1.0  # USD
+    invalid = rng.random((n, currencies)) < invalid_ratio
+    invalid[:, 0] = False
+    return rates.round(6), invalid
+
+
+def generate(raw_dir, currencies=160, days=30, snapshots=8, seed=42):
+    """Grava os snapshots em raw_dir (YYYY-MM-DD_HHMMSS.json) e devolve os caminhos em ordem"""
+    os.makedirs(raw_dir, exist_ok=True)
+    codes = currency_codes(currencies)
+    rates, invalid = rate_paths(currencies, days, snapshots, seed)
+    step = timedelta(seconds=86400 // snapshots)
+
+    paths = []
+    for i in range(days * snapshots):
+        ts = START + i * step
+        conversion_rates = {
+            code: (None if invalid[i, j] else float(rates[i, j])) for j, code in enumerate(codes)
+        }
+        data = {
+            "result": "success",
+            "base_code": "USD",
+            "time_last_update_unix": int(ts.timestamp()),
+            "conversion_rates": conversion_rates,
+            "_metadata": {"timestamp": ts.replace(tzinfo=None).isoformat(), "status_code": 200, "url": "synthetic"},
+        }
+        path = os.path.join(raw_dir, ts.strftime("%Y-%m-%d_%H%M%S.json"))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        paths.append(path)
+    return paths
@@ -1,60 +1,162 @@
-import os
-import time
-import pandas as pd
-from datetime import datetime
-from src import ingest, transform, load, llm_enrich
-from src.logging_config import get_logger, get_run_id, log_metrics
+import argparse
+from src.config import get_settings
+from src.pipeline import Pipeline, Stage, raw_payload_digest
+from src.logging_config import get_logger, get_run_id, log_metrics, span, current_span, start_profiling, stop_profiling
+
+# Os módulos das etapas (pandas, pyarrow, SQLAlchemy, OpenAI) são importados dentro de
+# cada etapa: importar este arquivo não carrega nada pesado, e etapas puladas não pagam a importação
+logger = get_logger(service="pipeline")
+
+# ---------------------------
+# ETAPA 1: Ingestão
+# ---------------------------
+def run_ingest(results, run_id):
+    from src import ingest
+
+    raw_file = ingest.fetch_exchange_rates(base_currency="USD")
+    logger.info("ingest_complete", arquivo=raw_file, run_id=run_id)
+    return {"outputs": [raw_file]}
+
+# ---------------------------
+# ETAPA 2: Transformação
+# ---------------------------
+def run_transform(results, run_id):
+    from src import transform
+
+    silver_file = transform.transform_file(results["ingest"]["outputs"][0], run_id=run_id)
+    return {"outputs": [str(silver_file)]}
+
+# ---------------------------
+# ETAPA 3: Carga (gold)
+# ---------------------------
+def run_load(results, run_id):
+    from src import load
+
+    gold_file = load.aggregate_silver_files(run_id=run_id, upsert_db=False)
+    return {"outputs": [gold_file] if gold_file else []}
+
+# ---------------------------
+# ETAPA 3b: Barras OHLC intradiárias (em paralelo com a carga)
+# ---------------------------
+def run_bars(results, run_id):
+    from src import bars
+
+    return {"outputs": bars.update_bars(results["transform"]["outputs"], run_id=run_id)}
+
+def _bars_params():
+    from src import bars
+
+    return {"intervals": bars.enabled_intervals()}
+
+def _gold_or_silver(results):
+    return results["load"]["outputs"] or results["transform"]["outputs"]
 
 # ---------------------------
-# Inicialização do pipeline
+# ETAPA 4a: Carga no banco (em paralelo com a detecção de anomalias)
 # ---------------------------
-run_id = get_run_id()
-logger = get_logger(run_id=run_id, service="pipeline")
-logger.info("pipeline_start", run_id=run_id)
+def run_db_load(results, run_id):
+    from src import load
 
-def main():
-    start_time = time.time()
+    db_uri = load.db_uri()
+    if not db_uri:
+        return {"outputs": [], "rows": 0}
+    from src import compact_schema
+
+    df = compact_schema.read_frame(_gold_or_silver(results)[0])
+    return {"outputs": [], "rows": load.bulk_upsert(df, db_uri, run_id=run_id)}
+
+def _db_load_params():
+    from src import load
+
+    return {"db_uri": load.db_uri()}
+
+# ---------------------------
+# ETAPA 4b: Detecção de anomalias (libera ou dispensa o LLM)
+# ---------------------------
+def run_anomaly(results, run_id):
+    from src import anomaly
+
+    return anomaly.detect_files(results["transform"]["outputs"], run_id=run_id)
+
+def _anomaly_params():
+    from src import anomaly
+
+    return {"min_severity": anomaly.min_severity()}
+
+# ---------------------------
+# ETAPA 5: Enriquecimento LLM
+# ---------------------------
+def run_enrich(results, run_id):
+    from src import compact_schema, llm_enrich, rolling_state
+
+    df = compact_schema.read_frame(_gold_or_silver(results)[0])
+    current_span().add(rows_in=len(df))
+    state = rolling_state.update_state(df, run_id=run_id)
+    gate = results["anomaly"]
+    if not gate["enrich"]:
+        logger.info("llm_enrichment_skipped", run_id=run_id, reason="no_anomalies", anomalies=gate["anomalies"])
+        return {"outputs": [], "summary": None}
+    llm_summary = llm_enrich.enrich_with_llm(df, run_id=run_id, simulate_llm=True, state=state,
+                                             currencies=gate["currencies"])
+    logger.info("llm_enrichment_complete", run_id=run_id, summary=llm_summary, currencies=gate["currencies"])
+    return {"outputs": [], "summary": llm_summary}
+
+def _enrich_params():
+    from src import llm_enrich
+
+    return {"model": llm_enrich.openai_model(), "simulate": True, **_anomaly_params()}
+
+def build_pipeline():
+    """Etapas do pipeline com suas dependências e entradas (para o pulo por hash de conteúdo)"""
+    return Pipeline([
+        Stage("ingest", run_ingest),
+        Stage("transform", run_transform, deps=["ingest"],
+              inputs=lambda r: r["ingest"]["outputs"], fingerprint=raw_payload_digest),
+        Stage("load", run_load, deps=["transform"], inputs=lambda r: r["transform"]["outputs"]),
+        Stage("bars", run_bars, deps=["transform"], inputs=lambda r: r["transform"]["outputs"], params=_bars_params),
+        Stage("db_load", run_db_load, deps=["transform", "load"], inputs=_gold_or_silver, params=_db_load_params),
+        Stage("anomaly", run_anomaly, deps=["transform", "load"],
+              inputs=lambda r: r["transform"]["outputs"], params=_anomaly_params),
+        Stage("enrich", run_enrich, deps=["transform", "load", "anomaly"], inputs=_gold_or_silver,
+              params=_enrich_params),
+    ])
+
+def main(resume=True, profile=False, run_id=None):
+    run_id = run_id or get_run_id()
+    logger = get_logger(run_id=run_id, service="pipeline")
+    logger.info("pipeline_start", run_id=run_id)
+
+    # Tempos por etapa vêm dos spans (Pipeline); aqui só o total da execução
+    if profile:
+        start_profiling(run_id)
+    pipeline_span = span("pipeline", logger=logger)
     try:
-        # ---------------------------
-        # ETAPA 1: Ingestão
-        # ---------------------------
-        raw_file = ingest.fetch_exchange_rates(base_currency="USD")
-        logger.info("ingest_complete", arquivo=raw_file, run_id=run_id)
-        elapsed = time.time() - start_time
-        log_metrics(logger, "ingest", 1, elapsed)  # 1 arquivo processado
-
-        # ---------------------------
-        # ETAPA 2: Transformação
-        # ---------------------------
-        silver_file = transform.transform_file(raw_file, run_id=run_id)
-        elapsed = time.time() - start_time
-        log_metrics(logger, "transform_total", 1, elapsed)
-
-        # ---------------------------
-        # ETAPA 3: Carga
-        # ---------------------------
-        gold_file = load.aggregate_silver_files(run_id=run_id)
-        elapsed = time.time() - start_time
-        log_metrics(logger, "load_total", 1, elapsed)
-
-        # ---------------------------
-        # ETAPA 4: Enriquecimento LLM
-        # ---------------------------
-        df = pd.read_parquet(silver_file)
-        llm_summary = llm_enrich.enrich_with_llm(df, run_id=run_id, simulate_llm=True)
-        logger.info("llm_enrichment_complete", run_id=run_id, summary=llm_summary)
+        with pipeline_span:
+            build_pipeline().run(run_id, resume=resume)
 
     except Exception as e:
         logger.error("pipeline_failed", run_id=run_id, error=str(e))
         raise
 
     finally:
-        elapsed = time.time() - start_time
-        logger.info(
-            "pipeline_end",
-            run_id=run_id,
-            elapsed_seconds=round(elapsed, 2)
-        )
+        # Span sem registro (falhou ao abrir): não há tempo a logar e o erro original segue adiante
+        if pipeline_span.record:
+            elapsed = pipeline_span.record["wall_seconds"]
+            log_metrics(logger, "pipeline", 1, elapsed)
+            logger.info(
+                "pipeline_end",
+                run_id=run_id,
+                elapsed_seconds=round(elapsed, 2)
+            )
+        profiler = stop_profiling()
+        if profiler:
+            logger.info("profile_written", spans=profiler.jsonl_file, prometheus=profiler.prom_file)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Pipeline raw -> silver -> gold -> anomalias -> LLM")
+    parser.add_argument("--no-resume", action="store_true", help="Não retoma a última execução que falhou")
+    parser.add_argument("--profile", action="store_true", default=get_settings().pipeline_profile,
+                        help="Grava spans (JSONL), textfile Prometheus e cProfile/tracemalloc em logs/profiles")
+    args = parser.parse_args()
+
+    main(resume=not args.no_resume, profile=args.profile)
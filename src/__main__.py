@@ -0,0 +1,45 @@
+"""
+CLI única do pipeline: python -m src <comando> [argumentos do comando]
+
+Cada comando repassa os argumentos ao CLI do módulo correspondente, que só é
+importado quando escolhido (ex.: `python -m src ingest` não importa pandas,
+SQLAlchemy nem o SDK da OpenAI). `python -m src <comando> --help` mostra as opções.
+"""
+import argparse
+import runpy
+import sys
+
+# comando: (módulo executado como __main__, descrição)
+COMMANDS = {
+    "run": ("main", "Pipeline completo: ingest -> transform -> load/bars -> db_load/anomaly -> enrich"),
+    "ingest": ("src.ingest", "Coleta as cotações (raw)"),
+    "transform": ("src.transform", "Raw -> silver de uma data"),
+    "load": ("src.load", "Silver -> gold de uma data (e banco, se DB_URI)"),
+    "backfill": ("src.backfill", "Raw -> silver -> gold por intervalo de datas"),
+    "bars": ("src.bars", "Barras OHLC (hourly/daily/weekly) dos snapshots intradiários"),
+    "anomaly": ("src.anomaly", "Detecção de anomalias (EWMA z-score e saltos) nos snapshots"),
+    "enrich-batch": ("src.llm_batch", "Enriquecimento LLM em lote"),
+    "convert": ("src.convert", "Conversão em lote de arquivos de transações"),
+    "gold-dataset": ("src.gold_dataset", "Compactação do gold em dataset particionado"),
+    "schema": ("src.compact_schema", "Migração/validação do esquema compacto do silver/gold"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src", description="Pipeline de cotações cambiais")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="comando")
+    for name, (_, help_text) in COMMANDS.items():
+        # add_help=False: --help vai para o CLI do próprio módulo
+        sub.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    args, rest = build_parser().parse_known_args(sys.argv[1:] if argv is None else argv)
+    module = COMMANDS[args.command][0]
+    sys.argv = [f"python -m src {args.command}", *rest]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Detecção de anomalias em streaming, vetorizada em todas as moedas a cada snapshot:
+- z-score do retorno (log) contra a EWMA da média/variância dos retornos anteriores
+- saltos: |retorno| acima de JUMP_THRESHOLD, mesmo sem histórico suficiente
+O estado por par (base, moeda) fica em data/gold/_anomaly_state.npz e as anomalias de cada dia em
+data/gold/<data>-anomalies.parquet. O enriquecimento LLM só roda quando alguma anomalia
+atinge a severidade mínima (ANOMALY_MIN_SEVERITY) e recebe só as moedas anômalas.
+Bases diferentes (USD→BRL e EUR→BRL) são séries independentes.
+
+Uso:
+    python -m src.anomaly                       # silver do dia atual
+    python -m src.anomaly data/silver/2025-09-29*.parquet
+"""
+import os
+import glob
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.asof import to_epoch_seconds
+from src.config import UNSET, resolve
+from src.logging_config import get_logger, log_metrics
+
+GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
+SILVER_DIR = os.path.join(os.path.dirname(__file__), "../data/silver")
+STATE_FILE = os.path.join(GOLD_DIR, "_anomaly_state.npz")
+
+SEVERITIES = ("none", "low", "medium", "high")
+# Limiares de |z| para low/medium/high; saltos são sempre "high"
+Z_THRESHOLDS = (3.0, 4.0, 6.0)
+JUMP_THRESHOLD = 0.05   # |log-retorno| entre snapshots consecutivos
+MIN_PERIODS = 10        # retornos necessários antes de usar o z-score
+MIN_STD = 1e-4          # piso do desvio: séries quase constantes não geram z enormes
+
+# "low"/"medium"/"high" ou "always" (LLM em toda execução); UNSET: ANOMALY_MIN_SEVERITY
+MIN_SEVERITY = UNSET
+
+_ARRAYS = ("last_rate", "last_ts", "count", "ewma_mean", "ewma_var")
+COLUMNS = ["date", "retrieved_at", "base_currency", "target_currency", "rate", "prev_rate",
+           "return_pct", "zscore", "jump", "severity", "run_id"]
+
+
+def min_severity():
+    return resolve(MIN_SEVERITY, "anomaly_min_severity")
+
+
+def severity_levels(zscore, jump):
+    """Nível 0..3 (índice em SEVERITIES) a partir de |z| e do indicador de salto"""
+    z = np.abs(np.nan_to_num(np.asarray(zscore, dtype="float64"), nan=0.0))
+    levels = np.searchsorted(Z_THRESHOLDS, z, side="right")
+    return np.where(jump, len(SEVERITIES) - 1, levels)
+
+
+class AnomalyDetector:
+    """
+    Estado por par (base_currency, target_currency): última cotação e horário, contagem
+    de retornos e EWMA da média/variância (mesma recursão do RollingState). Cada update
+    processa todos os pares do snapshot com operações vetorizadas, em O(pares).
+    """
+
+    def __init__(self, alpha=0.06, jump_threshold=JUMP_THRESHOLD, min_periods=MIN_PERIODS):
+        self.alpha = alpha
+        self.jump_threshold = jump_threshold
+        self.min_periods = min_periods
+        self.bases = np.array([], dtype=object)
+        self.codes = np.array([], dtype=object)
+        self.last_rate = np.empty(0)
+        self.last_ts = np.empty(0, dtype="int64")
+        self.count = np.empty(0, dtype="int64")
+        self.ewma_mean = np.empty(0)
+        self.ewma_var = np.empty(0)
+
+    def _pairs(self):
+        return pd.MultiIndex.from_arrays([self.bases, self.codes])
+
+    def _add_pairs(self, new_pairs):
+        n = len(new_pairs)
+        self.bases = np.concatenate([self.bases, np.array([b for b, _ in new_pairs], dtype=object)])
+        self.codes = np.concatenate([self.codes, np.array([c for _, c in new_pairs], dtype=object)])
+        self.last_rate = np.concatenate([self.last_rate, np.full(n, np.nan)])
+        self.last_ts = np.concatenate([self.last_ts, np.full(n, np.iinfo("int64").min)])
+        self.count = np.concatenate([self.count, np.zeros(n, dtype="int64")])
+        self.ewma_mean = np.concatenate([self.ewma_mean, np.zeros(n)])
+        self.ewma_var = np.concatenate([self.ewma_var, np.zeros(n)])
+
+    def update(self, snapshot, retrieved_at):
+        """
+        Incorpora um snapshot (colunas base_currency, target_currency, rate) coletado em
+        `retrieved_at` (epoch em segundos) e devolve, por par, retorno, z-score, salto e
+        severidade. Pares já vistos em um snapshot igual ou mais recente são ignorados
+        (reexecução), e cotação repetida não conta como retorno (o provedor não publicou valor novo).
+        """
+        snap = snapshot.drop_duplicates(subset=["base_currency", "target_currency"], keep="last")
+        pairs = pd.MultiIndex.from_arrays([snap["base_currency"].astype(str), snap["target_currency"].astype(str)])
+        new_pairs = pairs[~pairs.isin(self._pairs())].tolist()
+        if new_pairs:
+            self._add_pairs(new_pairs)
+
+        idx = self._pairs().get_indexer(pairs)
+        rate = snap["rate"].to_numpy(dtype="float64")
+        fresh = retrieved_at > self.last_ts[idx]
+        idx, rate = idx[fresh], rate[fresh]
+
+        prev = self.last_rate[idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = np.log(rate / prev)
+        valid = np.isfinite(ret) & (rate != prev)
+
+        count, mean = self.count[idx], self.ewma_mean[idx]
+        # A variância parte de zero: corrige o viés das primeiras observações
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = self.ewma_var[idx] / (1 - (1 - self.alpha) ** np.maximum(count - 1, 1))
+        std = np.maximum(np.sqrt(var), MIN_STD)
+        zscore = np.where(valid & (count >= self.min_periods), (ret - mean) / std, np.nan)
+        jump = valid & (np.abs(ret) >= self.jump_threshold)
+
+        # EWMA só onde há retorno novo; o primeiro retorno inicializa a média
+        upd = idx[valid]
+        first = self.count[upd] == 0
+        diff = ret[valid] - self.ewma_mean[upd]
+        incr = self.alpha * diff
+        self.ewma_mean[upd] = np.where(first, ret[valid], self.ewma_mean[upd] + incr)
+        self.ewma_var[upd] = np.where(first, 0.0, (1 - self.alpha) * (self.ewma_var[upd] + diff * incr))
+        self.count[upd] += 1
+
+        ok = np.isfinite(rate) & (rate > 0)
+        self.last_rate[idx[ok]] = rate[ok]
+        self.last_ts[idx] = retrieved_at
+
+        return pd.DataFrame({
+            "base_currency": self.bases[idx].astype(str),
+            "target_currency": self.codes[idx].astype(str),
+            "rate": rate,
+            "prev_rate": prev,
+            "return_pct": np.where(valid, ret * 100, np.nan),
+            "zscore": zscore,
+            "jump": jump,
+            "severity": np.array(SEVERITIES)[severity_levels(zscore, jump)],
+        })
+
+    def save(self, path=STATE_FILE):
+        """Checkpoint atômico ao lado do gold"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            bases=self.bases.astype(str),
+            codes=self.codes.astype(str),
+            config=np.array([self.alpha, self.jump_threshold, self.min_periods]),
+            **{name: getattr(self, name) for name in _ARRAYS},
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        """
+        Carrega o checkpoint; estado vazio se ainda não existir ou se for do formato antigo
+        (só por moeda, com as bases misturadas): o z-score volta a valer após min_periods.
+        """
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            if "bases" not in data:
+                return cls()
+            alpha, jump_threshold, min_periods = data["config"]
+            detector = cls(alpha=float(alpha), jump_threshold=float(jump_threshold), min_periods=int(min_periods))
+            detector.bases = data["bases"].astype(object)
+            detector.codes = data["codes"].astype(object)
+            for name in _ARRAYS:
+                setattr(detector, name, data[name])
+        return detector
+
+
+def detect(df, detector, run_id=None):
+    """
+    Passa os snapshots de `df` (silver/gold: base_currency, target_currency, rate,
+    retrieved_at) pelo detector em ordem de coleta. Devolve só as linhas anômalas (severidade >= low).
+    """
+    data = df.assign(retrieved_at=to_epoch_seconds(df["retrieved_at"].to_numpy()))
+    parts = []
+    for retrieved_at, snapshot in data.groupby("retrieved_at", sort=True):
+        result = detector.update(snapshot, int(retrieved_at))
+        result = result[result["severity"] != "none"]
+        if len(result):
+            keys = ["base_currency", "target_currency"]
+            meta = snapshot.astype({k: str for k in keys}).drop_duplicates(subset=keys, keep="last").set_index(keys)
+            result.insert(0, "date", meta["date"].astype(str).reindex(pd.MultiIndex.from_frame(result[keys])).to_numpy())
+            result.insert(1, "retrieved_at", int(retrieved_at))
+            parts.append(result.assign(run_id=run_id))
+    if not parts:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(parts, ignore_index=True)[COLUMNS]
+
+
+def gate(anomalies, severity=None):
+    """
+    Pares (base_currency, target_currency) que justificam chamar o LLM: severidade >=
+    `severity` (padrão: min_severity()). Devolve None com "always" (enriquecimento com
+    todas as moedas, como antes).
+    """
+    severity = severity or min_severity()
+    if severity == "always":
+        return None
+    if severity not in SEVERITIES[1:]:
+        raise ValueError(f"Severidade inválida: {severity}")
+    levels = anomalies["severity"].map(SEVERITIES.index)
+    flagged = anomalies.loc[levels >= SEVERITIES.index(severity), ["base_currency", "target_currency"]]
+    return sorted(set(flagged.itertuples(index=False, name=None)))
+
+
+def write_anomalies(anomalies, gold_dir=GOLD_DIR):
+    """Mescla as anomalias nos arquivos diários <data>-anomalies.parquet (idempotente)"""
+    paths = []
+    for date_str, part in anomalies.groupby("date", sort=True):
+        path = os.path.join(gold_dir, f"{date_str}-anomalies.parquet")
+        if os.path.exists(path):
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+        part = part.drop_duplicates(subset=["retrieved_at", "base_currency", "target_currency"], keep="last")
+        os.makedirs(gold_dir, exist_ok=True)
+        part.to_parquet(f"{path}.tmp", engine="pyarrow", compression="snappy", index=False)
+        os.replace(f"{path}.tmp", path)
+        paths.append(path)
+    return paths
+
+
+def detect_files(files, run_id=None, state_path=STATE_FILE, gold_dir=GOLD_DIR, severity=None):
+    """
+    Etapa do pipeline: detecta anomalias nos snapshots novos (silver), grava a tabela no
+    gold, atualiza o estado e devolve o resumo com os pares que liberam o LLM
+    ("pairs", [base, moeda]) e as moedas correspondentes ("currencies", filtro do prompt).
+    """
+    from src import compact_schema
+
+    logger = get_logger(run_id=run_id, service="anomaly")
+    start = time.time()
+    detector = AnomalyDetector.load(state_path)
+    frames = [compact_schema.read_frame(f) for f in files]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+    anomalies = detect(df, detector, run_id=run_id) if len(df) else pd.DataFrame(columns=COLUMNS)
+    detector.save(state_path)
+    outputs = write_anomalies(anomalies, gold_dir) if len(anomalies) else []
+    pairs = gate(anomalies, severity)
+    currencies = None if pairs is None else sorted({target for _, target in pairs})
+
+    counts = anomalies["severity"].value_counts().to_dict()
+    logger.info("anomaly_ok", rows=len(df), anomalies=len(anomalies), by_severity=counts,
+                gated=pairs, arquivos=outputs)
+    log_metrics(logger, "anomaly", len(df), time.time() - start)
+    return {
+        "outputs": outputs,
+        "anomalies": len(anomalies),
+        "enrich": pairs is None or bool(pairs),
+        "pairs": None if pairs is None else [list(p) for p in pairs],
+        "currencies": currencies,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detecção de anomalias (EWMA z-score e saltos) nos snapshots do silver")
+    parser.add_argument("files", nargs="*", help="Arquivos silver (padrão: os do dia atual)")
+    parser.add_argument("--severity", choices=[*SEVERITIES[1:], "always"], help="Severidade mínima para liberar o LLM")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(SILVER_DIR, f"{datetime.utcnow():%Y-%m-%d}*.parquet")))
+    summary = detect_files(files, severity=args.severity)
+    print(f"{summary['anomalies']} anomalia(s); LLM {'liberado' if summary['enrich'] else 'dispensado'}"
+          + (f" para {', '.join('/'.join(p) for p in summary['pairs'])}" if summary["pairs"] else ""))
@@ -0,0 +1,140 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from src import compact_schema
+from src.logging_config import get_logger
+
+SILVER_DIR = os.path.join(os.path.dirname(__file__), "../data/silver")
+
+# Chave composta (par << 32 | timestamp em segundos): uma única busca binária
+# vetorizada resolve consultas de moedas diferentes ao mesmo tempo
+_TS_BITS = 32
+
+
+def to_epoch_seconds(values):
+    """Converte timestamps (ISO, datetime, epoch em segundos) para int64 em segundos UTC"""
+    values = np.atleast_1d(values)
+    if np.issubdtype(values.dtype, np.number):
+        return values.astype("int64")
+    ts = pd.to_datetime(pd.Series(values), utc=True, format="ISO8601")
+    return ts.astype("datetime64[s, UTC]").astype("int64").to_numpy()
+
+
+class AsOfIndex:
+    """
+    Índice em memória para consultas "qual era a taxa X->Y no instante t".
+    Guarda, por par (base, alvo), arrays ordenados de retrieved_at e taxas;
+    a consulta devolve a última cotação com retrieved_at <= t (NaN se não houver).
+    """
+
+    def __init__(self):
+        self.pairs = {}
+        self.keys = np.empty(0, dtype="int64")
+        self.rates = np.empty(0, dtype="float64")
+        self._seen = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _pair_ids(self, bases, targets, create=False):
+        ids = np.empty(len(bases), dtype="int64")
+        for i, pair in enumerate(zip(bases, targets)):
+            pid = self.pairs.get(pair)
+            if pid is None:
+                if not create:
+                    pid = -1
+                else:
+                    pid = self.pairs[pair] = len(self.pairs)
+            ids[i] = pid
+        return ids
+
+    def add(self, df):
+        """Incorpora linhas (base_currency, target_currency, rate, retrieved_at)"""
+        if df.empty:
+            return 0
+        pairs = pd.MultiIndex.from_arrays([df["base_currency"], df["target_currency"]])
+        uniques = pairs.unique()
+        unique_ids = self._pair_ids(uniques.get_level_values(0), uniques.get_level_values(1), create=True)
+        pair_ids = unique_ids[uniques.get_indexer(pairs)]
+
+        keys = (pair_ids << _TS_BITS) | to_epoch_seconds(df["retrieved_at"].to_numpy())
+        keys = np.concatenate([self.keys, keys])
+        rates = np.concatenate([self.rates, df["rate"].to_numpy(dtype="float64")])
+
+        # Ordena e remove chaves repetidas (mesmo par e instante: fica a última)
+        order = np.argsort(keys, kind="stable")
+        keys, rates = keys[order], rates[order]
+        last = np.append(keys[1:] != keys[:-1], True)
+        self.keys, self.rates = keys[last], rates[last]
+        return len(df)
+
+    def lookup(self, base, target, ts):
+        """Consulta pontual: taxa base->target vigente em `ts`"""
+        pid = self.pairs.get((base, target))
+        if pid is None:
+            return float("nan")
+        ts = int(to_epoch_seconds(ts)[0])  # mesma conversão do lookup_many (ingênuo = UTC)
+        pos = int(np.searchsorted(self.keys, (pid << _TS_BITS) | ts, side="right")) - 1
+        if pos < 0 or (int(self.keys[pos]) >> _TS_BITS) != pid:
+            return float("nan")
+        return float(self.rates[pos])
+
+    def lookup_many(self, bases, targets, timestamps):
+        """Consulta em lote (arrays de mesmo tamanho), totalmente vetorizada"""
+        bases, targets = np.asarray(bases, dtype=object), np.asarray(targets, dtype=object)
+        pair_ids = self._pair_ids_vectorized(bases, targets)
+        return self.lookup_ids(pair_ids, to_epoch_seconds(timestamps))
+
+    def _pair_ids_vectorized(self, bases, targets):
+        queries = pd.MultiIndex.from_arrays([bases, targets])
+        uniques = queries.unique()
+        unique_ids = self._pair_ids(uniques.get_level_values(0), uniques.get_level_values(1))
+        return unique_ids[uniques.get_indexer(queries)]
+
+    def lookup_ids(self, pair_ids, ts):
+        """Caminho rápido: ids de par (ver pair_id) e timestamps em segundos já convertidos"""
+        pair_ids = np.asarray(pair_ids, dtype="int64")
+        query = (pair_ids << _TS_BITS) | np.asarray(ts, dtype="int64")
+        if not len(self.keys):
+            return np.full(len(query), np.nan)
+        # Consultas ordenadas tornam a busca binária bem mais amigável ao cache
+        order = np.argsort(query, kind="stable")
+        pos = np.empty(len(query), dtype="int64")
+        pos[order] = np.searchsorted(self.keys, query[order], side="right") - 1
+        safe = np.clip(pos, 0, None)
+        found = (pos >= 0) & (pair_ids >= 0) & ((self.keys[safe] >> _TS_BITS) == pair_ids)
+        return np.where(found, self.rates[safe], np.nan)
+
+    def pair_id(self, base, target):
+        return self.pairs.get((base, target), -1)
+
+    def refresh(self, silver_dir=SILVER_DIR, gold_dir=None, run_id=None):
+        """
+        Lê apenas arquivos novos ou alterados (mtime/tamanho) desde a última chamada.
+        Por padrão usa o silver (todas as coletas intradiárias); `gold_dir` adiciona o gold.
+        """
+        logger = get_logger(run_id=run_id, service="asof")
+        paths = sorted(glob.glob(os.path.join(silver_dir, "*.parquet")))
+        if gold_dir:
+            paths += sorted(glob.glob(os.path.join(gold_dir, "????-??-??.parquet")))
+
+        columns = ["base_currency", "target_currency", "rate", "retrieved_at"]
+        added = 0
+        for path in paths:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self._seen.get(path) == stamp:
+                continue
+            added += self.add(compact_schema.read_frame(path, columns=columns))
+            self._seen[path] = stamp
+
+        logger.info("asof_refresh_ok", rows_added=added, rows=len(self), pairs=len(self.pairs))
+        return added
+
+
+def build_index(silver_dir=SILVER_DIR, gold_dir=None):
+    """Cria e popula um índice a partir dos arquivos em disco"""
+    index = AsOfIndex()
+    index.refresh(silver_dir=silver_dir, gold_dir=gold_dir)
+    return index
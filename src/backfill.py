@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import pyarrow.parquet as pq
+from src import transform, load, bars
+from src.logging_config import configure_logging, get_logger, get_run_id, log_metrics
+
+CHECKPOINT_NAME = "_backfill_checkpoint.json"
+
+
+def date_range(start, end):
+    """Datas YYYY-MM-DD de start até end (inclusive)"""
+    day = datetime.strptime(start, "%Y-%m-%d").date()
+    last = datetime.strptime(end, "%Y-%m-%d").date()
+    dates = []
+    while day <= last:
+        dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
+
+
+def raw_files_by_date(dates, raw_dir=None):
+    """Snapshots brutos agrupados por data (uma única listagem do diretório raw)"""
+    wanted = set(dates)
+    groups = defaultdict(list)
+    for path in sorted((raw_dir or transform.RAW_DIR).glob("*.json")):
+        date_str = path.name[:10]
+        if date_str in wanted:
+            groups[date_str].append(str(path))
+    return groups
+
+
+def load_checkpoint(checkpoint_file=None):
+    """Datas já concluídas ({data: {raw_files, rows, finished_at}})"""
+    checkpoint_file = checkpoint_file or os.path.join(load.GOLD_DIR, CHECKPOINT_NAME)
+    if not os.path.exists(checkpoint_file):
+        return {}
+    with open(checkpoint_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint, checkpoint_file=None):
+    """Grava o checkpoint de forma atômica"""
+    checkpoint_file = checkpoint_file or os.path.join(load.GOLD_DIR, CHECKPOINT_NAME)
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, checkpoint_file)
+
+
+def backfill_day(date_str, raw_files, run_id=None):
+    """Transform + load de uma data (executado em um processo do pool)"""
+    silver_files = transform.transform_files(
+        raw_files, run_id=run_id, silver_dir=transform.SILVER_DIR, rejects_dir=transform.REJECTS_DIR
+    )
+    rows = sum(pq.ParquetFile(f).metadata.num_rows for f in silver_files)
+    gold_file = load.aggregate_silver_files(run_id=run_id, date_str=date_str)
+    return {"date": date_str, "rows": rows, "gold_file": gold_file, "silver_files": [str(f) for f in silver_files]}
+
+
+def backfill(start, end, max_workers=None, force=False, run_id=None, checkpoint_file=None):
+    """
+    Reprocessa raw -> silver -> gold para um intervalo de datas em paralelo (uma data por tarefa).
+    Datas concluídas vão para o checkpoint assim que terminam, então uma execução
+    interrompida retoma de onde parou; a carga continua idempotente (manifesto + dedup).
+    Uma data só é pulada se o número de snapshots brutos não mudou desde o checkpoint.
+    """
+    logger = get_logger(run_id=run_id, service="backfill")
+    start_time = time.time()
+    dates = date_range(start, end)
+    groups = raw_files_by_date(dates)
+    checkpoint = {} if force else load_checkpoint(checkpoint_file)
+
+    todo = []
+    for date_str in dates:
+        raw_files = groups.get(date_str)
+        if not raw_files:
+            continue
+        done = checkpoint.get(date_str)
+        if done and done["raw_files"] == len(raw_files):
+            continue
+        todo.append(date_str)
+
+    logger.info("backfill_start", start=start, end=end, dates=len(todo),
+                skipped=len(groups) - len(todo), missing=len(dates) - len(groups))
+
+    completed, failed, rows = [], {}, 0
+
+    def record(result):
+        nonlocal rows
+        date_str = result["date"]
+        # Barras intradiárias: atualizadas aqui, no processo principal, porque datas
+        # diferentes podem cair na mesma partição (mês) de barras
+        bars.update_bars(result["silver_files"], bars_dir=os.path.join(load.GOLD_DIR, "bars"), run_id=run_id)
+        checkpoint[date_str] = {
+            "raw_files": len(groups[date_str]),
+            "rows": result["rows"],
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        save_checkpoint(checkpoint, checkpoint_file)
+        completed.append(date_str)
+        rows += result["rows"]
+        elapsed = time.time() - start_time
+        logger.info(
+            "backfill_progress",
+            date=date_str,
+            done=len(completed),
+            total=len(todo),
+            days_per_second=round(len(completed) / elapsed, 2),
+            rows_per_second=round(rows / elapsed, 1),
+        )
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(todo) <= 1:
+        for date_str in todo:
+            try:
+                record(backfill_day(date_str, groups[date_str], run_id))
+            except Exception as e:
+                failed[date_str] = str(e)
+                logger.error("backfill_day_failed", date=date_str, error=str(e))
+    else:
+        with ProcessPoolExecutor(max_workers) as pool:
+            futures = {pool.submit(backfill_day, d, groups[d], run_id): d for d in todo}
+            for future in as_completed(futures):
+                date_str = futures[future]
+                try:
+                    record(future.result())
+                except Exception as e:
+                    failed[date_str] = str(e)
+                    logger.error("backfill_day_failed", date=date_str, error=str(e))
+
+    elapsed = time.time() - start_time
+    log_metrics(logger, "backfill", rows, elapsed)
+    logger.info("backfill_end", completed=len(completed), failed=len(failed), rows=rows,
+                days_per_second=round(len(completed) / elapsed, 2) if elapsed else None)
+    return {"completed": sorted(completed), "failed": failed, "rows": rows, "elapsed_seconds": round(elapsed, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill raw -> silver -> gold por intervalo de datas")
+    parser.add_argument("--start", required=True, help="Data inicial (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="Data final (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, help="Processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--force", action="store_true", help="Ignora o checkpoint e reprocessa tudo")
+    parser.add_argument("--log-mode", default=os.getenv("LOG_MODE", "queue"), choices=["queue", "sync"],
+                        help="queue: logs gravados em lote por uma thread de fundo")
+    args = parser.parse_args()
+    configure_logging(mode=args.log_mode)
+
+    summary = backfill(args.start, args.end, max_workers=args.workers, force=args.force, run_id=get_run_id())
+    print(f"{len(summary['completed'])} datas concluídas, {summary['rows']} linhas em {summary['elapsed_seconds']}s")
+    if summary["failed"]:
+        print(f"Falhas: {summary['failed']}")
+        raise SystemExit(1)
@@ -0,0 +1,253 @@
+"""
+Barras OHLC dos snapshots intradiários (silver), por moeda e intervalo (hourly/daily/weekly).
+
+O gold diário guarda só o último snapshot de cada dia; as barras preservam todos:
+open/high/low/close, count (snapshots na barra) e vwap. Como a API não informa volume,
+cada snapshot pesa 1 e o vwap é a média das cotações da barra (rate_sum / count).
+
+As barras ficam em data/gold/bars/<intervalo>/<YYYY-MM>.parquet (mês do início da barra) e
+são atualizadas incrementalmente: os instantes de coleta já incorporados ficam nos metadados
+do arquivo, então reprocessar um snapshot não o conta duas vezes e snapshots fora de ordem
+(ex.: backfill em paralelo) entram na barra certa.
+
+Uso:
+    python -m src.bars                                  # silver do dia atual
+    python -m src.bars data/silver/2025-09-29*.parquet --intervals hourly daily
+    python -m src.bars --rebuild                        # recalcula tudo a partir do silver
+"""
+import os
+import glob
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.asof import to_epoch_seconds
+from src.config import UNSET, resolve
+from src.logging_config import get_logger, log_metrics
+
+GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
+SILVER_DIR = os.path.join(os.path.dirname(__file__), "../data/silver")
+BARS_DIR = os.path.join(GOLD_DIR, "bars")
+
+# Duração de cada intervalo em segundos (weekly: semanas começando na segunda-feira)
+INTERVALS = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400}
+# Intervalos gerados pelo pipeline; UNSET: BAR_INTERVALS (ex.: "hourly,daily,weekly")
+ENABLED_INTERVALS = UNSET
+
+KEYS = ["interval_start", "base_currency", "target_currency"]
+COLUMNS = KEYS + ["open", "high", "low", "close", "count", "vwap", "rate_sum", "first_at", "last_at"]
+SNAPSHOTS_KEY = b"bars.snapshots"
+
+
+def enabled_intervals():
+    value = resolve(ENABLED_INTERVALS, "bar_intervals")
+    intervals = [v.strip() for v in value.split(",") if v.strip()] if isinstance(value, str) else list(value)
+    unknown = set(intervals) - set(INTERVALS)
+    if unknown:
+        raise ValueError(f"Intervalos inválidos: {sorted(unknown)}")
+    return intervals
+
+
+def bucket_start(epoch_seconds, interval):
+    """Início da barra (epoch em segundos, UTC) de cada instante"""
+    ts = np.asarray(epoch_seconds, dtype="int64")
+    if interval == "weekly":
+        days = ts // 86400
+        # 1970-01-01 foi uma quinta-feira: recua até a segunda-feira anterior
+        return (days - (days + 3) % 7) * 86400
+    return ts // INTERVALS[interval] * INTERVALS[interval]
+
+
+def rollup(rows, interval):
+    """
+    Linhas (base_currency, target_currency, rate, ts em epoch s) -> barras do intervalo.
+    Totalmente vetorizado: um sort e um groupby por chamada.
+    """
+    data = rows.assign(interval_start=bucket_start(rows["ts"].to_numpy(), interval))
+    data = data.sort_values("ts", kind="stable")
+    bars = data.groupby(KEYS, sort=True).agg(
+        open=("rate", "first"),
+        high=("rate", "max"),
+        low=("rate", "min"),
+        close=("rate", "last"),
+        count=("rate", "size"),
+        rate_sum=("rate", "sum"),
+        first_at=("ts", "min"),
+        last_at=("ts", "max"),
+    ).reset_index()
+    bars["vwap"] = bars["rate_sum"] / bars["count"]
+    return bars[COLUMNS]
+
+
+def merge_bars(existing, new):
+    """Combina barras parciais da mesma chave (associativo: vale em qualquer ordem de chegada)"""
+    if existing is None or existing.empty:
+        return new
+    combined = pd.concat([existing[COLUMNS], new[COLUMNS]], ignore_index=True)
+    combined = combined.sort_values("first_at", kind="stable").reset_index(drop=True)
+    groups = combined.groupby(KEYS, sort=True)
+    bars = groups.agg(
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        count=("count", "sum"),
+        rate_sum=("rate_sum", "sum"),
+        first_at=("first_at", "min"),
+        last_at=("last_at", "max"),
+    )
+    bars["close"] = combined.loc[groups["last_at"].idxmax(), "close"].to_numpy()
+    bars["vwap"] = bars["rate_sum"] / bars["count"]
+    return bars.reset_index()[COLUMNS]
+
+
+def _read_partition(path):
+    """(barras, {base: instantes de coleta já incorporados}) de uma partição"""
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(path):
+        return None, {}
+    table = pq.read_table(path)
+    snapshots = json.loads((table.schema.metadata or {}).get(SNAPSHOTS_KEY, b"{}"))
+    bars = table.to_pandas()
+    bars["interval_start"] = bars["interval_start"].to_numpy().astype("datetime64[s]").astype("int64")
+    return bars, snapshots
+
+
+def _write_partition(bars, snapshots, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    bars = bars.sort_values(["target_currency", "interval_start"], kind="stable")
+    bars = bars.assign(interval_start=bars["interval_start"].to_numpy().astype("datetime64[s]"))
+    table = pa.Table.from_pandas(bars, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), SNAPSHOTS_KEY: json.dumps(snapshots).encode()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table.replace_schema_metadata(metadata), f"{path}.tmp", compression="zstd",
+                   use_dictionary=["base_currency", "target_currency"])
+    os.replace(f"{path}.tmp", path)
+
+
+def _rows(files):
+    from src import compact_schema
+
+    columns = ["base_currency", "target_currency", "rate", "retrieved_at"]
+    frames = [compact_schema.read_frame(f, columns=columns) for f in files]
+    if not frames:
+        return pd.DataFrame(columns=["base_currency", "target_currency", "rate", "ts"])
+    df = pd.concat(frames, ignore_index=True).dropna(subset=["rate"])
+    df["ts"] = to_epoch_seconds(df.pop("retrieved_at").to_numpy())
+    return df
+
+
+def update_bars(files, intervals=None, bars_dir=BARS_DIR, run_id=None):
+    """
+    Incorpora os snapshots dos arquivos silver às barras de cada intervalo.
+    Só as partições (meses) tocadas pelos snapshots novos são reescritas.
+    Retorna os arquivos de barras atualizados.
+    """
+    logger = get_logger(run_id=run_id, service="bars")
+    start = time.time()
+    rows = _rows(files)
+    outputs, added = [], 0
+
+    for interval in intervals or enabled_intervals():
+        interval_added = 0
+        starts = bucket_start(rows["ts"].to_numpy(), interval)
+        months = starts.astype("datetime64[s]").astype("datetime64[M]")
+        for month in np.unique(months):
+            path = os.path.join(bars_dir, interval, f"{month}.parquet")  # YYYY-MM
+            part = rows[months == month]
+            existing, snapshots = _read_partition(path)
+
+            # Snapshots já incorporados (mesma base e instante de coleta) são ignorados
+            seen = pd.MultiIndex.from_tuples(
+                [(base, ts) for base, stamps in snapshots.items() for ts in stamps], names=["base_currency", "ts"]
+            )
+            part = part[~pd.MultiIndex.from_frame(part[["base_currency", "ts"]]).isin(seen)]
+            if part.empty:
+                continue
+
+            bars = merge_bars(existing, rollup(part, interval))
+            for base, group in part.groupby("base_currency"):
+                snapshots[base] = sorted(set(snapshots.get(base, [])) | set(group["ts"].tolist()))
+            _write_partition(bars, snapshots, path)
+            outputs.append(path)
+            interval_added += len(part)
+        added = max(added, interval_added)
+
+    logger.info("bars_ok", rows=len(rows), rows_added=added, arquivos=len(outputs))
+    log_metrics(logger, "bars", added, time.time() - start)
+    return outputs
+
+
+def rebuild(silver_dir=SILVER_DIR, intervals=None, bars_dir=BARS_DIR, run_id=None):
+    """Recalcula todas as barras a partir do silver (ex.: depois de mudar os intervalos)"""
+    intervals = intervals or enabled_intervals()
+    for interval in intervals:
+        shutil.rmtree(os.path.join(bars_dir, interval), ignore_errors=True)
+    files = sorted(glob.glob(os.path.join(silver_dir, "*.parquet")))
+    return update_bars(files, intervals=intervals, bars_dir=bars_dir, run_id=run_id)
+
+
+def partition_files(interval, start=None, end=None, bars_dir=BARS_DIR):
+    """Partições (meses) do intervalo com barras iniciadas entre start e end (datas)"""
+    files = sorted(glob.glob(os.path.join(bars_dir, interval, "????-??.parquet")))
+    return [
+        f for f in files
+        if (start is None or os.path.basename(f)[:7] >= str(start)[:7])
+        and (end is None or os.path.basename(f)[:7] <= str(end)[:7])
+    ]
+
+
+def read_bars(interval, start=None, end=None, currencies=None, columns=None, bars_dir=BARS_DIR):
+    """
+    Barras do intervalo com início entre start e end (inclusive), com o filtro de moeda
+    empurrado para a leitura do Parquet. interval_start vem como datetime64 (UTC).
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    columns = columns or COLUMNS
+    files = partition_files(interval, start, end, bars_dir)
+    if not files:
+        return pd.DataFrame(columns=columns)
+    expr = ds.field("target_currency").isin(list(currencies)) if currencies else None
+    if start is not None:
+        expr = _and(expr, ds.field("interval_start") >= pa.scalar(pd.Timestamp(start), pa.timestamp("s")))
+    if end is not None:
+        limit = pd.Timestamp(end) + pd.Timedelta(days=1)
+        expr = _and(expr, ds.field("interval_start") < pa.scalar(limit, pa.timestamp("s")))
+    tables = [ds.dataset(f, format="parquet").to_table(columns=columns, filter=expr) for f in files]
+    return pa.concat_tables(tables).to_pandas()
+
+
+def _and(expr, other):
+    return other if expr is None else expr & other
+
+
+def as_rates(bars, value="close"):
+    """Barras no formato longo de metrics (date, target_currency, rate), ex.: compute_metrics(as_rates(b))"""
+    return pd.DataFrame({
+        "date": bars["interval_start"],
+        "target_currency": bars["target_currency"],
+        "rate": bars[value],
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barras OHLC (hourly/daily/weekly) a partir dos snapshots do silver")
+    parser.add_argument("files", nargs="*", help="Arquivos silver (padrão: os do dia atual)")
+    parser.add_argument("--intervals", nargs="+", choices=list(INTERVALS), help="Padrão: BAR_INTERVALS")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcula as barras a partir de todo o silver")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        outputs = rebuild(intervals=args.intervals)
+    else:
+        files = args.files or sorted(glob.glob(os.path.join(SILVER_DIR, f"{datetime.utcnow():%Y-%m-%d}*.parquet")))
+        outputs = update_bars(files, intervals=args.intervals)
+    for path in outputs:
+        print(f"Barras atualizadas: {path}")
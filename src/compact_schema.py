@@ -0,0 +1,434 @@
+"""
+Esquema compacto para o histórico silver/gold (opção PARQUET_SCHEMA=compact).
+
+- base_currency/target_currency: dictionary<int16> sobre a tabela fixa CURRENCY_CODES
+- date: date32; retrieved_at do silver: timestamp[us] (no gold continua int64, epoch em segundos)
+- run_id/pipeline_version: metadados chave-valor do Parquet em vez de colunas repetidas por linha
+- rate: float64 com codificação BYTE_STREAM_SPLIT (sem perda; comprime melhor que PLAIN)
+
+read_table/read_frame devolvem o formato antigo (strings, uma coluna por metadado) para
+quem já consome silver/gold, com arquivos antigos ou compactos; compact=True mantém o
+formato enxuto (categorias e datas). Leitores de históricos longos (gold_dataset,
+dashboard, llm_batch) usam read_history.
+
+Linhagem: o arquivo compacto guarda só o último run_id e a lista de run_ids, não o run_id
+de cada linha. No formato antigo, esse último run_id é repetido em todas as linhas; a
+carga no banco (load.bulk_upsert) só troca run_id/pipeline_version de linhas cujo valor
+mudou, então linhas já carregadas mantêm a execução que as gravou.
+
+Uso:
+    python -m src.compact_schema migrate --gold --silver      # converte arquivos existentes
+    python -m src.compact_schema migrate --gold --to legacy   # volta ao formato antigo
+    python -m src.compact_schema validate data/gold/2025-09-29.parquet
+"""
+import os
+import glob
+import json
+import argparse
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from src.config import UNSET, resolve
+from src.logging_config import get_logger
+
+# "legacy" ou "compact"; UNSET: PARQUET_SCHEMA (src.config)
+SCHEMA = UNSET
+
+SCHEMA_KEY = b"exchange_rate.schema"
+SCHEMA_VERSION = b"compact-v1"
+
+# Tabela ISO 4217 (ativas e as retiradas recentemente que ainda aparecem no histórico).
+# A posição é o código gravado: novas moedas entram sempre no FIM da tupla.
+ISO_4217 = (
+    "AED", "AFN", "ALL", "AMD", "ANG", "AOA", "ARS", "AUD", "AWG", "AZN", "BAM", "BBD", "BDT", "BGN",
+    "BHD", "BIF", "BMD", "BND", "BOB", "BOV", "BRL", "BSD", "BTN", "BWP", "BYN", "BZD", "CAD", "CDF",
+    "CHE", "CHF", "CHW", "CLF", "CLP", "CNY", "COP", "COU", "CRC", "CUC", "CUP", "CVE", "CZK", "DJF",
+    "DKK", "DOP", "DZD", "EGP", "ERN", "ETB", "EUR", "FJD", "FKP", "GBP", "GEL", "GHS", "GIP", "GMD",
+    "GNF", "GTQ", "GYD", "HKD", "HNL", "HRK", "HTG", "HUF", "IDR", "ILS", "INR", "IQD", "IRR", "ISK",
+    "JMD", "JOD", "JPY", "KES", "KGS", "KHR", "KMF", "KPW", "KRW", "KWD", "KYD", "KZT", "LAK", "LBP",
+    "LKR", "LRD", "LSL", "LYD", "MAD", "MDL", "MGA", "MKD", "MMK", "MNT", "MOP", "MRU", "MUR", "MVR",
+    "MWK", "MXN", "MXV", "MYR", "MZN", "NAD", "NGN", "NIO", "NOK", "NPR", "NZD", "OMR", "PAB", "PEN",
+    "PGK", "PHP", "PKR", "PLN", "PYG", "QAR", "RON", "RSD", "RUB", "RWF", "SAR", "SBD", "SCR", "SDG",
+    "SEK", "SGD", "SHP", "SLE", "SLL", "SOS", "SRD", "SSP", "STN", "SVC", "SYP", "SZL", "THB", "TJS",
+    "TMT", "TND", "TOP", "TRY", "TTD", "TWD", "TZS", "UAH", "UGX", "USD", "USN", "UYI", "UYU", "UYW",
+    "UZS", "VED", "VES", "VND", "VUV", "WST", "XAF", "XAG", "XAU", "XBA", "XBB", "XBC", "XBD", "XCD",
+    "XCG", "XDR", "XOF", "XPD", "XPF", "XPT", "XSU", "XTS", "XUA", "XXX", "YER", "ZAR", "ZMW", "ZWG",
+    "ZWL",
+)
+# Códigos fora da ISO 4217 publicados pelo provedor (dependências da coroa e ilhas do Pacífico)
+PROVIDER_CODES = ("FOK", "GGP", "IMP", "JEP", "KID", "TVD")
+CURRENCY_CODES = ISO_4217 + PROVIDER_CODES
+CURRENCY_DICTIONARY = pa.array(CURRENCY_CODES, type=pa.string())
+CURRENCY_TYPE = pa.dictionary(pa.int16(), pa.string())
+
+CURRENCY_COLUMNS = ["base_currency", "target_currency"]
+METADATA_COLUMNS = ["run_id", "pipeline_version"]
+
+# Formato antigo, por camada (usado pelo validador)
+LEGACY_TYPES = {
+    "gold": {"date": pa.string(), "base_currency": pa.string(), "target_currency": pa.string(),
+             "rate": pa.float64(), "retrieved_at": pa.int64(), "run_id": pa.string(),
+             "pipeline_version": pa.string()},
+    "silver": {"base_currency": pa.string(), "target_currency": pa.string(), "rate": pa.float64(),
+               "retrieved_at": pa.string(), "date": pa.string()},
+}
+COMPACT_TYPES = {
+    "gold": {"date": pa.date32(), "base_currency": CURRENCY_TYPE, "target_currency": CURRENCY_TYPE,
+             "rate": pa.float64(), "retrieved_at": pa.int64()},
+    "silver": {"base_currency": CURRENCY_TYPE, "target_currency": CURRENCY_TYPE, "rate": pa.float64(),
+               "retrieved_at": pa.timestamp("us"), "date": pa.date32()},
+}
+
+WRITE_OPTIONS = {
+    "compression": "zstd",
+    "use_dictionary": CURRENCY_COLUMNS,
+    "use_byte_stream_split": ["rate"],
+}
+
+
+def enabled():
+    """True quando silver/gold devem ser gravados no esquema compacto"""
+    return resolve(SCHEMA, "parquet_schema") == "compact"
+
+
+def is_compact(schema):
+    return bool(schema.metadata) and schema.metadata.get(SCHEMA_KEY) == SCHEMA_VERSION
+
+
+def encode_currencies(values, strict=True):
+    """
+    Códigos de moeda -> dictionary<int16> sobre CURRENCY_CODES (erro para códigos fora da tabela).
+    strict=False (só leitura): com códigos fora da tabela a coluna usa um dicionário próprio.
+    """
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    indices = pc.index_in(values, value_set=CURRENCY_DICTIONARY)
+    unknown = pc.and_(pc.is_null(indices), pc.is_valid(values))
+    if pc.any(unknown).as_py():
+        if not strict:
+            return values.cast(CURRENCY_TYPE)
+        codes = sorted(set(pc.filter(values, unknown).to_pylist()))
+        raise ValueError(f"Moedas fora da tabela ISO 4217/provedor: {codes}")
+    return pa.DictionaryArray.from_arrays(indices.cast(pa.int16()), CURRENCY_DICTIONARY)
+
+
+def _parse_timestamps(values):
+    """Timestamps ISO -> timestamp[us] (UTC sem fuso); aceita offsets ("+00:00", "Z")"""
+    try:
+        return pc.cast(values, pa.timestamp("us"))
+    except pa.ArrowInvalid:
+        import pandas as pd
+
+        parsed = pd.to_datetime(values.to_pandas(), utc=True, format="ISO8601").dt.tz_localize(None)
+        return pa.array(parsed, type=pa.timestamp("us"))
+
+
+def _metadata_values(table):
+    """Metadados da execução a partir das colunas por linha (vale o último valor gravado)"""
+    values = {}
+    for name in METADATA_COLUMNS:
+        if name in table.column_names and table.num_rows:
+            column = table.column(name)
+            values[name] = column[-1].as_py()
+            if name == "run_id":
+                values["run_ids"] = sorted(v for v in pc.unique(column).to_pylist() if v is not None)
+    return values
+
+
+def merge_metadata(*values):
+    """Combina metadados de execução: run_ids somados; run_id/pipeline_version do último informado"""
+    merged = {}
+    for item in values:
+        run_ids = set(merged.get("run_ids", [])) | set(item.get("run_ids", []))
+        merged.update({k: v for k, v in item.items() if v is not None})
+        if run_ids:
+            merged["run_ids"] = sorted(run_ids)
+    return merged
+
+
+def schema_metadata(values):
+    """Metadados de execução -> chaves exchange_rate.* do schema Parquet"""
+    return {f"exchange_rate.{k}".encode(): json.dumps(v).encode() for k, v in values.items()}
+
+
+def run_metadata(path):
+    """Metadados de execução de um arquivo, compacto ou antigo, sem ler as cotações"""
+    schema = pq.read_schema(path)
+    values = file_metadata(schema)
+    names = [c for c in METADATA_COLUMNS if c in schema.names]
+    if names:
+        values = merge_metadata(values, _metadata_values(pq.read_table(path, columns=names)))
+    return values
+
+
+def _compact_columns(table, strict=True):
+    """Colunas no esquema compacto, sem as de metadados"""
+    columns, fields = [], []
+    for field, column in zip(table.schema, table.columns):
+        if field.name in METADATA_COLUMNS:
+            continue
+        if field.name in CURRENCY_COLUMNS:
+            column = encode_currencies(column, strict=strict)
+        elif field.name == "date" and not pa.types.is_date32(field.type):
+            column = pc.cast(column, pa.date32())
+        elif field.name == "retrieved_at" and pa.types.is_string(field.type):
+            column = _parse_timestamps(column)
+        columns.append(column)
+        fields.append(pa.field(field.name, column.type))
+    return columns, fields
+
+
+def to_compact(table, **metadata):
+    """
+    Tabela no formato antigo -> esquema compacto.
+    run_id/pipeline_version saem das linhas e vão para os metadados (com a lista de
+    run_ids distintos do arquivo); `metadata` acrescenta ou substitui chaves.
+    """
+    if is_compact(table.schema):
+        return table
+    values = {**_metadata_values(table), **{k: v for k, v in metadata.items() if v is not None}}
+    columns, fields = _compact_columns(table)
+
+    metadata = {SCHEMA_KEY: SCHEMA_VERSION, **schema_metadata(values)}
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields, metadata=metadata))
+
+
+def file_metadata(schema):
+    """Metadados da execução gravados no arquivo compacto ({run_id, run_ids, pipeline_version})"""
+    prefix = b"exchange_rate."
+    return {
+        key[len(prefix):].decode(): json.loads(value)
+        for key, value in (schema.metadata or {}).items()
+        if key.startswith(prefix) and key != SCHEMA_KEY
+    }
+
+
+def to_legacy(table):
+    """
+    Esquema compacto -> formato antigo (strings; run_id/pipeline_version de volta como colunas).
+    O run_id por linha não existe no arquivo compacto: todas as linhas recebem o último run_id.
+    """
+    if not is_compact(table.schema):
+        return table
+    metadata = file_metadata(table.schema)
+    columns, names = [], []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_dictionary(field.type):
+            column = column.cast(pa.string())
+        elif pa.types.is_date32(field.type):
+            column = column.cast(pa.string())
+        elif pa.types.is_timestamp(field.type):
+            column = pc.replace_substring(column.cast(pa.string()), " ", "T")
+        columns.append(column)
+        names.append(field.name)
+    for name in METADATA_COLUMNS:
+        if name in metadata:
+            columns.append(pa.array([metadata[name]] * table.num_rows, type=pa.string()))
+            names.append(name)
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def _unify_currencies(table):
+    """Dicionário do arquivo (só as moedas presentes) -> tabela fixa, para concatenar arquivos"""
+    for name in CURRENCY_COLUMNS:
+        if name in table.column_names and pa.types.is_dictionary(table.schema.field(name).type):
+            i = table.column_names.index(name)
+            table = table.set_column(i, pa.field(name, CURRENCY_TYPE), encode_currencies(table.column(name)))
+    return table
+
+
+def read_table(path, columns=None, filters=None, compact=False):
+    """
+    Lê um arquivo silver/gold em qualquer dos dois esquemas.
+    compact=False: formato antigo (compatível com o código existente).
+    compact=True: arquivos compactos ficam compactos, com moedas na tabela fixa.
+    """
+    schema = pq.read_schema(path)
+    if not is_compact(schema):
+        return pq.read_table(path, columns=columns, filters=filters)
+
+    wanted = None if columns is None else [c for c in columns if c not in METADATA_COLUMNS]
+    table = pq.read_table(path, columns=wanted, filters=filters)
+    table = table.replace_schema_metadata(schema.metadata)
+    if compact:
+        return _unify_currencies(table)
+    table = to_legacy(table)
+    return table if columns is None else table.select([c for c in columns if c in table.column_names])
+
+
+def read_frame(path, columns=None, compact=False):
+    """read_table em DataFrame; compact=True: moedas como category e datas como datetime64"""
+    if not compact and not is_compact(pq.read_schema(path)):
+        import pandas as pd
+
+        return pd.read_parquet(path, columns=columns)
+    table = read_table(path, columns=columns, compact=compact)
+    if compact:
+        return table.to_pandas(date_as_object=False)
+    return table.to_pandas()
+
+
+def read_history(paths, columns=None, filters=None):
+    """
+    Histórico de vários arquivos (antigos e compactos misturados) em formato enxuto:
+    moedas como category, datas como datetime64 e sem as colunas run_id/pipeline_version
+    (ver run_metadata). Devolve None sem arquivos.
+    """
+    tables = []
+    for path in paths:
+        table = read_table(path, columns=columns, filters=filters, compact=True)
+        if not is_compact(table.schema):
+            # Arquivo antigo: moedas fora da tabela fixa não impedem a leitura
+            arrays, fields = _compact_columns(table, strict=False)
+            table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+        tables.append(table.replace_schema_metadata(None))
+    if not tables:
+        return None
+    table = pa.concat_tables(tables, promote_options="permissive")
+    return table.to_pandas(date_as_object=False)
+
+
+def write_table(table, path, **metadata):
+    """Grava no esquema compacto (arquivo .tmp + os.replace)"""
+    table = to_compact(table, **metadata)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, **WRITE_OPTIONS)
+    os.replace(tmp_path, path)
+    return path
+
+
+def writer(path, schema, **metadata):
+    """ParquetWriter no esquema compacto para gravação em lotes (tabelas passam por to_compact)"""
+    compact = to_compact(schema.empty_table(), **metadata).schema
+    return pq.ParquetWriter(path, compact, **WRITE_OPTIONS)
+
+
+def validate(path, layer=None):
+    """
+    Lista de problemas do arquivo (vazia = válido). Aceita o formato antigo e o compacto;
+    layer ("gold"/"silver") é deduzida pelo tipo de retrieved_at quando omitida.
+    """
+    schema = pq.read_schema(path)
+    compact = is_compact(schema)
+    if layer is None:
+        retrieved = schema.field("retrieved_at").type if "retrieved_at" in schema.names else None
+        layer = "gold" if retrieved is not None and pa.types.is_integer(retrieved) else "silver"
+
+    problems = []
+    for name, expected in (COMPACT_TYPES if compact else LEGACY_TYPES)[layer].items():
+        if name not in schema.names:
+            problems.append(f"coluna ausente: {name}")
+            continue
+        actual = schema.field(name).type
+        if pa.types.is_dictionary(expected):
+            ok = pa.types.is_dictionary(actual) and pa.types.is_string(actual.value_type)
+        elif pa.types.is_string(expected):
+            ok = pa.types.is_string(actual) or pa.types.is_large_string(actual)
+        else:
+            ok = actual == expected
+        if not ok:
+            problems.append(f"coluna {name}: esperado {expected}, encontrado {actual}")
+
+    if compact:
+        if layer == "gold":
+            missing = [k for k in METADATA_COLUMNS if k not in file_metadata(schema)]
+            problems += [f"metadado ausente: {k}" for k in missing]
+        table = pq.read_table(path, columns=[c for c in CURRENCY_COLUMNS if c in schema.names])
+        for name in table.column_names:
+            try:
+                encode_currencies(table.column(name))
+            except ValueError as e:
+                problems.append(f"coluna {name}: {e}")
+    return problems
+
+
+def _refresh_manifest(paths):
+    """Silver reescrito: atualiza tamanho/mtime/hash no manifesto do load (sem reprocessar o gold)"""
+    from src import load
+
+    manifest = load.load_manifest()
+    entries = {}
+    for path in paths:
+        key = os.path.relpath(path, load.SILVER_DIR)
+        if key in manifest:
+            st = os.stat(path)
+            entries[key] = {**manifest[key], "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                            "sha256": load.file_digest(path)}
+    if entries:
+        load.update_manifest(entries)
+
+
+def migrate(paths, to="compact", dry_run=False, run_id=None):
+    """
+    Converte arquivos existentes para o esquema compacto (ou de volta, to="legacy").
+    Arquivos já no formato pedido são pulados. Retorna {files, skipped, bytes_before, bytes_after}.
+    """
+    logger = get_logger(run_id=run_id, service="compact_schema")
+    summary = {"files": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+    migrated = []
+    for path in paths:
+        if is_compact(pq.read_schema(path)) == (to == "compact"):
+            summary["skipped"] += 1
+            continue
+        before = os.path.getsize(path)
+        summary["files"] += 1
+        summary["bytes_before"] += before
+        if dry_run:
+            continue
+
+        table = pq.read_table(path)
+        if to == "compact":
+            write_table(table, path)
+        else:
+            pq.write_table(to_legacy(table), f"{path}.tmp", compression="snappy")
+            os.replace(f"{path}.tmp", path)
+        summary["bytes_after"] += os.path.getsize(path)
+        migrated.append(path)
+
+    _refresh_manifest(migrated)
+    logger.info("schema_migrate_ok", to=to, dry_run=dry_run, **summary)
+    return summary
+
+
+def _layer_files(gold=False, silver=False):
+    from src import load
+
+    paths = []
+    if silver:
+        paths += sorted(glob.glob(os.path.join(load.SILVER_DIR, "*.parquet")))
+    if gold:
+        paths += sorted(glob.glob(os.path.join(load.GOLD_DIR, "????-??-??.parquet")))
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Esquema compacto do silver/gold: migração e validação")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = sub.add_parser("migrate", help="Converte arquivos existentes")
+    migrate_parser.add_argument("--gold", action="store_true", help="Arquivos diários do gold")
+    migrate_parser.add_argument("--silver", action="store_true", help="Arquivos do silver")
+    migrate_parser.add_argument("--to", choices=["compact", "legacy"], default="compact")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Só lista o que seria convertido")
+
+    validate_parser = sub.add_parser("validate", help="Valida arquivos (formato antigo ou compacto)")
+    validate_parser.add_argument("paths", nargs="*", help="Padrão: gold e silver")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        paths = _layer_files(gold=args.gold, silver=args.silver)
+        summary = migrate(paths, to=args.to, dry_run=args.dry_run)
+        print(f"{summary['files']} arquivo(s) convertido(s), {summary['skipped']} já no formato; "
+              f"{summary['bytes_before']:,} -> {summary['bytes_after']:,} bytes")
+    else:
+        failed = 0
+        for path in args.paths or _layer_files(gold=True, silver=True):
+            problems = validate(path)
+            failed += bool(problems)
+            print(f"{'OK ' if not problems else 'ERRO'} {path}")
+            for problem in problems:
+                print(f"    {problem}")
+        if failed:
+            raise SystemExit(1)
@@ -0,0 +1,92 @@
+"""
+Configuração explícita do pipeline.
+Nenhum módulo lê o ambiente na importação: get_settings() carrega o .env e as
+variáveis de ambiente no primeiro uso e guarda o resultado.
+"""
+import os
+from dataclasses import dataclass, replace
+
+
+class _Unset:
+    """Marcador de "valor não sobrescrito no módulo": o valor vem de get_settings()"""
+
+    def __repr__(self):
+        return "UNSET"
+
+UNSET = _Unset()
+
+
+@dataclass(frozen=True)
+class Settings:
+    exchange_api_key: str | None = None
+    exchange_base_url: str | None = None
+    raw_storage: str = "files"
+    db_uri: str | None = None
+    openai_api_key: str | None = None
+    openai_model: str = "gpt-3.5-turbo"
+    llm_cache_ttl: int = 24 * 3600
+    llm_cache_max_entries: int = 1000
+    prompt_token_budget: int = 400
+    prompt_max_movers: int = 10
+    log_mode: str = "sync"
+    log_sample_rates: str = ""
+    pipeline_profile: bool = False
+    parquet_schema: str = "legacy"
+    anomaly_min_severity: str = "medium"
+    bar_intervals: str = "hourly,daily,weekly"
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """Lê as variáveis de ambiente (ou o dicionário `environ`); ausentes ficam no padrão"""
+        env = os.environ if environ is None else environ
+        default = cls()
+        return cls(
+            exchange_api_key=env.get("EXCHANGE_API_KEY"),
+            exchange_base_url=env.get("EXCHANGE_BASE_URL"),
+            raw_storage=env.get("RAW_STORAGE", default.raw_storage),
+            db_uri=env.get("DB_URI"),
+            openai_api_key=env.get("OPENAI_API_KEY"),
+            openai_model=env.get("OPENAI_MODEL", default.openai_model),
+            llm_cache_ttl=int(env.get("LLM_CACHE_TTL", default.llm_cache_ttl)),
+            llm_cache_max_entries=int(env.get("LLM_CACHE_MAX_ENTRIES", default.llm_cache_max_entries)),
+            prompt_token_budget=int(env.get("LLM_PROMPT_TOKEN_BUDGET", default.prompt_token_budget)),
+            prompt_max_movers=int(env.get("LLM_PROMPT_MAX_MOVERS", default.prompt_max_movers)),
+            log_mode=env.get("LOG_MODE", default.log_mode),
+            log_sample_rates=env.get("LOG_SAMPLE_RATES", default.log_sample_rates),
+            pipeline_profile=env.get("PIPELINE_PROFILE") == "1",
+            parquet_schema=env.get("PARQUET_SCHEMA", default.parquet_schema),
+            anomaly_min_severity=env.get("ANOMALY_MIN_SEVERITY", default.anomaly_min_severity),
+            bar_intervals=env.get("BAR_INTERVALS", default.bar_intervals),
+        )
+
+
+_settings = None
+
+
+def get_settings():
+    """Configuração do processo (.env + ambiente), lida no primeiro uso"""
+    global _settings
+    if _settings is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _settings = Settings.from_env()
+    return _settings
+
+
+def configure(settings=None, **overrides):
+    """Define a configuração do processo (ex.: CLI ou testes) e devolve a que ficou valendo"""
+    global _settings
+    _settings = replace(settings or get_settings(), **overrides)
+    return _settings
+
+
+def reset_settings():
+    """Descarta a configuração em memória; o próximo get_settings() relê o ambiente"""
+    global _settings
+    _settings = None
+
+
+def resolve(value, name):
+    """Valor sobrescrito no módulo (ex.: monkeypatch em ingest.API_KEY) ou o campo `name` da configuração"""
+    return getattr(get_settings(), name) if value is UNSET else value
@@ -0,0 +1,154 @@
+import os
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.asof import build_index, to_epoch_seconds
+from src.logging_config import get_logger, log_metrics
+
+PIVOT_CURRENCY = "USD"
+
+_index = None
+
+
+def _init_worker(index):
+    global _index
+    _index = index
+
+
+def cross_rates_asof(index, sources, targets, timestamps, pivot=PIVOT_CURRENCY):
+    """
+    Taxa source->target vigente em cada timestamp, triangulada pelos snapshots
+    com base `pivot`: rate(A->B) = r_B / r_A, com r_X = pivot->X (r_pivot = 1).
+    """
+    ts = to_epoch_seconds(timestamps)
+    rates = {}
+    for side, codes in (("source", sources), ("target", targets)):
+        codes = pd.Series(codes, dtype="object")
+        uniques = pd.unique(codes)
+        ids = np.array([index.pair_id(pivot, c) for c in uniques], dtype="int64")
+        pair_ids = ids[pd.Index(uniques).get_indexer(codes)]
+        r = index.lookup_ids(pair_ids, ts)
+        rates[side] = np.where(codes.to_numpy() == pivot, 1.0, r)
+    return rates["target"] / rates["source"]
+
+
+def convert_frame(df, index, target_currency=None, timestamp_col="timestamp", amount_col="amount",
+                  currency_col="currency", target_col=None):
+    """
+    Converte um bloco de transações (vetorizado); adiciona rate e converted_amount.
+    Valores saem como float64 e moedas como string em todos os blocos, para que o
+    schema do Parquet não dependa do primeiro bloco (ex.: valores inteiros).
+    """
+    targets = df[target_col].to_numpy() if target_col else np.full(len(df), target_currency, dtype=object)
+    rate = cross_rates_asof(index, df[currency_col].to_numpy(), targets, df[timestamp_col].to_numpy())
+    out = df.astype({amount_col: "float64", currency_col: "string"})
+    if target_col:
+        out[target_col] = out[target_col].astype("string")
+    else:
+        out["target_currency"] = pd.Series(target_currency, index=out.index, dtype="string")
+    out["rate"] = rate
+    out["converted_amount"] = out[amount_col].to_numpy() * rate
+    return out
+
+
+def _convert_chunk(df, options):
+    return convert_frame(df, _index, **options)
+
+
+def iter_chunks(path, chunksize=100_000):
+    """Lê CSV ou Parquet em blocos, sem carregar o arquivo inteiro"""
+    if str(path).endswith(".parquet"):
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def convert_file(input_path, output_path, target_currency="BRL", index=None, timestamp_col="timestamp",
+                 amount_col="amount", currency_col="currency", target_col=None, chunksize=100_000,
+                 max_workers=None, run_id=None):
+    """
+    Converte um arquivo de transações (CSV/Parquet) para Parquet em blocos.
+    Cada linha recebe a taxa vigente no seu timestamp (as-of) para o seu par de moedas.
+    Com max_workers > 1 os blocos são processados em paralelo; no máximo
+    2 * max_workers blocos ficam em memória ao mesmo tempo e a ordem é preservada.
+    """
+    logger = get_logger(run_id=run_id, service="convert")
+    start = time.time()
+    index = index or build_index()
+    max_workers = max_workers or os.cpu_count() or 1
+    options = {
+        "target_currency": target_currency, "timestamp_col": timestamp_col, "amount_col": amount_col,
+        "currency_col": currency_col, "target_col": target_col,
+    }
+
+    rows = missing = 0
+    writer = None
+    done = False
+    tmp_path = f"{output_path}.tmp"
+
+    def write(frame):
+        nonlocal writer, rows, missing
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(tmp_path, table.schema, compression="snappy")
+        writer.write_table(table.cast(writer.schema))
+        rows += len(frame)
+        missing += int(frame["rate"].isna().sum())
+
+    try:
+        if max_workers == 1:
+            for chunk in iter_chunks(input_path, chunksize):
+                write(convert_frame(chunk, index, **options))
+        else:
+            with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(index,)) as pool:
+                pending = deque()
+                for chunk in iter_chunks(input_path, chunksize):
+                    pending.append(pool.submit(_convert_chunk, chunk, options))
+                    if len(pending) >= 2 * max_workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        done = writer is not None
+    finally:
+        if writer is not None:
+            writer.close()
+        if not done and os.path.exists(tmp_path):
+            os.remove(tmp_path)  # falha no meio: não deixa o .tmp parcial para trás
+
+    if not done:
+        raise ValueError(f"Arquivo de transações vazio: {input_path}")
+    os.replace(tmp_path, output_path)
+
+    elapsed = time.time() - start
+    log_metrics(logger, "convert", rows, elapsed)
+    logger.info("convert_ok", arquivo=str(output_path), rows=rows, missing_rates=missing,
+                rows_per_second=round(rows / elapsed, 1) if elapsed else None)
+    return {"rows": rows, "missing_rates": missing, "output": str(output_path)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversão em lote de arquivos de transações")
+    parser.add_argument("input", help="CSV ou Parquet de transações")
+    parser.add_argument("output", help="Parquet de saída")
+    parser.add_argument("--target", default="BRL", help="Moeda de destino")
+    parser.add_argument("--target-col", help="Coluna com a moeda de destino por linha")
+    parser.add_argument("--timestamp-col", default="timestamp")
+    parser.add_argument("--amount-col", default="amount")
+    parser.add_argument("--currency-col", default="currency")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    stats = convert_file(
+        args.input, args.output, target_currency=args.target, target_col=args.target_col,
+        timestamp_col=args.timestamp_col, amount_col=args.amount_col, currency_col=args.currency_col,
+        chunksize=args.chunksize, max_workers=args.workers,
+    )
+    print(f"{stats['rows']} linhas convertidas em {stats['output']} ({stats['missing_rates']} sem taxa)")
@@ -0,0 +1,126 @@
+import os
+import json
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.logging_config import get_logger
+
+BASE_DIR = Path(__file__).parent.parent
+CROSS_DIR = BASE_DIR / "data" / "silver" / "cross"
+
+
+class CrossRateMatrix:
+    """
+    Matriz NxN de taxas cruzadas derivada de um único snapshot (base USD).
+    matrix[i, j] = quantas unidades de codes[j] valem 1 unidade de codes[i].
+    """
+
+    def __init__(self, codes, matrix, date=None, retrieved_at=None):
+        self.codes = codes
+        self.matrix = matrix
+        self.date = date
+        self.retrieved_at = retrieved_at
+        self._index = {code: i for i, code in enumerate(codes)}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def rate(self, base, target):
+        """Taxa base -> target (KeyError se a moeda não existir no snapshot)"""
+        return float(self.matrix[self._index[base], self._index[target]])
+
+    def rates(self, bases, targets):
+        """Consulta vetorizada de vários pares (listas de mesmo tamanho)"""
+        i = np.fromiter((self._index[b] for b in bases), dtype=np.intp)
+        j = np.fromiter((self._index[t] for t in targets), dtype=np.intp)
+        return self.matrix[i, j]
+
+    def rates_from(self, base):
+        """Todas as taxas a partir de uma moeda base, como Series indexada pela moeda alvo"""
+        return pd.Series(self.matrix[self._index[base]], index=self.codes, name=base)
+
+    def to_long(self, decimals=6, include_identity=False):
+        """Tabela longa (formato silver) com todos os pares da matriz"""
+        n = len(self.codes)
+        base = np.repeat(self.codes, n)
+        target = np.tile(self.codes, n)
+        rate = self.matrix.ravel()
+        if not include_identity:
+            mask = base != target
+            base, target, rate = base[mask], target[mask], rate[mask]
+
+        return pd.DataFrame({
+            "base_currency": base,
+            "target_currency": target,
+            "rate": np.round(rate, decimals),
+            "retrieved_at": self.retrieved_at,
+            "date": self.date,
+        })
+
+
+def build_cross_matrix(conversion_rates, base_code="USD"):
+    """
+    Monta a matriz de taxas cruzadas por broadcasting: rate(A->B) = r_B / r_A,
+    com r_X = cotação base_code -> X. Taxas nulas, zero ou negativas são descartadas.
+    """
+    codes = np.array(list(conversion_rates.keys()), dtype=object)
+    rates = np.array(
+        [np.nan if v is None else v for v in conversion_rates.values()], dtype="float64"
+    )
+    valid = np.isfinite(rates) & (rates > 0)
+    codes, rates = codes[valid], rates[valid]
+
+    # A base vale 1 por definição, mesmo se veio ausente, nula ou inválida no payload
+    if base_code not in codes:
+        codes = np.append(codes, base_code)
+        rates = np.append(rates, 1.0)
+
+    matrix = rates[np.newaxis, :] / rates[:, np.newaxis]
+    return codes, matrix
+
+
+def from_snapshot(data):
+    """Cria a CrossRateMatrix a partir do dict de um snapshot bruto"""
+    codes, matrix = build_cross_matrix(data["conversion_rates"], data.get("base_code", "USD"))
+    retrieved_at = data.get("_metadata", {}).get("timestamp")
+    date = retrieved_at[:10] if retrieved_at else None
+    return CrossRateMatrix(codes, matrix, date=date, retrieved_at=retrieved_at)
+
+
+@lru_cache(maxsize=32)
+def _load_cached(path, mtime_ns, size):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return from_snapshot(data)
+
+
+def load_cross_matrix(raw_file):
+    """Carrega a matriz de um arquivo raw, com cache por snapshot (caminho + mtime + tamanho)"""
+    path = os.path.abspath(raw_file)
+    st = os.stat(path)
+    return _load_cached(path, st.st_mtime_ns, st.st_size)
+
+
+def cross_rate(raw_file, base, target):
+    """Consulta pontual de um par a partir de um snapshot"""
+    return load_cross_matrix(raw_file).rate(base, target)
+
+
+def write_cross_silver(raw_file, run_id=None, out_dir=CROSS_DIR):
+    """Grava a tabela longa de todos os pares em data/silver/cross/"""
+    logger = get_logger(run_id=run_id, service="cross_rates")
+    start = datetime.utcnow()
+
+    cross = load_cross_matrix(raw_file)
+    df = cross.to_long()
+
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    outfile = Path(out_dir) / f"{Path(raw_file).stem}_cross.parquet"
+    df.to_parquet(outfile, index=False)
+
+    elapsed = (datetime.utcnow() - start).total_seconds()
+    logger.info("cross_rates_ok", arquivo=str(outfile), currencies=len(cross), pairs=len(df),
+                elapsed_seconds=round(elapsed, 4))
+    return outfile
@@ -0,0 +1,222 @@
+import os
+import glob
+import json
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow.dataset as ds
+from src import bars, gold_dataset, compact_schema
+
+GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
+DAILY_PATTERN = "????-??-??.parquet"
+
+
+def _daily_files(gold_dir):
+    return sorted(glob.glob(os.path.join(gold_dir, DAILY_PATTERN)))
+
+
+def gold_signature(gold_dir=GOLD_DIR):
+    """
+    Assinatura barata do gold (nome, mtime, tamanho de cada arquivo), usada como
+    chave do cache do dashboard: muda sempre que um arquivo é criado ou reescrito.
+    """
+    paths = (
+        _daily_files(gold_dir)
+        + sorted(glob.glob(os.path.join(gold_dir, "*insights*.json")))
+        + sorted(glob.glob(os.path.join(gold_dir, "dataset", "**", "*.parquet"), recursive=True))
+        + sorted(glob.glob(os.path.join(gold_dir, "bars", "*", "*.parquet")))
+    )
+    signature = []
+    for path in paths:
+        st = os.stat(path)
+        signature.append((os.path.relpath(path, gold_dir), st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _read_daily(files, columns, filter=None):
+    """Arquivos diários no formato antigo ou compacto (podem estar misturados), em formato enxuto"""
+    return compact_schema.read_history(files, columns=columns, filters=filter)
+
+
+@lru_cache(maxsize=8)
+def _cached_dataset_bounds(dataset_dir, signature):
+    return gold_dataset.date_bounds(dataset_dir)
+
+
+def _dataset_bounds(dataset_dir):
+    """
+    (primeira, última) data do dataset compactado, pelos rodapés (gold_dataset.date_bounds).
+    Guardada em cache pela assinatura dos arquivos do dataset: as chamadas de uma mesma
+    renderização (moedas, período, taxas) não reabrem nada até a próxima compactação.
+    """
+    paths = sorted(glob.glob(os.path.join(dataset_dir, "**", "*.parquet"), recursive=True))
+    signature = tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    return _cached_dataset_bounds(dataset_dir, signature)
+
+
+def _sources(gold_dir):
+    """
+    (dataset compactado ou None, arquivos diários a ler). O dataset (gold_dataset) só é
+    atualizado pela compactação; os arquivos diários com data posterior à última data
+    compactada continuam sendo lidos direto, para que o dashboard não fique defasado.
+    """
+    dataset_dir = os.path.join(gold_dir, "dataset")
+    files = _daily_files(gold_dir)
+    if not os.path.isdir(dataset_dir):
+        return None, files
+    dataset = gold_dataset.gold_dataset(dataset_dir)
+    last = _dataset_bounds(dataset_dir)[1]
+    if last is None:
+        return dataset, files
+    return dataset, [f for f in files if os.path.basename(f)[:10] > str(last)]
+
+
+def available_currencies(gold_dir=GOLD_DIR):
+    """Moedas disponíveis (lê apenas a coluna target_currency)"""
+    dataset, files = _sources(gold_dir)
+    codes = set()
+    if dataset is not None:
+        codes.update(dataset.to_table(columns=["target_currency"])["target_currency"].to_pylist())
+    if files:
+        codes.update(_read_daily(files, ["target_currency"])["target_currency"].unique())
+    return sorted(codes)
+
+
+def date_bounds(gold_dir=GOLD_DIR):
+    """(primeira, última) data do gold"""
+    dataset, files = _sources(gold_dir)
+    bounds = [pd.Timestamp(os.path.basename(f)[:10]).date() for f in files]
+    if dataset is not None:
+        bounds += [d for d in _dataset_bounds(os.path.join(gold_dir, "dataset")) if d is not None]
+    if not bounds:
+        return None, None
+    return min(bounds), max(bounds)
+
+
+def load_rates(gold_dir=GOLD_DIR, currencies=None, start=None, end=None):
+    """
+    Lê só as colunas e linhas necessárias para o gráfico, com os filtros de moeda
+    e período empurrados para a leitura do Parquet.
+    Retorna DataFrame longo (date, target_currency, rate).
+    """
+    dataset, files = _sources(gold_dir)
+    columns = ["date", "target_currency", "rate"]
+    frames = []
+    if dataset is not None:
+        frames.append(gold_dataset.read_gold(start, end, currencies=currencies, columns=columns,
+                                             dataset_dir=os.path.join(gold_dir, "dataset")))
+
+    # Arquivos diários: o período filtra pelo nome do arquivo, a moeda pelo Parquet
+    files = [
+        f for f in files
+        if (start is None or os.path.basename(f)[:10] >= str(start))
+        and (end is None or os.path.basename(f)[:10] <= str(end))
+    ]
+    if files:
+        expr = ds.field("target_currency").isin(list(currencies)) if currencies else None
+        frames.append(_read_daily(files, columns, filter=expr))
+
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    # Moeda como category (em ordem alfabética) também quando vem do dataset compactado
+    currency = union_categoricals([f["target_currency"].astype("category") for f in frames], sort_categories=True)
+    df = pd.concat([f.drop(columns="target_currency") for f in frames], ignore_index=True)
+    df["target_currency"] = currency.remove_unused_categories()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df[columns]
+    return df.sort_values(["target_currency", "date"], kind="stable").reset_index(drop=True)
+
+
+def available_intervals(gold_dir=GOLD_DIR):
+    """Intervalos com barras OHLC pré-agregadas (src.bars) no gold"""
+    bars_dir = os.path.join(gold_dir, "bars")
+    return [i for i in bars.INTERVALS if bars.partition_files(i, bars_dir=bars_dir)]
+
+
+def load_bars(gold_dir=GOLD_DIR, interval="daily", currencies=None, start=None, end=None):
+    """
+    Barras OHLC do intervalo (date = início da barra), lidas só nas partições do período
+    e com o filtro de moeda empurrado para o Parquet. `rate` (= close) alimenta o gráfico.
+    """
+    columns = ["interval_start", "target_currency", "open", "high", "low", "close", "count", "vwap"]
+    df = bars.read_bars(interval, start, end, currencies=currencies, columns=columns,
+                        bars_dir=os.path.join(gold_dir, "bars"))
+    df = df.rename(columns={"interval_start": "date"}).assign(rate=lambda d: d["close"])
+    df["date"] = pd.to_datetime(df["date"])
+    return df.sort_values(["target_currency", "date"], kind="stable").reset_index(drop=True)
+
+
+def load_insights(gold_dir=GOLD_DIR):
+    """Insights do LLM mesclados (arquivos mais recentes prevalecem)"""
+    all_insights = {}
+    for path in sorted(glob.glob(os.path.join(gold_dir, "*insights*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            all_insights.update(json.load(f))
+    return all_insights
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: índices de `n_out` pontos que preservam
+    a forma visual da série (sempre inclui o primeiro e o último).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:max(nxt_hi, nxt_lo + 1)].mean()
+        avg_y = y[nxt_lo:max(nxt_hi, nxt_lo + 1)].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.nanargmax(area)) if len(area) else lo
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_buckets(y, n_out):
+    """Índices do mínimo e do máximo de cada bucket (alternativa mais barata ao LTTB)"""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    buckets = max(1, n_out // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    y = np.asarray(y, dtype="float64")
+    idx = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            idx.extend(sorted({lo + int(np.nanargmin(y[lo:hi])), lo + int(np.nanargmax(y[lo:hi]))}))
+    return np.array(idx)
+
+
+def downsample(df, max_points=500, method="lttb"):
+    """
+    Reduz cada série (por moeda) a no máximo `max_points` pontos e devolve a
+    matriz datas x moedas pronta para st.line_chart.
+    """
+    parts = []
+    for currency, series in df.groupby("target_currency", sort=True, observed=True):
+        series = series.dropna(subset=["rate"])
+        if method == "minmax":
+            idx = minmax_buckets(series["rate"].to_numpy(), max_points)
+        else:
+            x = series["date"].to_numpy().astype("int64")
+            idx = lttb(x, series["rate"].to_numpy(), max_points)
+        parts.append(series.iloc[idx])
+    if not parts:
+        return pd.DataFrame()
+    sampled = pd.concat(parts, ignore_index=True)
+    return sampled.pivot_table(index="date", columns="target_currency", values="rate", aggfunc="last",
+                               observed=True)
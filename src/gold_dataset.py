@@ -0,0 +1,216 @@
+import os
+import glob
+import time
+import argparse
+from datetime import date, datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src import compact_schema
+from src.logging_config import get_logger, log_metrics
+
+GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
+DATASET_DIR = os.path.join(GOLD_DIR, "dataset")
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("base_currency", pa.string()), ("year", pa.int32())]), flavor="hive"
+)
+DEDUP_KEYS = ["date", "target_currency"]  # base_currency é a partição
+SORT_KEYS = ["target_currency", "date"]
+# Codificação dictionary no Parquet; no Arrow a coluna continua string,
+# pois o pyarrow não usa estatísticas de colunas dictionary para podar row groups
+DICTIONARY_COLUMNS = ["target_currency"]
+# Row groups pequenos o bastante para que as estatísticas (min/max de
+# target_currency) descartem a maior parte do arquivo em filtros por moeda
+ROW_GROUP_SIZE = 8192
+
+def _partition_dir(dataset_dir, base_currency, year):
+    return os.path.join(dataset_dir, f"base_currency={base_currency}", f"year={year}")
+
+def _to_arrow(df, metadata):
+    """
+    Normaliza tipos para o layout compactado (date como date32, moeda como string);
+    run_id/pipeline_version vão para os metadados do arquivo, não para as linhas.
+    """
+    df = df.drop(columns=[c for c in compact_schema.METADATA_COLUMNS if c in df.columns])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["target_currency"] = df["target_currency"].astype(str)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    i = table.column_names.index("target_currency")
+    table = table.set_column(i, pa.field("target_currency", pa.string()), table.column(i).cast(pa.string()))
+    return table.replace_schema_metadata(compact_schema.schema_metadata(metadata))
+
+def _write_partition(df, path, row_group_size, metadata):
+    table = _to_arrow(df.sort_values(SORT_KEYS, kind="stable"), metadata)
+    tmp_path = path + ".tmp"
+    pq.write_table(
+        table,
+        tmp_path,
+        row_group_size=row_group_size,
+        compression="zstd",
+        use_dictionary=[c for c in DICTIONARY_COLUMNS if c in table.column_names],
+        use_byte_stream_split=["rate"],
+        write_statistics=True,
+    )
+    os.replace(tmp_path, path)
+
+def _read_partition(path):
+    """Partição existente (layout antigo, com run_id por linha, ou compactado) e seus metadados"""
+    metadata = compact_schema.run_metadata(path)
+    table = pq.read_table(path, partitioning=None)
+    drop = [c for c in [*compact_schema.METADATA_COLUMNS, "base_currency", "year"] if c in table.column_names]
+    return table.drop_columns(drop).to_pandas(date_as_object=False), metadata
+
+def compact(files=None, gold_dir=GOLD_DIR, dataset_dir=DATASET_DIR, row_group_size=ROW_GROUP_SIZE, run_id=None):
+    """
+    Compacta os arquivos diários do gold (YYYY-MM-DD.parquet) no dataset
+    particionado base_currency=<moeda>/year=<ano>/part-0.parquet.
+    Só as partições afetadas pelos arquivos de entrada são reescritas. A leitura usa o
+    caminho enxuto (compact_schema.read_history) e os run_ids ficam nos metadados.
+    """
+    logger = get_logger(run_id=run_id, service="gold_dataset")
+    start = time.time()
+
+    if files is None:
+        files = sorted(glob.glob(os.path.join(gold_dir, "????-??-??.parquet")))
+    if not files:
+        logger.warning("no_gold_files", gold_dir=gold_dir)
+        return []
+
+    df = compact_schema.read_history(files)
+    metadata = compact_schema.merge_metadata(*(compact_schema.run_metadata(f) for f in files))
+    df["year"] = df["date"].dt.year
+
+    written = []
+    for (base_currency, year), part in df.groupby(["base_currency", "year"], observed=True):
+        part_dir = _partition_dir(dataset_dir, base_currency, year)
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, "part-0.parquet")
+
+        part = part.drop(columns=["year", "base_currency"])
+        part_metadata = metadata
+        if os.path.exists(path):
+            existing, existing_metadata = _read_partition(path)
+            part = pd.concat([existing, part.astype({"target_currency": str})], ignore_index=True)
+            part_metadata = compact_schema.merge_metadata(existing_metadata, metadata)
+        part = part.drop_duplicates(subset=DEDUP_KEYS, keep="last")
+
+        _write_partition(part, path, row_group_size, part_metadata)
+        written.append(path)
+
+    elapsed = time.time() - start
+    log_metrics(logger, "gold_compact", len(df), elapsed)
+    logger.info("gold_compact_ok", input_files=len(files), partitions=len(written))
+    return written
+
+def gold_dataset(dataset_dir=DATASET_DIR):
+    """Abre o dataset particionado do gold"""
+    return ds.dataset(dataset_dir, format="parquet", partitioning=PARTITIONING)
+
+def _file_date_bounds(path):
+    """(min, max) de `date` de um arquivo pelas estatísticas dos row groups (só o rodapé é lido)"""
+    metadata = pq.ParquetFile(path).metadata
+    column = metadata.schema.names.index("date")
+    bounds = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        if not row_group.num_rows:
+            continue
+        stats = row_group.column(column).statistics
+        if stats is None or not stats.has_min_max:
+            # Arquivo gravado sem estatísticas: lê só a coluna date
+            min_max = pc.min_max(pq.read_table(path, columns=["date"])["date"])
+            return min_max["min"].as_py(), min_max["max"].as_py()
+        bounds += [stats.min, stats.max]
+    return (min(bounds), max(bounds)) if bounds else (None, None)
+
+def date_bounds(dataset_dir=DATASET_DIR):
+    """
+    (primeira, última) data do dataset sem varrer a coluna date: o ano vem do nome das
+    partições e só os rodapés das partições do primeiro e do último ano são abertos.
+    """
+    years = {}
+    for path in glob.glob(os.path.join(dataset_dir, "base_currency=*", "year=*", "*.parquet")):
+        year = int(os.path.basename(os.path.dirname(path)).split("=", 1)[1])
+        years.setdefault(year, []).append(path)
+    if not years:
+        return None, None
+    first = [lo for lo, _ in map(_file_date_bounds, years[min(years)]) if lo is not None]
+    last = [hi for _, hi in map(_file_date_bounds, years[max(years)]) if hi is not None]
+    return (min(first) if first else None), (max(last) if last else None)
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+def _and_all(exprs):
+    expr = None
+    for e in exprs:
+        expr = e if expr is None else expr & e
+    return expr
+
+def _partition_filter(start=None, end=None, base_currency=None):
+    exprs = []
+    if base_currency:
+        exprs.append(ds.field("base_currency") == base_currency)
+    if start:
+        exprs.append(ds.field("year") >= start.year)
+    if end:
+        exprs.append(ds.field("year") <= end.year)
+    return _and_all(exprs)
+
+def _row_filter(start=None, end=None, currencies=None):
+    exprs = []
+    if start:
+        exprs.append(ds.field("date") >= pa.scalar(start, pa.date32()))
+    if end:
+        exprs.append(ds.field("date") <= pa.scalar(end, pa.date32()))
+    if currencies:
+        exprs.append(ds.field("target_currency").isin(list(currencies)))
+    return _and_all(exprs)
+
+def build_filter(start=None, end=None, currencies=None, base_currency=None):
+    """Monta a expressão de filtro (partições + estatísticas dos row groups)"""
+    start, end = _as_date(start), _as_date(end)
+    return _and_all(
+        e for e in (_partition_filter(start, end, base_currency), _row_filter(start, end, currencies))
+        if e is not None
+    )
+
+def read_gold(start=None, end=None, currencies=None, base_currency=None, columns=None, dataset_dir=DATASET_DIR):
+    """
+    Lê o gold com filtros empurrados para o Parquet: partições fora do intervalo
+    não são abertas e row groups são descartados pelas estatísticas.
+    """
+    if not os.path.isdir(dataset_dir):
+        return pd.DataFrame()
+
+    dataset = gold_dataset(dataset_dir)
+    table = dataset.to_table(
+        columns=columns,
+        filter=build_filter(start, end, currencies, base_currency),
+    )
+    return table.to_pandas()
+
+def scanned_row_groups(start=None, end=None, currencies=None, base_currency=None, dataset_dir=DATASET_DIR):
+    """Quantidade de row groups que uma consulta efetivamente precisa ler"""
+    start, end = _as_date(start), _as_date(end)
+    partition_expr = _partition_filter(start, end, base_currency)
+    row_expr = _row_filter(start, end, currencies)
+    if row_expr is None:
+        row_expr = ds.scalar(True)
+    return sum(
+        len(fragment.split_by_row_group(row_expr))
+        for fragment in gold_dataset(dataset_dir).get_fragments(filter=partition_expr)
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compactação do gold em dataset particionado")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    for path in compact(row_group_size=args.row_group_size):
+        print(f"Partição compactada: {path}")
@@ -1,47 +1,62 @@
 import os
+import re
 import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from tenacity import retry, stop_after_attempt, wait_exponential
-from dotenv import load_dotenv
 import structlog
 import argparse
+from src import raw_archive
+from src.config import UNSET, resolve
 
 
-load_dotenv()
 logger = structlog.get_logger()
 
-API_KEY = os.getenv("EXCHANGE_API_KEY")
-BASE_URL = os.getenv("EXCHANGE_BASE_URL")
+# UNSET: valores de src.config.get_settings() (lidos no primeiro uso, não na importação)
+API_KEY = UNSET
+BASE_URL = UNSET
 RAW_DIR = os.path.join(os.path.dirname(__file__), "../data/raw")
-os.makedirs(RAW_DIR, exist_ok=True)
+# "files": um JSON por snapshot; "archive": segmento diário compactado (src/raw_archive.py)
+RAW_STORAGE = UNSET
+
+def _latest_url(base_currency):
+    base_url = resolve(BASE_URL, "exchange_base_url")
+    return f"{base_url}/{resolve(API_KEY, 'exchange_api_key')}/latest/{base_currency}"
 
 @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=2, max=30))
-def fetch_exchange_rates(base_currency="USD"):
-    url = f"{BASE_URL}/{API_KEY}/latest/{base_currency}"
+def fetch_exchange_rates(base_currency="USD", force=False):
+    """
+    Coleta as taxas da moeda base. Se o conteúdo não mudou desde a última coleta
+    (ver _check_unchanged/_store_snapshot), registra apenas um heartbeat e
+    retorna o snapshot anterior. force=True ignora time_next_update_unix.
+    """
+    url = _latest_url(base_currency)
     try:
-        response = requests.get(url, timeout=10)
+        entry = _fetch_state_entry(base_currency)
+        raw_file = None if force else _not_due(entry)
+        if raw_file:
+            return _heartbeat(base_currency, "not_due", raw_file)
+
+        response = requests.get(url, timeout=10, headers=_conditional_headers(entry))
         timestamp = datetime.utcnow().isoformat()
         metadata = {
             "timestamp": timestamp,
             "status_code": response.status_code,
             "url": url
         }
+        if response.status_code == 304 and _raw_exists(entry.get("raw_file")):
+            return _not_modified(base_currency, entry, response, timestamp)
         if response.status_code == 200:
             data = response.json()
             data["_metadata"] = metadata
-
-            now = datetime.utcnow()
-            filename = now.strftime("%Y-%m-%d.json")
-            filepath = os.path.join(RAW_DIR, filename)
-            if os.path.exists(filepath):
-                filename = now.strftime("%Y-%m-%d_%H%M%S.json")
-                filepath = os.path.join(RAW_DIR, filename)
-
-            tmp_filepath = filepath + ".tmp"
-            with open(tmp_filepath, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            os.replace(tmp_filepath, filepath)
+            filepath = _store_snapshot(base_currency, data, response, legacy_name=True)
 
             logger.info("fetch_ok", service="ingest", arquivo=filepath)
             return filepath
@@ -52,15 +67,254 @@ def fetch_exchange_rates(base_currency="USD"):
         logger.error("fetch_exception", service="ingest", error=str(e))
         raise
 
-def load_local_file(filepath: str):
-    """Carrega um arquivo JSON local de câmbio em DataFrame"""
+def _save_raw(data, base_currency=None):
+    """Grava o JSON bruto de forma atômica (arquivo .tmp + os.replace) ou no arquivo compactado"""
+    if resolve(RAW_STORAGE, "raw_storage") == "archive":
+        return raw_archive.append_snapshot(data, base_currency)
+
+    os.makedirs(RAW_DIR, exist_ok=True)
+    now = datetime.utcnow()
+    if base_currency:
+        # Coletas em lote: a moeda base entra no nome para evitar colisões
+        filename = now.strftime(f"%Y-%m-%d_%H%M%S_{base_currency}.json")
+        filepath = os.path.join(RAW_DIR, filename)
+    else:
+        filename = now.strftime("%Y-%m-%d.json")
+        filepath = os.path.join(RAW_DIR, filename)
+        if os.path.exists(filepath):
+            filename = now.strftime("%Y-%m-%d_%H%M%S.json")
+            filepath = os.path.join(RAW_DIR, filename)
+
+    tmp_filepath = f"{filepath}.{threading.get_ident()}.tmp"
+    with open(tmp_filepath, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_filepath, filepath)
+    return filepath
+
+# ---------------------------
+# Detecção de mudança: coletas sem conteúdo novo viram heartbeat
+# ---------------------------
+FETCH_STATE_NAME = "_fetch_state.json"
+HEARTBEAT_NAME = "_heartbeats.ndjson"
+_state_lock = threading.Lock()
+
+def payload_hash(data):
+    """Hash da forma canônica do payload (moeda base + taxas); metadados e horários não contam"""
+    canonical = {"base_code": data.get("base_code"), "conversion_rates": data.get("conversion_rates")}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _raw_exists(raw_file):
+    return bool(raw_file) and os.path.exists(raw_file.split("#", 1)[0])
+
+def load_fetch_state():
+    """Estado por moeda base: hash, ETag/Last-Modified, próxima atualização e último snapshot"""
+    state_file = os.path.join(RAW_DIR, FETCH_STATE_NAME)
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _fetch_state_entry(base_currency):
+    with _state_lock:
+        return load_fetch_state().get(base_currency, {})
+
+def _update_fetch_state(base_currency, **fields):
+    state_file = os.path.join(RAW_DIR, FETCH_STATE_NAME)
+    with _state_lock:
+        os.makedirs(RAW_DIR, exist_ok=True)
+        state = load_fetch_state()
+        state[base_currency] = {**state.get(base_currency, {}), **fields}
+        tmp_file = f"{state_file}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, state_file)
+
+def _not_due(entry):
+    """Snapshot anterior, se o provedor informou que a próxima atualização ainda não ocorreu"""
+    next_update = entry.get("time_next_update_unix")
+    if next_update and time.time() < next_update and _raw_exists(entry.get("raw_file")):
+        return entry["raw_file"]
+    return None
+
+def _conditional_headers(entry):
+    headers = {}
+    if entry.get("etag") and _raw_exists(entry.get("raw_file")):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified") and _raw_exists(entry.get("raw_file")):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def _heartbeat(base_currency, reason, raw_file):
+    """Registra uma coleta sem conteúdo novo (uma linha) e devolve o snapshot vigente"""
+    now = datetime.utcnow().isoformat()
+    line = json.dumps({"timestamp": now, "base": base_currency, "reason": reason, "raw_file": raw_file})
+    with _state_lock:
+        os.makedirs(RAW_DIR, exist_ok=True)
+        with open(os.path.join(RAW_DIR, HEARTBEAT_NAME), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    logger.info("fetch_unchanged", service="ingest", base=base_currency, reason=reason, arquivo=raw_file)
+    return raw_file
+
+def _next_update_from_headers(headers):
+    """Próxima atualização (epoch) pelo Cache-Control max-age ou Expires; o 304 não traz o corpo"""
+    match = re.search(r"max-age=(\d+)", headers.get("Cache-Control") or "")
+    if match:
+        return int(time.time()) + int(match.group(1))
+    try:
+        return int(parsedate_to_datetime(headers["Expires"]).timestamp()) if headers.get("Expires") else None
+    except (TypeError, ValueError):
+        return None
+
+def _not_modified(base_currency, entry, response, timestamp):
+    """304: o snapshot anterior continua valendo; o estado de coleta é renovado pelos cabeçalhos"""
+    headers = getattr(response, "headers", None) or {}
+    fields = {
+        "etag": headers.get("ETag") or entry.get("etag"),
+        "last_modified": headers.get("Last-Modified") or entry.get("last_modified"),
+        "time_next_update_unix": _next_update_from_headers(headers) or entry.get("time_next_update_unix"),
+        "checked_at": timestamp,
+    }
+    _update_fetch_state(base_currency, **fields)
+    return _heartbeat(base_currency, "not_modified", entry["raw_file"])
+
+def _store_snapshot(base_currency, data, response, legacy_name=False):
+    """Grava o snapshot só se o payload mudou; caso contrário registra um heartbeat"""
+    headers = getattr(response, "headers", None) or {}
+    entry = _fetch_state_entry(base_currency)
+    digest = payload_hash(data)
+    fields = {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "time_next_update_unix": data.get("time_next_update_unix"),
+        "checked_at": data["_metadata"]["timestamp"],
+    }
+    if entry.get("hash") == digest and _raw_exists(entry.get("raw_file")):
+        _update_fetch_state(base_currency, **fields)
+        return _heartbeat(base_currency, "unchanged", entry["raw_file"])
+
+    filepath = _save_raw(data) if legacy_name else _save_raw(data, base_currency=base_currency)
+    _update_fetch_state(base_currency, hash=digest, raw_file=filepath, **fields)
+    return filepath
+
+class HostRateLimiter:
+    """Limita a taxa de requisições por host (intervalo mínimo entre chamadas)"""
+
+    def __init__(self, max_per_second=None):
+        self.min_interval = 1.0 / max_per_second if max_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+def build_session(pool_size=10):
+    """Cria uma requests.Session com pool de conexões keep-alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=0.5, min=0.5, max=5), reraise=True)
+def _fetch_base(session, base_currency, limiter):
+    url = _latest_url(base_currency)
+    entry = _fetch_state_entry(base_currency)
+    raw_file = _not_due(entry)
+    if raw_file:
+        return _heartbeat(base_currency, "not_due", raw_file)
+
+    limiter.wait(url)
+    response = session.get(url, timeout=10, headers=_conditional_headers(entry))
+    if response.status_code == 304 and _raw_exists(entry.get("raw_file")):
+        return _not_modified(base_currency, entry, response, datetime.utcnow().isoformat())
+    if response.status_code != 200:
+        logger.error("fetch_failed", service="ingest", status=response.status_code, url=url)
+        response.raise_for_status()
+
+    data = response.json()
+    data["_metadata"] = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "status_code": response.status_code,
+        "url": url
+    }
+    return _store_snapshot(base_currency, data, response)
+
+def fetch_many(bases, max_workers=8, max_per_second=None, session=None):
+    """
+    Coleta várias moedas base em paralelo, reutilizando conexões keep-alive.
+    :param bases: lista de moedas base (ex: ["USD", "EUR"])
+    :param max_workers: limite de requisições simultâneas
+    :param max_per_second: limite de requisições por segundo por host (None = sem limite)
+    :param session: requests.Session opcional (criada com pool do tamanho de max_workers)
+    :return: dict {moeda_base: caminho do arquivo ou None em caso de falha}, na ordem de entrada
+    """
+    bases = list(dict.fromkeys(bases))
+    own_session = session is None
+    if own_session:
+        session = build_session(pool_size=max_workers)
+    limiter = HostRateLimiter(max_per_second)
+    start = time.time()
+
+    def worker(base):
+        try:
+            return _fetch_base(session, base, limiter)
+        except Exception as e:
+            logger.error("fetch_exception", service="ingest", base=base, error=str(e))
+            return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = dict(zip(bases, pool.map(worker, bases)))
+    finally:
+        if own_session:
+            session.close()
+
+    ok = sum(1 for r in results.values() if r)
+    logger.info(
+        "fetch_many_ok", service="ingest", requested=len(bases), ok=ok,
+        elapsed_seconds=round(time.time() - start, 4)
+    )
+    return results
+
+def load_local_file(filepath: str, start=None, end=None, bases=None):
+    """
+    Carrega um arquivo JSON local de câmbio em DataFrame.
+    Também aceita o arquivo compactado (src/raw_archive.py): uma referência
+    "<segmento>#<offset>", um segmento .ndjson.zst ou o diretório do arquivo;
+    nesses dois últimos casos, start/end/bases filtram os snapshots pelo índice.
+    """
     import pandas as pd
 
-    if not os.path.exists(filepath):
+    if not os.path.exists(str(filepath).split("#", 1)[0]):
         raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    if os.path.isdir(filepath) or str(filepath).endswith(raw_archive.SEGMENT_SUFFIX):
+        snapshots = (
+            raw_archive.iter_range(start, end, bases, archive_dir=filepath) if os.path.isdir(filepath)
+            else raw_archive.iter_segment(filepath, start, end, bases)
+        )
+        rows = [
+            {
+                "base_currency": data.get("base_code"),
+                "currency": currency,
+                "rate": rate,
+                "retrieved_at": (data.get("_metadata") or {}).get("timestamp"),
+            }
+            for data in snapshots
+            for currency, rate in data["conversion_rates"].items()
+        ]
+        return pd.DataFrame(rows, columns=["base_currency", "currency", "rate", "retrieved_at"])
+
+    data = raw_archive.read_snapshot(filepath)
 
     if isinstance(data, list):
         return pd.DataFrame(data)
@@ -72,10 +326,25 @@ def load_local_file(filepath: str):
     else:
         raise ValueError("Formato de arquivo não suportado")
     
-def main(date_str=None):
+def main(date_str=None, bases=None, max_workers=8, max_per_second=None):
     if not date_str:
         date_str = datetime.utcnow().strftime("%Y-%m-%d")
-    
+
+    if bases:
+        results = fetch_many(bases, max_workers=max_workers, max_per_second=max_per_second)
+        for base, raw_file in results.items():
+            print(f"Ingested file ({base}): {raw_file}")
+        return results
+
     raw_file = fetch_exchange_rates(base_currency="USD")
     print(f"Ingested file: {raw_file}")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest script")
+    parser.add_argument("--date", help="Data (YYYY-MM-DD)")
+    parser.add_argument("--bases", nargs="+", help="Moedas base para coleta em lote (ex: USD EUR BRL)")
+    parser.add_argument("--max-workers", type=int, default=8, help="Requisições simultâneas")
+    parser.add_argument("--max-per-second", type=float, help="Limite de requisições por segundo por host")
+    args = parser.parse_args()
+
+    main(date_str=args.date, bases=args.bases, max_workers=args.max_workers, max_per_second=args.max_per_second)
@@ -0,0 +1,199 @@
+import os
+import glob
+import time
+import asyncio
+import argparse
+import pandas as pd
+from tenacity import retry, stop_after_attempt, wait_exponential
+from src import llm_enrich
+from src.llm_cache import make_key
+from src.llm_insights import save_llm_insights
+from src.config import resolve
+from src.prompt_builder import build_prompt, count_tokens
+from src.logging_config import configure_logging, get_logger, log_metrics
+
+GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
+# Espera entre as tentativas de cada chamada ao LLM
+RETRY_WAIT = wait_exponential(multiplier=1, min=2, max=10)
+
+
+class TokenBucket:
+    """
+    Limitador token bucket para uso em asyncio: até `per_minute` unidades
+    por minuto (requisições ou tokens), com reposição contínua.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def estimate_tokens(prompt, max_tokens=llm_enrich.LLM_PARAMS["max_tokens"]):
+    """Tokens reservados para a chamada: prompt + resposta máxima"""
+    return count_tokens(prompt, llm_enrich.openai_model()) + max_tokens
+
+
+def build_jobs(df, dates=None, segment_col=None, segments=None, window=30, token_budget=None):
+    """
+    Monta os trabalhos de enriquecimento: um por data (backfill) e, opcionalmente,
+    por segmento — valores de `segment_col` (ex: base_currency) ou grupos
+    nomeados de moedas em `segments` ({"LatAm": ["BRL", "ARS"], ...}).
+    Cada data usa o histórico disponível até ela (volatilidade na janela de `window` dias).
+    """
+    data = df.assign(date=pd.to_datetime(df["date"]))
+    all_dates = sorted(data["date"].dt.strftime("%Y-%m-%d").unique())
+    dates = sorted(dates) if dates else all_dates
+
+    jobs = []
+    for date_str in dates:
+        history = data[data["date"] <= date_str]
+        if segment_col:
+            groups = [(str(value), part) for value, part in history.groupby(segment_col, observed=True)]
+        elif segments:
+            groups = [(name, history[history["target_currency"].isin(codes)]) for name, codes in segments.items()]
+        else:
+            groups = [(None, history)]
+
+        for segment, part in groups:
+            if part.empty:
+                continue
+            top_movers = llm_enrich.calculate_metrics(part, window=window, top_n=llm_enrich.prompt_max_movers())
+            prompt = build_prompt(top_movers, token_budget=token_budget, model=llm_enrich.openai_model())
+            jobs.append({
+                "date": date_str,
+                "segment": segment,
+                "top_movers": prompt.included,
+                "prompt": prompt.text,
+            })
+    return jobs
+
+
+async def run_batch(jobs, client=None, max_concurrency=4, requests_per_minute=60,
+                    tokens_per_minute=90000, cache=None, run_id=None):
+    """
+    Executa as chamadas ao LLM com concorrência limitada e limites de
+    requisições/tokens por minuto. As respostas voltam na ordem dos jobs; um job que
+    falha (após as tentativas) vira None e é logado, sem descartar os demais.
+    """
+    logger = get_logger(run_id=run_id, service="llm_batch")
+    if client is None:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=resolve(llm_enrich.OPENAI_API_KEY, "openai_api_key"))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    request_bucket = TokenBucket(requests_per_minute)
+    token_bucket = TokenBucket(tokens_per_minute)
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    @retry(stop=stop_after_attempt(3), wait=RETRY_WAIT, reraise=True)
+    async def complete(prompt):
+        await request_bucket.acquire()
+        await token_bucket.acquire(estimate_tokens(prompt))
+        response = await client.chat.completions.create(
+            model=llm_enrich.openai_model(),
+            messages=[{"role": "user", "content": prompt}],
+            **llm_enrich.LLM_PARAMS
+        )
+        if response.usage:
+            usage["prompt_tokens"] += response.usage.prompt_tokens
+            usage["completion_tokens"] += response.usage.completion_tokens
+            logger.info(
+                "llm_usage",
+                model=llm_enrich.openai_model(),
+                prompt_tokens=response.usage.prompt_tokens,
+                completion_tokens=response.usage.completion_tokens,
+            )
+        return (response.choices[0].message.content or "").strip()
+
+    async def worker(job):
+        key = make_key(llm_enrich.openai_model(), job["prompt"], **llm_enrich.LLM_PARAMS)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        async with semaphore:
+            llm_enrich.log_prompt(job["prompt"], run_id)
+            text = await complete(job["prompt"])
+        if cache is not None and text:
+            cache.set(key, text, model=llm_enrich.openai_model())
+        return text
+
+    start = time.time()
+    responses = await asyncio.gather(*(worker(job) for job in jobs), return_exceptions=True)
+    failed = 0
+    for i, (job, result) in enumerate(zip(jobs, responses)):
+        if isinstance(result, BaseException):
+            logger.error("llm_batch_job_failed", date=job["date"], segment=job["segment"], error=repr(result))
+            responses[i] = None
+            failed += 1
+    log_metrics(logger, "llm_batch", len(jobs) - failed, time.time() - start)
+    logger.info("llm_batch_ok", jobs=len(jobs), failed=failed, **usage)
+    return responses
+
+
+def save_results(jobs, responses, base_path=GOLD_DIR):
+    """
+    Grava um arquivo de insights por data (segmentos agrupados em `segments`).
+    Jobs sem resposta (None: falharam no run_batch) ficam de fora.
+    """
+    by_date = {}
+    for job, text in zip(jobs, responses):
+        if text is None:
+            continue
+        insights = by_date.setdefault(job["date"], {"date": job["date"], "source": llm_enrich.openai_model()})
+        entry = {"summary": text, "top_movers": job["top_movers"]}
+        if job["segment"] is None:
+            insights.update(entry)
+        else:
+            insights.setdefault("segments", {})[job["segment"]] = entry
+
+    return [save_llm_insights(insights, base_path=base_path, date_str=date_str)
+            for date_str, insights in by_date.items()]
+
+
+def enrich_batch(df, dates=None, segment_col=None, segments=None, base_path=GOLD_DIR, run_id=None, **kwargs):
+    """Ponto de entrada síncrono: monta os jobs, chama o LLM em lote e salva os insights"""
+    jobs = build_jobs(df, dates=dates, segment_col=segment_col, segments=segments)
+    responses = asyncio.run(run_batch(jobs, run_id=run_id, **kwargs))
+    return save_results(jobs, responses, base_path=base_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enriquecimento LLM em lote (backfill / segmentos)")
+    parser.add_argument("--start", required=True, help="Data inicial (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="Data final (YYYY-MM-DD)")
+    parser.add_argument("--segment-col", help="Coluna de segmentação (ex: base_currency)")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=60, help="Requisições por minuto")
+    parser.add_argument("--tpm", type=int, default=90000, help="Tokens por minuto")
+    parser.add_argument("--log-mode", default=os.getenv("LOG_MODE", "queue"), choices=["queue", "sync"],
+                        help="queue: logs gravados em lote por uma thread de fundo")
+    args = parser.parse_args()
+    configure_logging(mode=args.log_mode)
+    from src import compact_schema
+
+    # Histórico no formato enxuto (moedas como category, sem run_id por linha)
+    files = [f for f in sorted(glob.glob(os.path.join(GOLD_DIR, "????-??-??.parquet")))
+             if os.path.basename(f)[:10] <= args.end]
+    gold = compact_schema.read_history(files, columns=["date", "base_currency", "target_currency", "rate"])
+    available = set(gold["date"].dt.strftime("%Y-%m-%d"))
+    dates = [d for d in pd.date_range(args.start, args.end).strftime("%Y-%m-%d") if d in available]
+    for path in enrich_batch(gold, dates=dates, segment_col=args.segment_col,
+                             max_concurrency=args.max_concurrency,
+                             requests_per_minute=args.rpm, tokens_per_minute=args.tpm):
+        print(f"Insights salvos em: {path}")
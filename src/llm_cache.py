@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from src.config import UNSET, resolve
+from src.logging_config import get_logger
+
+CACHE_FILE = os.path.join(os.path.dirname(__file__), "../data/cache/llm_cache.sqlite")
+
+
+def prompt_hash(prompt):
+    """Hash md5 do prompt (mesmo usado no log de auditoria)"""
+    return hashlib.md5(prompt.encode("utf-8")).hexdigest()
+
+
+def make_key(model, prompt, **params):
+    """Chave do cache: modelo + parâmetros da chamada + hash do prompt"""
+    payload = json.dumps(
+        {"model": model, "params": params, "prompt_hash": prompt_hash(prompt)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Cache em disco (SQLite) de respostas do LLM, endereçado por conteúdo.
+    Entradas expiram após `ttl_seconds`; acima de `max_entries` as menos
+    acessadas recentemente (LRU) são removidas.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl_seconds=UNSET, max_entries=UNSET):
+        self.path = path
+        self.ttl_seconds = resolve(ttl_seconds, "llm_cache_ttl")
+        self.max_entries = resolve(max_entries, "llm_cache_max_entries")
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+                "created_at REAL, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_access ON responses (last_access)")
+
+    def get(self, key):
+        """Resposta em cache ou None (miss ou expirada)"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and (self.ttl_seconds is None or now - row[1] <= self.ttl_seconds):
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def set(self, key, response, model=None):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            if self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self.evictions += cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        """Métricas de hit/miss do cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def quantize_metrics(metrics, decimals=1, price_digits=4):
+    """
+    Arredonda as métricas antes de montar o prompt para que entradas quase
+    idênticas gerem o mesmo prompt (e acertem o cache).
+    Percentuais com `decimals` casas; preços com `price_digits` algarismos significativos.
+    """
+    out = metrics.copy()
+    for col in out.select_dtypes("number").columns:
+        values = out[col].to_numpy(dtype="float64")
+        if col == "current_price":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                magnitude = np.floor(np.log10(np.abs(values)))
+            scale = np.where(np.isfinite(magnitude), 10.0 ** (price_digits - 1 - magnitude), 1.0)
+            out[col] = np.round(values * scale) / scale
+        else:
+            out[col] = np.round(values, decimals)
+    return out
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Cache padrão do processo (criado no primeiro uso)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache()
+    return _default_cache
+
+
+def log_stats(cache, run_id=None):
+    get_logger(run_id=run_id, service="llm_cache").info("llm_cache_stats", **cache.stats())
+
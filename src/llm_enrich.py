@@ -1,23 +1,43 @@
 import os
-import json
 import hashlib
+import warnings
 from datetime import datetime, timedelta
 import pandas as pd
 import structlog
-from dotenv import load_dotenv
 from decimal import Decimal
-from openai import OpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
-
-load_dotenv()
+from src.config import UNSET, resolve
+from src.metrics import compute_metrics, top_movers
+from src.llm_cache import make_key, quantize_metrics
+from src.prompt_builder import build_prompt, count_tokens
+from src.logging_config import dumps, get_writer
 
 logger = structlog.get_logger()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# UNSET: valores de src.config.get_settings(), lidos no primeiro uso
+OPENAI_API_KEY = UNSET
+OPENAI_MODEL = UNSET
+client = None  # criado por get_client() na primeira chamada real ao LLM
+
+LLM_PARAMS = {"temperature": 0.7, "max_tokens": 500}
+PROMPT_MAX_MOVERS = UNSET
 
 LOG_FILE = os.path.join(os.path.dirname(__file__), "../logs/llm_prompts.log")
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+
+def openai_model():
+    return resolve(OPENAI_MODEL, "openai_model")
+
+def prompt_max_movers():
+    return resolve(PROMPT_MAX_MOVERS, "prompt_max_movers")
+
+def get_client():
+    """Cliente OpenAI do processo; o SDK só é importado aqui (modo simulado nem chega a importá-lo)"""
+    global client
+    if client is None:
+        from openai import OpenAI
+
+        client = OpenAI(api_key=resolve(OPENAI_API_KEY, "openai_api_key"))
+    return client
 
 def log_prompt(prompt, run_id):
     """Loga prompt e metadados para auditoria"""
@@ -29,73 +49,109 @@ def log_prompt(prompt, run_id):
         "prompt_hash": prompt_hash,
         "prompt": prompt
     }
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry) + "\n")
-
-def calculate_metrics(df, N=30):
-    """Calcula pct_change, volatilidade e top movers"""
-    df['date'] = pd.to_datetime(df['date'])
-    df.sort_values(by=['target_currency', 'date'], inplace=True)
-    
-    last_date = df['date'].max()
-    current = df[df['date'] == last_date][['target_currency', 'rate']].set_index('target_currency')
-
-    month_ago = last_date - pd.DateOffset(months=1)
-    past_month_data = df[(df['date'] >= month_ago.replace(day=1)) & 
-                         (df['date'] <= month_ago.replace(day=28))]
-    past_avg = past_month_data.groupby('target_currency')['rate'].mean()
-
-    pct_change = ((current['rate'] - past_avg) / past_avg * 100).fillna(0)
-
-    volatility = df.groupby('target_currency').apply(
-        lambda x: x.sort_values('date').tail(N)['rate'].pct_change().std() * 100
-    )
+    # Fila do escritor em segundo plano: o lote de prompts não espera o disco
+    get_writer().write(LOG_FILE, dumps(log_entry))
 
-    metrics = pd.DataFrame({
-        'current_price': current['rate'],
-        'pct_change': pct_change,
-        'volatility': volatility
-    }).reset_index()
-
-    top_movers = metrics.reindex(metrics['pct_change'].abs().sort_values(ascending=False).index).head(5)
-    
-    return top_movers
-
-def generate_llm_prompt(top_movers):
-    """Gera prompt formatado para o LLM"""
-    summary_json = top_movers.to_dict(orient='records')
-    prompt = (
-        f"Você é um analista financeiro. Receba estes dados agregados em JSON: {json.dumps(summary_json)} "
-        "e gere um resumo executivo curto (3 frases) orientado a negócios, 3 insights acionáveis e um alerta se "
-        "volatilidade > limiar. Explique comparando com o mês passado e cite percentuais."
-    )
-    return prompt
+def calculate_metrics(df, window=30, state=None, top_n=5, currencies=None, N=UNSET, n=UNSET):
+    """
+    Calcula pct_change, volatilidade (janela de `window` dias) e os `top_n` top movers
+    (top_n=None: todas as moedas).
+    Não altera o DataFrame recebido.
+    Se `state` (RollingState) for informado, as métricas vêm do estado incremental
+    e o histórico completo não é recalculado.
+    `currencies` restringe os top movers a essas moedas (ex.: as anômalas).
+    `N` e `n` são os nomes antigos de `window` e `top_n` (obsoletos, ainda aceitos).
+    """
+    if N is not UNSET:
+        warnings.warn("calculate_metrics(N=...) está obsoleto, use window=", DeprecationWarning, stacklevel=2)
+        window = N
+    if n is not UNSET:
+        warnings.warn("calculate_metrics(n=...) está obsoleto, use top_n=", DeprecationWarning, stacklevel=2)
+        top_n = n
+    if state is not None:
+        metrics = state.metrics(windows=(window,))
+    else:
+        metrics = compute_metrics(df, windows=(window,))
+    metrics = metrics.rename(columns={f"volatility_{window}d": "volatility"})
+    metrics = metrics[["target_currency", "current_price", "pct_change", "volatility"]]
+    if currencies is not None:
+        metrics = metrics[metrics["target_currency"].isin(currencies)]
+    return top_movers(metrics, n=top_n)
+
+def generate_llm_prompt(top_movers, quantize=False, token_budget=None):
+    """
+    Gera o texto do prompt para o LLM (mesmo formato compacto do enrich_with_llm, ver
+    prompt_builder.build_prompt).
+    Com quantize=True as métricas são arredondadas antes (ver llm_cache.quantize_metrics),
+    para que reexecuções com números quase idênticos reaproveitem o cache.
+    """
+    if quantize:
+        top_movers = quantize_metrics(top_movers)
+    return build_prompt(top_movers, token_budget=token_budget, model=openai_model()).text
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-def call_llm(prompt, run_id):
-    """Chama a API do LLM e retorna resposta, com retry"""
-    log_prompt(prompt, run_id)
-
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_tokens=500
+def _complete(prompt_text, model, run_id):
+    """Uma chamada à API do LLM (com retry); retorna o texto da resposta"""
+    response = get_client().chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt_text}],
+        **LLM_PARAMS
+    )
+    text = (response.choices[0].message.content or "").strip()
+
+    usage = getattr(response, "usage", None)
+    logger.info(
+        "llm_usage",
+        run_id=run_id,
+        model=model,
+        prompt_tokens=usage.prompt_tokens if usage else count_tokens(prompt_text, model),
+        completion_tokens=usage.completion_tokens if usage else count_tokens(text, model),
+        estimated=usage is None,
     )
-    text = response.choices[0].message.content.strip()
+    return text
 
-    if not text:
-        prompt_reduced = prompt[:2000]
-        return call_llm(prompt_reduced, run_id)
-    
+def call_llm(prompt, run_id, cache=None):
+    """
+    Chama a API do LLM e retorna resposta; o retry vale para cada chamada à API (_complete).
+    `prompt` pode ser texto ou um CompactPrompt (prompt_builder); neste caso,
+    resposta vazia gera nova tentativa com o prompt reduzido por moedas inteiras.
+    Se `cache` (LLMCache) for informado, respostas para o mesmo modelo,
+    parâmetros e prompt são reaproveitadas.
+    """
+    model = openai_model()
+    while True:
+        prompt_text = str(prompt)
+        key = make_key(model, prompt_text, **LLM_PARAMS)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info("llm_cache_hit", run_id=run_id, cache_key=key)
+                return cached
+
+        log_prompt(prompt_text, run_id)
+        text = _complete(prompt_text, model, run_id)
+        if text:
+            break
+        prompt = prompt.shrink() if hasattr(prompt, "shrink") else None
+        if prompt is None:
+            logger.warning("llm_empty_response", run_id=run_id)
+            return text
+
+    if cache is not None:
+        cache.set(key, text, model=model)
     return text
 
-def enrich_with_llm(df, run_id, simulate_llm=True):
+def enrich_with_llm(df, run_id, simulate_llm=True, state=None, cache=None, quantize=False,
+                    token_budget=None, currencies=None):
     """
     Função principal para calcular métricas e gerar insights do LLM.
     Se simulate_llm=True, retorna resposta fake para desenvolvimento.
+    Se state (RollingState) for informado, df pode ser None.
+    cache (LLMCache) e quantize controlam o reaproveitamento de respostas.
+    O prompt é compactado para caber em token_budget tokens.
+    currencies (ex.: anomaly.gate) limita o prompt a essas moedas.
     """
-    top_movers = calculate_metrics(df)
+    top_movers = calculate_metrics(df, state=state, top_n=prompt_max_movers(), currencies=currencies)
     
     if simulate_llm:
         # Retorno fake durante desenvolvimento
@@ -113,7 +169,9 @@ def enrich_with_llm(df, run_id, simulate_llm=True):
         return llm_response
     
     # Código real para chamar o LLM
-    prompt = generate_llm_prompt(top_movers)
-    llm_response = call_llm(prompt, run_id)
-    logger.info("llm_enrichment_ok", run_id=run_id, top_movers=list(top_movers['target_currency']))
+    if quantize:
+        top_movers = quantize_metrics(top_movers)
+    prompt = build_prompt(top_movers, token_budget=token_budget, model=openai_model())
+    llm_response = call_llm(prompt, run_id, cache=cache)
+    logger.info("llm_enrichment_ok", run_id=run_id, top_movers=prompt.included, prompt_tokens=prompt.tokens)
     return llm_response
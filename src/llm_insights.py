@@ -2,14 +2,16 @@ import json
 from datetime import datetime
 from pathlib import Path
 
-def save_llm_insights(insights: dict, base_path: str = "data/gold") -> str:
+def save_llm_insights(insights: dict, base_path: str = "data/gold", date_str: str = None) -> str:
     """
     Salva insights do LLM em JSON no formato YYYY-MM-DD-insights.json
+    (data de hoje, ou `date_str` em backfills).
     Retorna o caminho do arquivo salvo.
     """
     Path(base_path).mkdir(parents=True, exist_ok=True)
 
-    filename = f"{datetime.today().strftime('%Y-%m-%d')}-insights.json"
+    date_str = date_str or datetime.today().strftime('%Y-%m-%d')
+    filename = f"{date_str}-insights.json"
     filepath = Path(base_path) / filename
 
     with open(filepath, "w", encoding="utf-8") as f:
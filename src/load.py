@@ -1,20 +1,107 @@
 import os
+import glob
+import json
 import time
+import hashlib
+import io
+from contextlib import contextmanager
 import pandas as pd
 import sqlite3
-from sqlalchemy import create_engine
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from src.logging_config import get_logger, log_metrics
-from sqlalchemy import text
+from src.config import UNSET, resolve
+from src.logging_config import get_logger, log_metrics, span
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
 
 SILVER_DIR = os.path.join(os.path.dirname(__file__), "../data/silver")
 GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
-os.makedirs(GOLD_DIR, exist_ok=True)
 
-DB_URI = os.getenv("DB_URI")
+# UNSET: vem de src.config.get_settings(); None desliga a carga no banco
+DB_URI = UNSET
+
+MANIFEST_NAME = "_manifest.json"
+DEDUP_KEYS = ["date", "base_currency", "target_currency"]
+# Linhagem no banco: só muda quando a cotação da linha muda (o gold compacto não guarda
+# o run_id por linha, e o formato antigo repete o último run_id em todas)
+LINEAGE_COLUMNS = ["run_id", "pipeline_version"]
+VALUE_COLUMNS = ["rate", "retrieved_at"]
+
+def db_uri():
+    """URI do banco em uso (None: sem carga no banco)"""
+    return resolve(DB_URI, "db_uri")
+
+def file_digest(path, chunk_size=1 << 20):
+    """Hash sha256 do conteúdo do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_file=None):
+    """Lê o manifesto de arquivos Silver já processados ({caminho: {size, mtime_ns, sha256, ...}})"""
+    manifest_file = manifest_file or os.path.join(GOLD_DIR, MANIFEST_NAME)
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_file=None):
+    """Grava o manifesto de forma atômica"""
+    manifest_file = manifest_file or os.path.join(GOLD_DIR, MANIFEST_NAME)
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+@contextmanager
+def _manifest_lock(manifest_file):
+    """Trava exclusiva entre processos (cargas paralelas do backfill) durante a atualização do manifesto"""
+    with open(manifest_file + ".lock", "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def update_manifest(entries, manifest_file=None):
+    """Relê o manifesto sob trava e mescla as entradas novas (não perde as de outros processos)"""
+    manifest_file = manifest_file or os.path.join(GOLD_DIR, MANIFEST_NAME)
+    with _manifest_lock(manifest_file):
+        save_manifest({**load_manifest(manifest_file), **entries}, manifest_file)
+
+def pending_silver_files(files, manifest):
+    """
+    Retorna (arquivos novos/alterados, entradas atualizadas do manifesto).
+    Arquivos com mesmo tamanho e mtime do manifesto não são nem relidos;
+    nos demais o hash decide se o conteúdo mudou de fato.
+    """
+    pending, entries = [], {}
+    for path in files:
+        key = os.path.relpath(path, SILVER_DIR)
+        st = os.stat(path)
+        entry = manifest.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            continue
+
+        sha256 = file_digest(path)
+        entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256}
+        if not entry or entry["sha256"] != sha256:
+            pending.append(path)
+    return pending, entries
+
+def aggregate_silver_files(run_id=None, date_str=None, upsert_db=True):
+    import pyarrow as pa
+    from src import compact_schema  # lê silver/gold antigos ou compactos
+    from src.asof import to_epoch_seconds
 
-def aggregate_silver_files(run_id=None, date_str=None):
     logger = get_logger(run_id=run_id, service="load")
     start = time.time()
 
@@ -22,15 +109,34 @@ def aggregate_silver_files(run_id=None, date_str=None):
         date_str = datetime.utcnow().strftime("%Y-%m-%d")
 
     # Filtra arquivos Silver do dia específico
-    files = [os.path.join(SILVER_DIR, f) for f in os.listdir(SILVER_DIR) if f.endswith(".parquet") and date_str in f]
+    files = sorted(glob.glob(os.path.join(SILVER_DIR, f"{date_str}*.parquet")))
     if not files:
         logger.warning("no_silver_files", date=date_str)
         return None
 
-    # Lê e concatena
-    df_list = [pd.read_parquet(f) for f in files]
-    df = pd.concat(df_list, ignore_index=True)
-    df.drop_duplicates(subset=["date", "base_currency", "target_currency"], inplace=True)
+    os.makedirs(GOLD_DIR, exist_ok=True)
+    gold_file = os.path.join(GOLD_DIR, f"{date_str}.parquet")
+    manifest = load_manifest()
+    if not os.path.exists(gold_file):
+        # Gold removido: reprocessa todos os arquivos do dia
+        manifest = {k: v for k, v in manifest.items() if v.get("date") != date_str}
+
+    pending, entries = pending_silver_files(files, manifest)
+    processed_at = datetime.utcnow().isoformat()
+    for entry in entries.values():
+        entry.update(date=date_str, processed_at=processed_at)
+
+    if not pending:
+        if entries:
+            update_manifest(entries)
+        logger.info("load_skipped", arquivo=gold_file, reason="no_new_silver_files")
+        log_metrics(logger, "load", 0, time.time() - start)
+        return gold_file
+
+    # Lê apenas os arquivos novos
+    with span("read_silver", logger=logger) as s:
+        df = pd.concat([compact_schema.read_frame(f) for f in pending], ignore_index=True)
+        s.add(rows_out=len(df), bytes_read=sum(os.path.getsize(f) for f in pending))
 
     run_timestamp = datetime.utcnow().isoformat()
     run_id = run_timestamp.replace(":", "").replace("-", "").replace("T", "_")
@@ -39,30 +145,162 @@ def aggregate_silver_files(run_id=None, date_str=None):
     df["run_id"] = run_id
     df["pipeline_version"] = "1.0"
     
-    # Converte retrieved_at para timestamp/int64
-    df["retrieved_at"] = pd.to_datetime(df["retrieved_at"]).astype("int64") // 10**9 
+    # Converte retrieved_at para epoch em segundos (int64), independente da resolução do datetime64
+    df["retrieved_at"] = to_epoch_seconds(df["retrieved_at"].to_numpy())
+
+    # Mescla com o gold existente: prevalece a coleta mais recente, não o arquivo lido por último
+    # (2025-09-29.parquet ordena antes de 2025-09-29_HHMMSS.parquet). O sort estável mantém,
+    # no empate, a ordem gold -> silver novo.
+    if os.path.exists(gold_file):
+        df = pd.concat([compact_schema.read_frame(gold_file), df], ignore_index=True)
+    df.sort_values("retrieved_at", kind="stable", inplace=True)
+    df.drop_duplicates(subset=DEDUP_KEYS, keep="last", inplace=True)
 
     # --- SALVA GOLD PARQUET (idempotente) ---
-    gold_file = os.path.join(GOLD_DIR, f"{date_str}.parquet")
-    df.to_parquet(gold_file, engine="pyarrow", compression="snappy", index=False)
-    logger.info("load_ok", arquivo=gold_file, count=len(df))
+    tmp_gold = gold_file + ".tmp"
+    with span("write_gold", logger=logger) as s:
+        if compact_schema.enabled():
+            compact_schema.write_table(pa.Table.from_pandas(df, preserve_index=False), gold_file)
+        else:
+            df.to_parquet(tmp_gold, engine="pyarrow", compression="snappy", index=False)
+            os.replace(tmp_gold, gold_file)
+        s.add(rows_out=len(df), bytes_written=os.path.getsize(gold_file))
+    update_manifest(entries)
+    logger.info("load_ok", arquivo=gold_file, count=len(df), new_files=len(pending))
 
     # Log de métricas
     elapsed = time.time() - start
     log_metrics(logger, "load", df.shape[0], elapsed)
 
     # --- SALVA NO BANCO (idempotente) ---
-    if DB_URI:
-        engine = create_engine(DB_URI)
-        with engine.connect() as conn:
-            # Remove registros do mesmo dia antes de inserir
-            conn.execute(text("DELETE FROM exchange_rates WHERE date = :date"), {"date": date_str})
-
-        df.to_sql("exchange_rates", con=engine, if_exists="append", method="multi", index=False, chunksize=1000)
-        logger.info("load_db_ok", table="exchange_rates", count=len(df))
+    # upsert_db=False: o pipeline faz a carga no banco em uma etapa própria
+    if db_uri() and upsert_db:
+        count = bulk_upsert(df, db_uri(), run_id=run_id)
+        logger.info("load_db_ok", table="exchange_rates", count=count)
 
     return gold_file
 
+@lru_cache(maxsize=8)
+def get_engine(db_uri):
+    """Engine SQLAlchemy reutilizado entre cargas (pool de conexões por URI)"""
+    from sqlalchemy import create_engine  # SQLAlchemy só é importado quando há banco
+
+    return create_engine(db_uri, pool_pre_ping=True)
+
+def _rates_table(table_name="exchange_rates"):
+    from sqlalchemy import MetaData, Table, Column, Text, Float, BigInteger, Index
+
+    metadata = MetaData()
+    return Table(
+        table_name,
+        metadata,
+        Column("base_currency", Text),
+        Column("target_currency", Text),
+        Column("rate", Float),
+        Column("retrieved_at", BigInteger),
+        Column("date", Text),
+        Column("run_id", Text),
+        Column("pipeline_version", Text),
+        Index(f"ux_{table_name}_key", "date", "base_currency", "target_currency", unique=True),
+    )
+
+def ensure_table(engine, table_name="exchange_rates"):
+    """
+    Cria a tabela (se não existir) e a chave única (date, base_currency, target_currency).
+    Em tabelas antigas sem a chave, remove duplicatas (mantendo a última gravada) antes de criá-la.
+    """
+    from sqlalchemy import inspect, text
+
+    table = _rates_table(table_name)
+    index_name = f"ux_{table_name}_key"
+    inspector = inspect(engine)
+    if not inspector.has_table(table_name):
+        table.create(engine)
+        return table
+
+    if index_name in {ix["name"] for ix in inspector.get_indexes(table_name)}:
+        return table
+
+    keys = ", ".join(DEDUP_KEYS)
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(
+                f"DELETE FROM {table_name} a USING {table_name} b "
+                f"WHERE a.ctid < b.ctid AND " + " AND ".join(f"a.{k} = b.{k}" for k in DEDUP_KEYS)
+            ))
+        else:
+            conn.execute(text(
+                f"DELETE FROM {table_name} WHERE rowid NOT IN "
+                f"(SELECT MAX(rowid) FROM {table_name} GROUP BY {keys})"
+            ))
+        conn.execute(text(f"CREATE UNIQUE INDEX {index_name} ON {table_name} ({keys})"))
+    return table
+
+def _upsert_statement(table, dialect_name):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upsert não suportado para o dialeto {dialect_name}")
+
+    from sqlalchemy import and_, case
+
+    stmt = insert(table)
+    update_cols = {c.name: stmt.excluded[c.name] for c in table.columns if c.name not in DEDUP_KEYS}
+    unchanged = and_(*(table.c[c] == stmt.excluded[c] for c in VALUE_COLUMNS))
+    for name in LINEAGE_COLUMNS:
+        update_cols[name] = case((unchanged, table.c[name]), else_=stmt.excluded[name])
+    return stmt.on_conflict_do_update(index_elements=DEDUP_KEYS, set_=update_cols)
+
+def _copy_upsert(conn, table, df):
+    """Caminho rápido no Postgres: COPY para tabela temporária + INSERT ... ON CONFLICT"""
+    columns = [c.name for c in table.columns]
+    unchanged = " AND ".join(f"{table.name}.{c} = EXCLUDED.{c}" for c in VALUE_COLUMNS)
+    updates = ", ".join(
+        f"{c} = CASE WHEN {unchanged} THEN {table.name}.{c} ELSE EXCLUDED.{c} END" if c in LINEAGE_COLUMNS
+        else f"{c} = EXCLUDED.{c}"
+        for c in columns if c not in DEDUP_KEYS
+    )
+    buffer = io.StringIO()
+    df[columns].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    cursor.execute(f"CREATE TEMP TABLE tmp_{table.name} (LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP")
+    cursor.copy_expert(f"COPY tmp_{table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(
+        f"INSERT INTO {table.name} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM tmp_{table.name} "
+        f"ON CONFLICT ({', '.join(DEDUP_KEYS)}) DO UPDATE SET {updates}"
+    )
+
+def bulk_upsert(df, db_uri, table_name="exchange_rates", chunksize=10000, run_id=None):
+    """
+    Carga em lote idempotente: uma única transação com INSERT ... ON CONFLICT DO UPDATE
+    na chave (date, base_currency, target_currency). No Postgres usa COPY.
+    run_id/pipeline_version de uma linha existente só mudam quando rate/retrieved_at mudam.
+    """
+    logger = get_logger(run_id=run_id, service="load")
+    start = time.time()
+
+    engine = get_engine(db_uri)
+    table = ensure_table(engine, table_name)
+    columns = [c.name for c in table.columns]
+    df = df[[c for c in columns if c in df.columns]].drop_duplicates(subset=DEDUP_KEYS, keep="last")
+
+    with span("bulk_upsert", logger=logger) as s, engine.begin() as conn:
+        s.add(rows_in=len(df), rows_out=len(df))
+        if engine.dialect.name == "postgresql":
+            _copy_upsert(conn, table, df)
+        else:
+            stmt = _upsert_statement(table, engine.dialect.name)
+            records = df.to_dict(orient="records")
+            for i in range(0, len(records), chunksize):
+                conn.execute(stmt, records[i:i + chunksize])
+
+    log_metrics(logger, "load_db", len(df), time.time() - start)
+    return len(df)
+
 def save_to_parquet(df: pd.DataFrame, outfile: str | Path):
     """Salva DataFrame em arquivo parquet"""
     df.to_parquet(outfile, index=False)
@@ -72,13 +310,19 @@ def save_to_sqlite(df: pd.DataFrame, dbfile: str | Path, table_name: str, date_s
     conn = sqlite3.connect(dbfile)
     cursor = conn.cursor()
 
-    if date_str:
-        # Remove registros do mesmo dia
-        cursor.execute(f"DELETE FROM {table_name} WHERE date = ?", (date_str,))
-        conn.commit()
+    try:
+        # Remoção e inserção na mesma transação
+        if date_str:
+            # Remove registros do mesmo dia
+            cursor.execute(f"DELETE FROM {table_name} WHERE date = ?", (date_str,))
 
-    df.to_sql(table_name, conn, if_exists="append", index=False)
-    conn.close()
+        df.to_sql(table_name, conn, if_exists="append", index=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 def main(date_str=None):
     gold_file = aggregate_silver_files(date_str=date_str)
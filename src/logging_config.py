@@ -2,31 +2,250 @@ import structlog
 import logging
 from datetime import datetime
 import os
+import sys
+import json
+import time
 import uuid
+import queue
+import atexit
+import threading
+import multiprocessing.util
+import contextvars
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import ContextDecorator
+from src.config import get_settings
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS
+    resource = None
+
+try:
+    import orjson
+except ImportError:  # serialização com json da biblioteca padrão
+    orjson = None
 
 # Diretório de logs
 LOG_DIR = os.path.join(os.path.dirname(__file__), "../logs")
-os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOG_DIR, f"{datetime.utcnow().strftime('%Y-%m-%d')}.log")
 
-# Configuração básica do logging
-logging.basicConfig(
-    format="%(message)s",
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+# ---------------------------
+# Escrita de logs em segundo plano
+# ---------------------------
+class AsyncLogWriter:
+    """
+    Thread de fundo que grava linhas de log em lote (um ou mais arquivos e o console).
+    write() nunca bloqueia quem loga: com a fila cheia a linha é descartada e contada
+    em `dropped`. Os arquivos ficam abertos e recebem um write+flush por lote
+    (até `batch_size` linhas ou `flush_interval` segundos). Depois de close(), linhas
+    novas também são descartadas e contadas (ex.: logs emitidos durante o atexit).
+    """
+
+    CONSOLE = "<console>"
+
+    def __init__(self, batch_size=512, flush_interval=0.5, max_queue=100_000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._start()
+
+    def _start(self):
+        self.queue = queue.Queue(self.max_queue)
+        self.dropped = 0
+        self.closed = False
+        self._files = {}
+        self._thread = threading.Thread(target=self._run, name="async-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, target, line):
+        if self.closed:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait((target, line))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            stop = batch[-1] is None
+            self._flush([entry for entry in batch if entry is not None])
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _flush(self, batch):
+        by_target = {}
+        for target, line in batch:
+            by_target.setdefault(target, []).append(line)
+        for target, lines in by_target.items():
+            try:
+                handle = sys.stderr if target == self.CONSOLE else self._files.get(target)
+                if handle is None:
+                    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+                    handle = self._files[target] = open(target, "a", encoding="utf-8")
+                handle.write("\n".join(lines) + "\n")
+                handle.flush()
+            except OSError:
+                self.dropped += len(lines)
+
+    def flush(self):
+        """
+        Espera a fila esvaziar (linhas já entregues ao sistema operacional).
+        Retorna sem esperar se a thread já terminou (ex.: logging.shutdown após o close do atexit).
+        """
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks and self._thread.is_alive():
+                self.queue.all_tasks_done.wait(self.flush_interval)
+
+    def close(self):
+        self.closed = True
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+            if self.dropped:
+                # O logging já não passa por aqui: o aviso vai direto para o console
+                sys.stderr.write(dumps({"event": "log_lines_dropped", "dropped": self.dropped,
+                                        "level": "warning", "timestamp": datetime.utcnow().isoformat()}) + "\n")
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Escritor em segundo plano compartilhado (criado sob demanda, um por processo)"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AsyncLogWriter()
+            atexit.register(_writer.close)
+            # Workers do multiprocessing saem com os._exit: atexit não roda, os finalizers sim
+            multiprocessing.util.Finalize(_writer, _writer.close, exitpriority=10)
+        return _writer
+
+def _reset_writer_after_fork():
+    # A thread do escritor não sobrevive ao fork (ex.: ProcessPoolExecutor do backfill);
+    # o processo filho cria o seu na primeira linha logada
+    global _writer, _writer_lock
+    _writer, _writer_lock = None, threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_writer_after_fork)
+
+class AsyncLogHandler(logging.Handler):
+    """Handler do logging que só enfileira a linha formatada no AsyncLogWriter"""
+
+    def __init__(self, target, writer=None):
+        super().__init__()
+        self.target = target
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            (self.writer or get_writer()).write(self.target, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        (self.writer or get_writer()).flush()
+
+# ---------------------------
+# Serialização e amostragem
+# ---------------------------
+def dumps(obj, **kwargs):
+    """JSON compacto: orjson quando instalado, senão json da biblioteca padrão"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+def _parse_sample_rates(spec):
+    """Ex.: "span=0.1,fetch_unchanged=0.01" -> {"span": 0.1, "fetch_unchanged": 0.01}"""
+    rates = {}
+    for item in filter(None, (spec or "").split(",")):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+SAMPLE_RATES = {}
+_sample_counters = {}
+_sample_lock = threading.Lock()
+
+def sample_events(logger, method_name, event_dict):
+    """
+    Processador structlog: mantém só uma fração dos eventos ruidosos (SAMPLE_RATES).
+    Amostragem determinística (1 a cada round(1/taxa)); avisos e erros nunca são descartados.
+    """
+    rate = SAMPLE_RATES.get(event_dict.get("event"))
+    if rate is None or rate >= 1 or method_name in ("warning", "error", "critical", "exception"):
+        return event_dict
+    every = max(1, round(1 / rate)) if rate > 0 else None
+    with _sample_lock:
+        count = _sample_counters.get(event_dict["event"], 0)
+        _sample_counters[event_dict["event"]] = count + 1
+    if every is None or count % every:
+        raise structlog.DropEvent
+    event_dict["sample_rate"] = rate
+    return event_dict
+
+# ---------------------------
+# Configuração
+# ---------------------------
+_configured = False
+
+def configure_logging(mode=None, sample_rates=None):
+    """
+    mode="sync": FileHandler + StreamHandler na thread de quem loga.
+    mode="queue": linhas vão para o AsyncLogWriter (arquivo e console em lote, sem bloquear).
+    Padrões em src.config (LOG_MODE, LOG_SAMPLE_RATES); sample_rates substitui SAMPLE_RATES.
+    """
+    global _configured
+    settings = get_settings()
+    mode = mode or settings.log_mode
+    if sample_rates is None and not _configured:
+        sample_rates = _parse_sample_rates(settings.log_sample_rates)
+    if sample_rates is not None:
+        SAMPLE_RATES.clear()
+        SAMPLE_RATES.update(sample_rates)
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    if mode == "queue":
+        handlers = [AsyncLogHandler(LOG_FILE), AsyncLogHandler(AsyncLogWriter.CONSOLE)]
+    else:
+        handlers = [logging.FileHandler(LOG_FILE), logging.StreamHandler()]
+    logging.basicConfig(format="%(message)s", level=logging.INFO, handlers=handlers, force=True)
+    _configured = True
+    return mode
+
+def _configure_on_first_event(logger, method_name, event_dict):
+    """Processador structlog: handlers (e logs/) só são criados no primeiro evento, não na importação"""
+    if not _configured:
+        configure_logging()
+    return event_dict
 
 # Configuração do structlog
 structlog.configure(
     processors=[
+        _configure_on_first_event,
+        sample_events,
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.stdlib.add_log_level,
         structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.JSONRenderer()
+        structlog.processors.JSONRenderer(serializer=dumps)
     ],
     wrapper_class=structlog.stdlib.BoundLogger,
     context_class=dict,
@@ -65,3 +284,219 @@ def log_metrics(logger, step_name, count, elapsed_seconds):
         processed=count,
         elapsed_seconds=round(elapsed_seconds, 4)
     )
+
+
+# ---------------------------
+# Spans: medição por etapa e sub-etapa
+# ---------------------------
+_current_span = contextvars.ContextVar("current_span", default=None)
+_profiler = None  # Profiler ativo (start_profiling)
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux informa em KB
+
+def _io_bytes():
+    """(lidos, escritos) pelo processo segundo /proc/self/io (None fora do Linux)"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def current_span():
+    """Span mais interno ativo no contexto atual (ou None)"""
+    return _current_span.get()
+
+class Span(ContextDecorator):
+    """
+    Mede uma etapa: tempo de parede, CPU, pico de RSS, linhas e bytes.
+    Uso como context manager (`with span("load") as s: s.add(rows_out=n)`)
+    ou decorator (`@span("transform")`). Spans aninhados ganham o caminho
+    do pai ("pipeline/load/read"). Bytes não informados via add() vêm de
+    /proc/self/io (contadores do processo inteiro).
+    """
+
+    def __init__(self, name, logger=None, **fields):
+        self.name = name
+        self.logger = logger
+        self.fields = fields
+        self.rows_in = self.rows_out = 0
+        self.bytes_read = self.bytes_written = None
+        self.record = None
+
+    def _recreate_cm(self):
+        # Como decorator, cada chamada usa um span novo
+        return Span(self.name, self.logger, **self.fields)
+
+    def add(self, rows_in=0, rows_out=0, bytes_read=0, bytes_written=0):
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+        if bytes_read:
+            self.bytes_read = (self.bytes_read or 0) + bytes_read
+        if bytes_written:
+            self.bytes_written = (self.bytes_written or 0) + bytes_written
+        return self
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.thread = threading.get_ident()
+        self.path = f"{self.parent.path}/{self.name}" if self.parent else self.name
+        self._token = _current_span.set(self)
+        self._peak_floor = 0
+        if tracemalloc.is_tracing():
+            self._outer_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        self._profile = _profiler.begin(self) if _profiler else None
+        self._io = _io_bytes()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        io = _io_bytes()
+        if self._io and io:
+            if self.bytes_read is None:
+                self.bytes_read = io[0] - self._io[0]
+            if self.bytes_written is None:
+                self.bytes_written = io[1] - self._io[1]
+        if self._profile:
+            _profiler.end(self._profile)
+        _current_span.reset(self._token)
+
+        self.record = {
+            "span": self.path,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_second": round((self.rows_out or self.rows_in) / wall, 1) if wall else None,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "status": "error" if exc_type else "ok",
+            **self.fields,
+        }
+        if tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], self._peak_floor)
+            self.record["python_peak_bytes"] = peak
+            if self.parent:
+                self.parent._peak_floor = max(self.parent._peak_floor, self._outer_peak, peak)
+
+        (self.logger or get_logger()).info("span", **self.record)
+        if _profiler:
+            _profiler.write(self.record)
+        return False
+
+def span(name, logger=None, **fields):
+    """Atalho para Span (context manager ou decorator)"""
+    return Span(name, logger=logger, **fields)
+
+class Profiler:
+    """
+    Perfilamento opcional de uma execução (start_profiling/stop_profiling).
+    Cada span fechado vira uma linha em <run_id>.spans.jsonl; no fim são gravados
+    um textfile Prometheus (<run_id>.prom), as estatísticas do cProfile
+    (<run_id>.pstats, perfis dos spans raiz de cada thread somados) e os maiores pontos
+    de alocação do tracemalloc.
+    """
+
+    def __init__(self, run_id, out_dir=None, cprofile=True, trace_memory=True):
+        self.run_id = run_id
+        self.out_dir = out_dir or os.path.join(LOG_DIR, "profiles")
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.jsonl_file = os.path.join(self.out_dir, f"{run_id}.spans.jsonl")
+        self.prom_file = os.path.join(self.out_dir, f"{run_id}.prom")
+        self.pstats_file = os.path.join(self.out_dir, f"{run_id}.pstats")
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.records = []
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def begin(self, span):
+        # Um cProfile por span raiz de cada thread (etapas paralelas do pipeline rodam em threads)
+        if not self.cprofile or (span.parent is not None and span.parent.thread == span.thread):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Python 3.12+: um único perfilador global já cobre todas as threads
+            return None
+        return profile
+
+    def end(self, profile):
+        profile.disable()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def write(self, record):
+        line = json.dumps({"run_id": self.run_id, "timestamp": datetime.utcnow().isoformat(), **record}, default=str)
+        with self._lock:
+            self.records.append(record)
+            with open(self.jsonl_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def prometheus_text(self):
+        """Métricas no formato textfile do node_exporter (último valor por span)"""
+        metrics = {
+            "wall_seconds": "Tempo de parede do span",
+            "cpu_seconds": "Tempo de CPU do processo durante o span",
+            "peak_rss_bytes": "Pico de RSS do processo ao fim do span",
+            "python_peak_bytes": "Pico de memória Python (tracemalloc) no span",
+            "rows_in": "Linhas de entrada",
+            "rows_out": "Linhas de saída",
+            "bytes_read": "Bytes lidos",
+            "bytes_written": "Bytes escritos",
+        }
+        latest = {r["span"]: r for r in self.records}
+        lines = []
+        for metric, help_text in metrics.items():
+            name = f"pipeline_span_{metric}"
+            samples = [(s, r[metric]) for s, r in latest.items() if r.get(metric) is not None]
+            if not samples:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f'{name}{{run_id="{self.run_id}",span="{s}"}} {value}' for s, value in samples]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        tmp_file = self.prom_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_file, self.prom_file)  # textfile collector exige escrita atômica
+
+        if self._profiles:
+            stats = pstats.Stats(self._profiles[0])
+            for profile in self._profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(self.pstats_file)
+
+        if tracemalloc.is_tracing():
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            for stat in top:
+                self.write({"span": "tracemalloc_top", "site": str(stat.traceback), "size_bytes": stat.size,
+                            "count": stat.count})
+            if self.trace_memory:
+                tracemalloc.stop()
+
+def start_profiling(run_id, out_dir=None, cprofile=True, trace_memory=True):
+    """Ativa o perfilamento para esta execução (também via env PIPELINE_PROFILE=1 no main.py)"""
+    global _profiler
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _profiler = Profiler(run_id, out_dir=out_dir, cprofile=cprofile, trace_memory=trace_memory)
+    return _profiler
+
+def stop_profiling():
+    """Grava os artefatos do perfilamento e o desativa; retorna o Profiler encerrado"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler:
+        profiler.close()
+    return profiler
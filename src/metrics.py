@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOWS = (7, 30, 90)
+
+def to_wide(df, value="rate"):
+    """
+    Pivota o histórico longo em matriz datas x moedas (uma linha por data).
+    Se houver mais de um snapshot no dia, prevalece o último.
+    Não altera o DataFrame recebido.
+    """
+    data = df[["date", "target_currency", value]].copy()
+    data["date"] = pd.to_datetime(data["date"])
+    data = data.drop_duplicates(subset=["date", "target_currency"], keep="last")
+    wide = data.pivot(index="date", columns="target_currency", values=value)
+    return wide.sort_index()
+
+def month_over_month(wide):
+    """% de variação do preço atual contra a média do mês anterior (dias 1 a 28)"""
+    last_date = wide.index[-1]
+    month_ago = last_date - pd.DateOffset(months=1)
+    mask = (wide.index >= month_ago.replace(day=1)) & (wide.index <= month_ago.replace(day=28))
+    past_avg = wide[mask].mean()
+    current = wide.iloc[-1]
+    return ((current - past_avg) / past_avg * 100).fillna(0)
+
+def rolling_metrics(wide, windows=DEFAULT_WINDOWS):
+    """
+    Métricas em janelas móveis sobre a matriz datas x moedas, todas vetorizadas.
+    As janelas contam observações (datas com cotação), não dias corridos.
+    Retorna dict {nome_da_métrica: DataFrame datas x moedas}.
+    """
+    returns = wide.pct_change(fill_method=None)
+    out = {}
+    for w in windows:
+        rolling = wide.rolling(w, min_periods=2)
+        mean, std = rolling.mean(), rolling.std()
+        out[f"pct_change_{w}d"] = (wide / wide.shift(w - 1) - 1) * 100
+        out[f"volatility_{w}d"] = returns.rolling(w - 1, min_periods=2).std() * 100
+        out[f"drawdown_{w}d"] = (wide / wide.rolling(w, min_periods=1).max() - 1) * 100
+        out[f"zscore_{w}d"] = (wide - mean) / std.replace(0, np.nan)
+    return out
+
+def compute_metrics(df, windows=DEFAULT_WINDOWS):
+    """
+    Calcula em uma única passada, para a data mais recente de cada moeda:
+    current_price, pct_change (vs. mês anterior) e, para cada janela,
+    pct_change_Nd, volatility_Nd, drawdown_Nd e zscore_Nd.
+    """
+    wide = to_wide(df)
+    latest = {name: frame.iloc[-1] for name, frame in rolling_metrics(wide, windows).items()}
+
+    metrics = pd.DataFrame({
+        "current_price": wide.iloc[-1],
+        "pct_change": month_over_month(wide),
+        **latest,
+    })
+    metrics.index.name = "target_currency"
+    return metrics.reset_index()
+
+def top_movers(metrics, n=5, by="pct_change"):
+    """As n moedas com maior variação absoluta"""
+    order = metrics[by].abs().sort_values(ascending=False).index
+    return metrics.loc[order].head(n)
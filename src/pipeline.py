@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.raw_archive import read_snapshot
+from src.logging_config import get_logger, span
+
+STATE_FILE = os.path.join(os.path.dirname(__file__), "../data/gold/_pipeline_state.json")
+
+
+def file_digest(path):
+    """sha256 do arquivo (src.load, com pandas, só é importado quando há entradas para comparar)"""
+    from src.load import file_digest as digest
+
+    return digest(path)
+
+
+def raw_payload_digest(path):
+    """Hash do snapshot bruto sem `_metadata` (horário da coleta não conta como mudança)"""
+    data = read_snapshot(path)
+    data.pop("_metadata", None)
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Stage:
+    """
+    Etapa do pipeline.
+    func(results, run_id) recebe os resultados das dependências e devolve um dict
+    serializável em JSON; a chave "outputs" lista os arquivos gerados.
+    inputs(results) lista os arquivos de entrada: a etapa é pulada quando o hash do
+    conteúdo deles (e de params()) é igual ao da última execução bem-sucedida.
+    Etapas sem inputs (fontes, como a ingestão) sempre executam.
+    """
+
+    def __init__(self, name, func, deps=(), inputs=None, fingerprint=file_digest, params=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.fingerprint = fingerprint
+        self.params = params
+
+    def digest(self, results):
+        if self.inputs is None:
+            return None
+        digest = hashlib.sha256()
+        for content_hash in sorted(self.fingerprint(path) for path in self.inputs(results)):
+            digest.update(content_hash.encode("utf-8"))
+        if self.params:
+            digest.update(json.dumps(self.params(), sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+
+def _outputs_exist(result):
+    # Referências do arquivo compactado ("<segmento>#<offset>") apontam para o segmento
+    return all(os.path.exists(path.split("#", 1)[0]) for path in result.get("outputs", []))
+
+
+class Pipeline:
+    """
+    Executa etapas em ordem topológica; etapas do mesmo nível (sem dependência
+    entre si) rodam em paralelo. O resultado de cada etapa fica em STATE_FILE,
+    de modo que uma execução que falhou é retomada a partir da etapa que falhou.
+    """
+
+    def __init__(self, stages, state_file=STATE_FILE, max_workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.max_workers = max_workers
+
+    def levels(self):
+        """Etapas agrupadas por nível de dependência"""
+        level_of = {}
+        for stage in self.stages.values():
+            missing = [d for d in stage.deps if d not in level_of]
+            if missing:
+                raise ValueError(f"Etapa {stage.name} depende de etapas não declaradas antes: {missing}")
+            level_of[stage.name] = max((level_of[d] + 1 for d in stage.deps), default=0)
+        levels = [[] for _ in range(max(level_of.values(), default=-1) + 1)]
+        for name, level in level_of.items():
+            levels[level].append(self.stages[name])
+        return levels
+
+    def load_state(self):
+        if not os.path.exists(self.state_file):
+            return {"stages": {}, "last_run": {}}
+        with open(self.state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True, default=str)
+        os.replace(tmp_file, self.state_file)
+
+    def _reusable(self, cached, digest, resume_run):
+        if not cached or not _outputs_exist(cached["result"]):
+            return False
+        if digest is not None and cached["hash"] == digest:
+            return True
+        # Retomada: etapas concluídas na execução que falhou não são refeitas
+        return resume_run is not None and cached["run_id"] == resume_run
+
+    def run(self, run_id, resume=True):
+        """Executa o pipeline e devolve {etapa: resultado}"""
+        logger = get_logger(run_id=run_id, service="pipeline")
+        state = self.load_state()
+        last_run = state.get("last_run", {})
+        resume_run = last_run.get("run_id") if resume and last_run.get("status") == "failed" else None
+        if resume_run:
+            # Mantém o id da execução original até ela terminar com sucesso
+            run_id = resume_run
+            logger.info("pipeline_resume", failed_stage=last_run.get("failed_stage"))
+
+        results = {}
+        state["last_run"] = {"run_id": run_id, "status": "running", "started_at": datetime.utcnow().isoformat()}
+        for level in self.levels():
+            todo = []
+            for stage in level:
+                deps = {d: results[d] for d in stage.deps}
+                digest = stage.digest(deps)
+                cached = state["stages"].get(stage.name)
+                if self._reusable(cached, digest, resume_run):
+                    results[stage.name] = cached["result"]
+                    logger.info("stage_skipped", stage=stage.name, reason="inputs_unchanged")
+                    continue
+                todo.append((stage, deps, digest))
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(todo) or 1)) as pool:
+                # Cada etapa roda com uma cópia do contexto: seus spans ficam aninhados no span atual
+                futures = [(stage, digest, pool.submit(contextvars.copy_context().run,
+                                                       self._run_stage, stage, deps, run_id, logger))
+                           for stage, deps, digest in todo]
+                failed = None
+                for stage, digest, future in futures:
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as e:
+                        logger.error("stage_failed", stage=stage.name, error=str(e))
+                        failed = failed or (stage, e)
+                        continue
+                    results[stage.name] = result
+                    state["stages"][stage.name] = {
+                        "hash": digest, "result": result, "run_id": run_id,
+                        "elapsed_seconds": round(elapsed, 3), "finished_at": datetime.utcnow().isoformat(),
+                    }
+                    self.save_state(state)
+
+            if failed:
+                state["last_run"].update(status="failed", failed_stage=failed[0].name)
+                self.save_state(state)
+                raise failed[1]
+
+        state["last_run"].update(status="ok", finished_at=datetime.utcnow().isoformat())
+        self.save_state(state)
+        return results
+
+    def _run_stage(self, stage, deps, run_id, logger):
+        with span(stage.name, logger=logger) as stage_span:
+            result = stage.func(deps, run_id) or {}
+        elapsed = stage_span.record["wall_seconds"]
+        logger.info("stage_ok", stage=stage.name, elapsed_seconds=round(elapsed, 3))
+        return result, elapsed
@@ -0,0 +1,97 @@
+import math
+import pandas as pd
+from src.config import get_settings
+
+try:
+    import tiktoken
+except ImportError:  # contagem aproximada quando tiktoken não está instalado
+    tiktoken = None
+
+PROMPT_HEADER = (
+    "Você é um analista financeiro. Dados agregados (uma moeda por linha, "
+    "ordenadas por variação absoluta; colunas: moeda|preço|var% vs mês anterior|volatilidade%):\n"
+)
+PROMPT_FOOTER = (
+    "\nGere um resumo executivo curto (3 frases) orientado a negócios, 3 insights acionáveis e um alerta se "
+    "volatilidade > limiar. Explique comparando com o mês passado e cite percentuais."
+)
+COLUMNS = ["target_currency", "current_price", "pct_change", "volatility"]
+
+
+def count_tokens(text, model=None):
+    """Tokens do texto (tiktoken quando disponível; senão estimativa conservadora de 3 caracteres/token)"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 3)
+
+
+def _fmt(value, spec):
+    return "-" if pd.isna(value) else format(value, spec)
+
+
+def format_row(row, decimals=2):
+    """Linha compacta: BRL|5.353|+1.23|0.48"""
+    return "|".join([
+        str(row["target_currency"]),
+        _fmt(row["current_price"], ".4g"),
+        _fmt(row["pct_change"], f"+.{decimals}f"),
+        _fmt(row["volatility"], f".{decimals}f"),
+    ])
+
+
+class CompactPrompt:
+    """
+    Prompt em formato tabular compacto que respeita um orçamento de tokens.
+    As moedas entram em ordem de significância (|pct_change|); as menos
+    significativas são descartadas inteiras até o prompt caber no orçamento.
+    """
+
+    def __init__(self, metrics, token_budget=None, model=None, decimals=2, max_rows=None):
+        # token_budget=None: LLM_PROMPT_TOKEN_BUDGET (src.config)
+        token_budget = token_budget or get_settings().prompt_token_budget
+        self.token_budget = token_budget
+        self.model = model
+        self.decimals = decimals
+
+        ordered = metrics.reindex(metrics["pct_change"].abs().sort_values(ascending=False).index)
+        if max_rows:
+            ordered = ordered.head(max_rows)
+        self.metrics = ordered
+
+        fixed = count_tokens(PROMPT_HEADER + PROMPT_FOOTER, model)
+        lines, used = [], fixed
+        for _, row in ordered[COLUMNS].iterrows():
+            line = format_row(row, decimals) + "\n"
+            cost = count_tokens(line, model)
+            if used + cost > token_budget and lines:
+                break
+            lines.append(line)
+            used += cost
+
+        self.included = [line.split("|", 1)[0] for line in lines]
+        self.dropped = [c for c in ordered["target_currency"] if c not in set(self.included)]
+        self.text = PROMPT_HEADER + "".join(lines).rstrip("\n") + PROMPT_FOOTER
+        self.tokens = count_tokens(self.text, model)
+
+    def shrink(self):
+        """Versão com a metade mais significativa das moedas (ou None se já restar uma única)"""
+        if len(self.included) <= 1:
+            return None
+        return CompactPrompt(
+            self.metrics.head(len(self.included) // 2),
+            token_budget=self.token_budget,
+            model=self.model,
+            decimals=self.decimals,
+        )
+
+    def __str__(self):
+        return self.text
+
+
+def build_prompt(metrics, token_budget=None, model=None, decimals=2, max_rows=None):
+    """Atalho para CompactPrompt"""
+    return CompactPrompt(metrics, token_budget=token_budget, model=model, decimals=decimals, max_rows=max_rows)
@@ -0,0 +1,168 @@
+import os
+import glob
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), "../data/raw/archive")
+CODEC = "zstd"
+SEGMENT_SUFFIX = ".ndjson.zst"
+INDEX_SUFFIX = ".idx"
+
+_thread_lock = threading.Lock()
+
+# Formato: um segmento por dia (YYYY-MM-DD.ndjson.zst) com um frame zstd por snapshot
+# (frames concatenados formam um stream zstd válido) e um índice lateral
+# (YYYY-MM-DD.idx, uma linha JSON por snapshot: ts, base, offset, length, size).
+# A linha do índice é o "commit": bytes do segmento sem entrada no índice são
+# descartados na próxima escrita, então leitores nunca veem snapshots parciais.
+
+
+def segment_paths(date_str, archive_dir=None):
+    """(segmento, índice) de uma data"""
+    prefix = os.path.join(archive_dir or ARCHIVE_DIR, date_str)
+    return prefix + SEGMENT_SUFFIX, prefix + INDEX_SUFFIX
+
+
+def to_epoch(value):
+    """Epoch em segundos UTC a partir de int/float, datetime ou string ISO (ingênuo = UTC)"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _snapshot_ts(data):
+    timestamp = (data.get("_metadata") or {}).get("timestamp")
+    return to_epoch(timestamp) if timestamp else int(datetime.now(timezone.utc).timestamp())
+
+
+def _read_index(index_file):
+    """(entradas, bytes válidos); uma última linha incompleta (escrita interrompida) é ignorada"""
+    entries, valid = [], 0
+    if not os.path.exists(index_file):
+        return entries, valid
+    with open(index_file, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            entries.append(json.loads(line))
+            valid += len(line)
+    return entries, valid
+
+
+def read_index(index_file):
+    return _read_index(index_file)[0]
+
+
+@contextmanager
+def _segment_lock(segment):
+    with _thread_lock, open(segment + ".lock", "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def append_snapshot(data, base_currency=None, archive_dir=None):
+    """
+    Acrescenta um snapshot ao segmento do dia (data da coleta, UTC).
+    Retorna a referência "<segmento>#<offset>", aceita por read_snapshot.
+    """
+    ts = _snapshot_ts(data)
+    date_str = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+    segment, index_file = segment_paths(date_str, archive_dir)
+    os.makedirs(os.path.dirname(segment), exist_ok=True)
+
+    import pyarrow as pa  # só quem grava/lê o arquivo compactado paga a importação
+
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+    frame = pa.compress(payload, codec=CODEC, asbytes=True)
+
+    with _segment_lock(segment):
+        entries, valid = _read_index(index_file)
+        offset = entries[-1]["offset"] + entries[-1]["length"] if entries else 0
+        with open(segment, "ab") as f:
+            f.truncate(offset)  # descarta cauda não indexada
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry = {
+            "ts": ts,
+            "base": base_currency or data.get("base_code"),
+            "offset": offset,
+            "length": len(frame),
+            "size": len(payload),
+        }
+        with open(index_file, "ab") as f:
+            f.truncate(valid)
+            f.write((json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+    return f"{segment}#{offset}"
+
+
+def _read_frame(f, entry):
+    import pyarrow as pa
+
+    f.seek(entry["offset"])
+    payload = pa.decompress(f.read(entry["length"]), decompressed_size=entry["size"], codec=CODEC, asbytes=True)
+    return json.loads(payload)
+
+
+def is_archive_ref(path):
+    return "#" in str(path)
+
+
+def read_snapshot(ref):
+    """Lê um snapshot: arquivo JSON avulso ou referência "<segmento>#<offset>" do arquivo compactado"""
+    if not is_archive_ref(ref):
+        with open(ref, "r", encoding="utf-8") as f:
+            return json.load(f)
+    segment, offset = str(ref).rsplit("#", 1)
+    index_file = segment[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+    entry = next((e for e in read_index(index_file) if e["offset"] == int(offset)), None)
+    if entry is None:
+        raise FileNotFoundError(f"Snapshot não encontrado no índice: {ref}")
+    with open(segment, "rb") as f:
+        return _read_frame(f, entry)
+
+
+def iter_segment(segment, start=None, end=None, bases=None):
+    """Snapshots de um segmento com start <= ts <= end (e base em `bases`), em ordem de escrita"""
+    index_file = segment[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+    lo = to_epoch(start) if start is not None else None
+    hi = to_epoch(end) if end is not None else None
+    entries = [
+        e for e in read_index(index_file)
+        if (lo is None or e["ts"] >= lo) and (hi is None or e["ts"] <= hi) and (not bases or e["base"] in bases)
+    ]
+    if not entries:
+        return
+    with open(segment, "rb") as f:
+        for entry in entries:
+            yield _read_frame(f, entry)
+
+
+def iter_range(start=None, end=None, bases=None, archive_dir=None):
+    """Snapshots de um intervalo de tempo: só os segmentos dos dias do intervalo são abertos"""
+    first = datetime.fromtimestamp(to_epoch(start), timezone.utc).strftime("%Y-%m-%d") if start is not None else None
+    last = datetime.fromtimestamp(to_epoch(end), timezone.utc).strftime("%Y-%m-%d") if end is not None else None
+    for segment in sorted(glob.glob(os.path.join(archive_dir or ARCHIVE_DIR, "*" + SEGMENT_SUFFIX))):
+        date_str = os.path.basename(segment)[:10]
+        if (first and date_str < first) or (last and date_str > last):
+            continue
+        yield from iter_segment(segment, start, end, bases)
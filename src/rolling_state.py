@@ -0,0 +1,209 @@
+import os
+import numpy as np
+import pandas as pd
+from src.logging_config import get_logger
+from src.metrics import DEFAULT_WINDOWS, rolling_metrics
+
+GOLD_DIR = os.path.join(os.path.dirname(__file__), "../data/gold")
+STATE_FILE = os.path.join(GOLD_DIR, "_rolling_state.npz")
+
+_ACCUMULATORS = ("count", "mean", "m2", "ewma_mean", "ewma_var")
+
+
+class RollingState:
+    """
+    Estado incremental por moeda, atualizado a cada novo dia em O(moedas):
+    - acumuladores de Welford (média/variância de todos os retornos diários)
+    - EWMA da média e da variância dos retornos
+    - buffer circular com as últimas `capacity` cotações (janelas de volatilidade etc.)
+    - soma/contagem mensal dos dias 1 a 28 (base do pct_change vs. mês anterior)
+    """
+
+    def __init__(self, capacity=max(DEFAULT_WINDOWS), alpha=0.06):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.codes = np.array([], dtype=object)
+        self.dates = np.array([], dtype="datetime64[D]")
+        self.prices = np.empty((0, 0))
+        for name in _ACCUMULATORS:
+            setattr(self, name, np.empty(0))
+        self.months = {}
+        self._prev = None
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if len(self.dates) else None
+
+    def _add_codes(self, new_codes):
+        n = len(new_codes)
+        self.codes = np.concatenate([self.codes, np.array(new_codes, dtype=object)])
+        self.prices = np.hstack([self.prices, np.full((len(self.dates), n), np.nan)])
+        for name in _ACCUMULATORS:
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(n)]))
+        self.months = {
+            key: (np.concatenate([sums, np.zeros(n)]), np.concatenate([counts, np.zeros(n)]))
+            for key, (sums, counts) in self.months.items()
+        }
+        if self._prev:
+            for name in _ACCUMULATORS:
+                self._prev[name] = np.concatenate([self._prev[name], np.zeros(n)])
+
+    def _month_add(self, date, row, sign=1):
+        day = pd.Timestamp(date)
+        if day.day > 28:
+            return
+        key = day.strftime("%Y-%m")
+        sums, counts = self.months.setdefault(key, (np.zeros(len(self.codes)), np.zeros(len(self.codes))))
+        valid = ~np.isnan(row)
+        sums[valid] += sign * row[valid]
+        counts[valid] += sign
+        # Só o mês corrente e o anterior são necessários
+        for old in sorted(self.months)[:-2]:
+            del self.months[old]
+
+    def update(self, day_df):
+        """
+        Incorpora as cotações de um dia (colunas date, target_currency, rate).
+        Datas anteriores à última já incorporada são ignoradas; a mesma data
+        substitui o snapshot anterior do dia (coletas intradiárias).
+        """
+        dates = pd.to_datetime(day_df["date"]).unique()
+        if len(dates) != 1:
+            raise ValueError("update espera as cotações de uma única data")
+        date = np.datetime64(dates[0], "D")
+        if self.last_date is not None and date < self.last_date:
+            return False
+
+        day = day_df.drop_duplicates(subset=["target_currency"], keep="last")
+        known = set(self.codes)
+        new_codes = [c for c in day["target_currency"] if c not in known]
+        if new_codes:
+            self._add_codes(new_codes)
+        row = pd.Series(day["rate"].to_numpy(dtype="float64"), index=day["target_currency"])
+        row = row.reindex(self.codes).to_numpy(dtype="float64")
+
+        if self.last_date is not None and date == self.last_date:
+            # Reaplica o dia: desfaz a contribuição do snapshot anterior
+            for name in _ACCUMULATORS:
+                setattr(self, name, self._prev[name].copy())
+            self._month_add(date, self.prices[-1], sign=-1)
+            previous = self.prices[-2] if len(self.dates) > 1 else np.full(len(self.codes), np.nan)
+            self.prices[-1] = row
+        else:
+            self._prev = {name: getattr(self, name).copy() for name in _ACCUMULATORS}
+            previous = self.prices[-1] if len(self.dates) else np.full(len(self.codes), np.nan)
+            self.dates = np.append(self.dates, date)[-self.capacity:]
+            self.prices = np.vstack([self.prices, row])[-self.capacity:]
+
+        self._month_add(date, row)
+
+        # Welford e EWMA apenas onde há retorno válido
+        ret = row / previous - 1
+        valid = np.isfinite(ret)
+        self.count[valid] += 1
+        delta = ret[valid] - self.mean[valid]
+        self.mean[valid] += delta / self.count[valid]
+        self.m2[valid] += delta * (ret[valid] - self.mean[valid])
+
+        first = valid & (self.count == 1)
+        self.ewma_mean[first] = ret[first]
+        rest = valid & ~first
+        diff = ret[rest] - self.ewma_mean[rest]
+        incr = self.alpha * diff
+        self.ewma_mean[rest] += incr
+        self.ewma_var[rest] = (1 - self.alpha) * (self.ewma_var[rest] + diff * incr)
+        return True
+
+    def wide(self):
+        """Buffer circular como DataFrame datas x moedas"""
+        return pd.DataFrame(self.prices, index=pd.DatetimeIndex(self.dates), columns=list(self.codes))
+
+    def metrics(self, windows=DEFAULT_WINDOWS):
+        """Mesmas colunas de metrics.compute_metrics, calculadas só a partir do estado"""
+        if max(windows) > self.capacity:
+            raise ValueError(f"Janela maior que a capacidade do estado ({self.capacity})")
+
+        wide = self.wide()
+        latest = {name: frame.iloc[-1] for name, frame in rolling_metrics(wide, windows).items()}
+
+        last = pd.Timestamp(self.last_date)
+        key = (last - pd.DateOffset(months=1)).strftime("%Y-%m")
+        sums, counts = self.months.get(key, (np.zeros(len(self.codes)), np.zeros(len(self.codes))))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            past_avg = pd.Series(sums / counts, index=wide.columns)
+            variance = np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), np.nan)
+        current = wide.iloc[-1]
+
+        metrics = pd.DataFrame({
+            "current_price": current,
+            "pct_change": ((current - past_avg) / past_avg * 100).fillna(0),
+            **latest,
+            "volatility_all": np.sqrt(variance) * 100,
+            "volatility_ewma": np.sqrt(self.ewma_var) * 100,
+        })
+        metrics.index.name = "target_currency"
+        return metrics.reset_index()
+
+    @classmethod
+    def from_history(cls, df, **kwargs):
+        """Reconstrói o estado a partir do histórico completo (bootstrap)"""
+        state = cls(**kwargs)
+        data = df.assign(date=pd.to_datetime(df["date"]))
+        for _, day in data.sort_values("date", kind="stable").groupby("date", sort=True):
+            state.update(day)
+        return state
+
+    def save(self, path=STATE_FILE):
+        """Checkpoint atômico ao lado do gold"""
+        arrays = {
+            "codes": self.codes.astype(str),
+            "dates": self.dates,
+            "prices": self.prices,
+            "config": np.array([self.capacity, self.alpha]),
+            **{name: getattr(self, name) for name in _ACCUMULATORS},
+        }
+        for key, (sums, counts) in self.months.items():
+            arrays[f"month_sum_{key}"] = sums
+            arrays[f"month_count_{key}"] = counts
+        if self._prev:
+            arrays.update({f"prev_{name}": value for name, value in self._prev.items()})
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        """Carrega o checkpoint; estado vazio se ainda não existir"""
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            capacity, alpha = data["config"]
+            state = cls(capacity=int(capacity), alpha=float(alpha))
+            state.codes = data["codes"].astype(object)
+            state.dates = data["dates"]
+            state.prices = data["prices"]
+            for name in _ACCUMULATORS:
+                setattr(state, name, data[name])
+            for key in data.files:
+                if key.startswith("month_sum_"):
+                    month = key[len("month_sum_"):]
+                    state.months[month] = (data[key], data[f"month_count_{month}"])
+            if "prev_count" in data.files:
+                state._prev = {name: data[f"prev_{name}"] for name in _ACCUMULATORS}
+        return state
+
+
+def update_state(gold_df, path=STATE_FILE, run_id=None):
+    """Atualiza o checkpoint com as cotações mais recentes do gold (uma data por vez)"""
+    logger = get_logger(run_id=run_id, service="rolling_state")
+    state = RollingState.load(path)
+    data = gold_df.assign(date=pd.to_datetime(gold_df["date"]))
+    updated = 0
+    for _, day in data.sort_values("date", kind="stable").groupby("date", sort=True):
+        updated += state.update(day)
+    state.save(path)
+    logger.info("rolling_state_ok", arquivo=path, days=updated, currencies=len(state.codes))
+    return state
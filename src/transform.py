@@ -1,47 +1,283 @@
 import os
+import json
+import time
+from itertools import islice
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from datetime import datetime
 from pathlib import Path
 import argparse
+from src import raw_archive, compact_schema
+from src.logging_config import get_logger, log_metrics, span
 
 # Diretórios
 BASE_DIR = Path(__file__).parent.parent
+RAW_DIR = BASE_DIR / "data" / "raw"
+REJECTS_DIR = RAW_DIR / "rejects"
 SILVER_DIR = BASE_DIR / "data" / "silver"
-os.makedirs(SILVER_DIR, exist_ok=True)
+
+RATE_DECIMALS = 6
+
+SILVER_SCHEMA = pa.schema([
+    ("base_currency", pa.string()),
+    ("target_currency", pa.string()),
+    ("rate", pa.float64()),
+    ("retrieved_at", pa.string()),
+    ("date", pa.string()),
+])
+
+def _retrieved_at(data):
+    """Timestamp ISO da coleta (metadados do ingest ou horário de atualização da API)"""
+    metadata = data.get("_metadata") or {}
+    if metadata.get("timestamp"):
+        return metadata["timestamp"]
+    if data.get("time_last_update_unix"):
+        return datetime.utcfromtimestamp(data["time_last_update_unix"]).isoformat()
+    return datetime.utcnow().isoformat()
+
+def _rate_array(values):
+    try:
+        return pa.array(values, type=pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Valores não numéricos viram nulos e serão rejeitados
+        return pa.array(pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce"), type=pa.float64())
+
+def snapshot_to_table(data, retrieved_at=None):
+    """
+    Converte um snapshot bruto diretamente em colunas Arrow (sem dicts por linha).
+    Aceita o formato da API ({"conversion_rates": {...}}) e o formato lista
+    ([{"currency": ..., "rate": ...}]).
+    """
+    if isinstance(data, dict) and "conversion_rates" in data:
+        rates = data["conversion_rates"] or {}
+        targets = pa.array(list(rates.keys()), type=pa.string())
+        values = _rate_array(list(rates.values()))
+        base = data.get("base_code", "USD")
+        retrieved_at = retrieved_at or _retrieved_at(data)
+    elif isinstance(data, list):
+        table = pa.Table.from_pylist(data)
+        column = "target_currency" if "target_currency" in table.column_names else "currency"
+        targets = table[column].cast(pa.string()).combine_chunks()
+        values = _rate_array(table["rate"].to_pylist())
+        base = "USD"
+        retrieved_at = retrieved_at or datetime.utcnow().isoformat()
+    else:
+        raise ValueError("Formato de arquivo não suportado")
+
+    n = len(targets)
+    return pa.table({
+        "base_currency": pa.repeat(pa.scalar(base, pa.string()), n),
+        "target_currency": targets,
+        "rate": values,
+        "retrieved_at": pa.repeat(pa.scalar(retrieved_at, pa.string()), n),
+        "date": pa.repeat(pa.scalar(retrieved_at[:10], pa.string()), n),
+    }, schema=SILVER_SCHEMA)
+
+def validate_table(table):
+    """
+    Valida e arredonda de forma vetorizada.
+    Retorna (tabela válida, tabela de rejeitos).
+    """
+    rate = table["rate"]
+    valid = pc.fill_null(pc.and_(pc.is_finite(rate), pc.greater(rate, 0)), False)
+
+    clean = table.filter(valid)
+    clean = clean.set_column(
+        clean.schema.get_field_index("rate"), "rate", pc.round(clean["rate"], RATE_DECIMALS)
+    )
+    rejects = table.filter(pc.invert(valid)).select(["target_currency", "rate", "retrieved_at"])
+    return clean, rejects
+
+def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza um DataFrame bruto (currency/rate) para as colunas Silver e remove taxas inválidas"""
+    df = df.rename(columns={"currency": "target_currency"})
+    if "base_currency" not in df.columns:
+        df["base_currency"] = "USD"
+    df["rate"] = pd.to_numeric(df["rate"], errors="coerce")
+    df = df[df["rate"].notna() & (df["rate"] > 0)].copy()
+    df["rate"] = df["rate"].round(RATE_DECIMALS)
+
+    subset = ["target_currency", "retrieved_at"] if "retrieved_at" in df.columns else ["target_currency"]
+    return df.drop_duplicates(subset=subset).reset_index(drop=True)
+
+def write_rejects(rejects, rejects_dir=REJECTS_DIR):
+    """Grava todos os rejeitos do lote de uma vez, um arquivo por data"""
+    if rejects is None or rejects.num_rows == 0:
+        return []
+
+    Path(rejects_dir).mkdir(parents=True, exist_ok=True)
+    df = rejects.to_pandas()
+    df["rate"] = df["rate"].astype("object").where(df["rate"].notna(), None)
+    df["reason"] = "Rate inválida"
+
+    written = []
+    for date_str, group in df.groupby(df["retrieved_at"].str[:10]):
+        reject_file = Path(rejects_dir) / f"{date_str}_rejects.json"
+        records = []
+        if reject_file.exists():
+            with open(reject_file, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        seen = {(r.get("target_currency"), r.get("retrieved_at")) for r in records}
+        for record in group.to_dict(orient="records"):
+            if (record["target_currency"], record["retrieved_at"]) not in seen:
+                records.append(record)
+
+        tmp_file = f"{reject_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, reject_file)
+        written.append(reject_file)
+    return written
+
+def _read_snapshot(raw_file):
+    """Arquivo JSON avulso ou referência "<segmento>#<offset>" do arquivo compactado"""
+    return snapshot_to_table(raw_archive.read_snapshot(raw_file))
+
+def _silver_stem(raw_file):
+    """Nome do Silver de um único snapshot: o do raw ou <data>_<offset> no arquivo compactado"""
+    if raw_archive.is_archive_ref(raw_file):
+        segment, offset = str(raw_file).rsplit("#", 1)
+        return f"{Path(segment).name[:10]}_{offset}"
+    return Path(raw_file).stem
+
+def transform_files(raw_files, run_id=None, batch_size=64, silver_dir=SILVER_DIR, rejects_dir=REJECTS_DIR,
+                    snapshots=None, replaces=()):
+    """
+    Transforma vários snapshots brutos em Silver com memória limitada.
+    Os arquivos são lidos em lotes de `batch_size`; cada lote vira um row group
+    no Parquet Silver da sua data (data/silver/YYYY-MM-DD.batch.parquet).
+    `snapshots` (iterável de dicts, ex.: raw_archive.iter_range) é processado junto;
+    `replaces` são as referências desses snapshots no arquivo compactado.
+    O lote substitui os Silver por snapshot (transform_file) de `raw_files` e `replaces`,
+    que são removidos, então cada snapshot fica em um único arquivo Silver.
+    Rejeitos são acumulados e gravados uma única vez ao final.
+    """
+    logger = get_logger(run_id=run_id, service="transform")
+    start = time.time()
+    raw_files = sorted(str(f) for f in raw_files)
+    Path(silver_dir).mkdir(parents=True, exist_ok=True)
+
+    tables = (_read_snapshot(f) for f in raw_files)
+    if snapshots is not None:
+        tables = (t for source in (tables, map(snapshot_to_table, snapshots)) for t in source)
+
+    writers = {}
+    all_rejects = []
+    rows_in = rows_out = snapshot_count = 0
+    compact = compact_schema.enabled()
+    try:
+        while True:
+            batch_tables = list(islice(tables, batch_size))
+            if not batch_tables:
+                break
+            snapshot_count += len(batch_tables)
+            batch = pa.concat_tables(batch_tables)
+            rows_in += batch.num_rows
+
+            clean, rejects = validate_table(batch)
+            if rejects.num_rows:
+                all_rejects.append(rejects)
+
+            for date_str in pc.unique(clean["date"]).to_pylist():
+                part = clean.filter(pc.equal(clean["date"], date_str))
+                if date_str not in writers:
+                    silver_file = Path(silver_dir) / f"{date_str}.batch.parquet"
+                    tmp_path = f"{silver_file}.tmp"
+                    writer = compact_schema.writer(tmp_path, SILVER_SCHEMA) if compact else pq.ParquetWriter(tmp_path, SILVER_SCHEMA)
+                    writers[date_str] = (silver_file, writer)
+                writers[date_str][1].write_table(compact_schema.to_compact(part) if compact else part)
+                rows_out += part.num_rows
+    except Exception:
+        for silver_file, writer in writers.values():
+            writer.close()
+            os.remove(f"{silver_file}.tmp")
+        raise
+
+    silver_files = []
+    for silver_file, writer in writers.values():
+        writer.close()
+        os.replace(f"{silver_file}.tmp", silver_file)
+        silver_files.append(silver_file)
+    for raw_file in (*raw_files, *replaces):
+        Path(silver_dir, f"{_silver_stem(raw_file)}.parquet").unlink(missing_ok=True)
+
+    write_rejects(pa.concat_tables(all_rejects) if all_rejects else None, rejects_dir)
+
+    elapsed = time.time() - start
+    log_metrics(logger, "transform", rows_out, elapsed)
+    logger.info(
+        "transform_ok",
+        files=snapshot_count,
+        rows_in=rows_in,
+        rows_out=rows_out,
+        rejected=rows_in - rows_out,
+        rows_per_second=round(rows_in / elapsed, 1) if elapsed else None,
+    )
+    return silver_files
+
+def transform_file(raw_file, run_id=None, silver_dir=SILVER_DIR, rejects_dir=REJECTS_DIR):
+    """Transforma um único snapshot bruto em data/silver/<nome do raw>.parquet"""
+    logger = get_logger(run_id=run_id, service="transform")
+    start = time.time()
+
+    with span("read", logger=logger) as s:
+        table = _read_snapshot(raw_file)
+        s.add(rows_out=table.num_rows)
+    with span("validate", logger=logger) as s:
+        clean, rejects = validate_table(table)
+        write_rejects(rejects, rejects_dir)
+        s.add(rows_in=table.num_rows, rows_out=clean.num_rows)
+
+    Path(silver_dir).mkdir(parents=True, exist_ok=True)
+    silver_file = Path(silver_dir) / f"{_silver_stem(raw_file)}.parquet"
+    with span("write", logger=logger) as s:
+        if compact_schema.enabled():
+            compact_schema.write_table(clean, silver_file)
+        else:
+            pq.write_table(clean, f"{silver_file}.tmp")
+            os.replace(f"{silver_file}.tmp", silver_file)
+        s.add(rows_out=clean.num_rows, bytes_written=os.path.getsize(silver_file))
+
+    logger.info("transform_file_ok", arquivo=str(silver_file), count=clean.num_rows, rejected=rejects.num_rows)
+    log_metrics(logger, "transform", clean.num_rows, time.time() - start)
+    return silver_file
 
 def transform_data(df: pd.DataFrame, date_str: str):
-    """Aplica transformações e salva arquivo Silver"""
-    
-    # Aqui você aplica suas transformações normais no df
-    # Exemplo fictício: arredondar taxas
-    if "rate" in df.columns:
-        df["rate_rounded"] = df["rate"].round(4)
-    
-    # Nome do arquivo Silver incluindo a data
+    """Aplica clean_data em um DataFrame já carregado e salva o arquivo Silver"""
+    df = clean_data(df)
+    SILVER_DIR.mkdir(parents=True, exist_ok=True)
     silver_file = SILVER_DIR / f"{date_str}.parquet"
-    
-    # Salva de forma idempotente
     df.to_parquet(silver_file, index=False)
-    
+
     print(f"Silver file criado: {silver_file}")
     return silver_file
 
-def main(date_str: str):
-    # Aqui você carregaria o DataFrame de entrada (ex: ingest output)
-    # Exemplo de DataFrame dummy
-    df = pd.DataFrame({
-        "date": [date_str],
-        "base_currency": ["USD"],
-        "target_currency": ["BRL"],
-        "rate": [5.25],
-        "retrieved_at": [datetime.utcnow().isoformat()]
-    })
-    
-    transform_data(df, date_str)
+def transform_archive(start=None, end=None, run_id=None, bases=None, batch_size=64,
+                      silver_dir=SILVER_DIR, rejects_dir=REJECTS_DIR, archive_dir=None):
+    """Transforma os snapshots do arquivo compactado em um intervalo de tempo (sem abrir arquivos avulsos)"""
+    snapshots = raw_archive.iter_range(start, end, bases, archive_dir=archive_dir)
+    return transform_files([], run_id=run_id, batch_size=batch_size, silver_dir=silver_dir,
+                           rejects_dir=rejects_dir, snapshots=snapshots)
+
+def main(date_str: str, run_id=None):
+    raw_files = sorted(RAW_DIR.glob(f"{date_str}*.json"))
+    segment, index_file = raw_archive.segment_paths(date_str)
+    snapshots = raw_archive.iter_segment(segment) if os.path.exists(segment) else None
+    if not raw_files and snapshots is None:
+        print(f"Nenhum arquivo raw encontrado para {date_str}")
+        return []
+
+    refs = [f"{segment}#{e['offset']}" for e in raw_archive.read_index(index_file)] if snapshots is not None else []
+    silver_files = transform_files(raw_files, run_id=run_id, snapshots=snapshots, replaces=refs)
+    for silver_file in silver_files:
+        print(f"Silver file criado: {silver_file}")
+    return silver_files
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Transform script")
     parser.add_argument("--date", required=True, help="Data (YYYY-MM-DD)")
     args = parser.parse_args()
-    
+
     main(args.date)
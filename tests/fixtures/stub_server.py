@@ -0,0 +1,97 @@
+"""Servidor HTTP local que imita a ExchangeRate API para testes e benchmarks offline"""
+import json
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RATES = {"USD": 1.0, "EUR": 0.9, "BRL": 5.35, "JPY": 148.2, "GBP": 0.78}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # mantém conexões keep-alive
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        # Formato esperado: /{api_key}/latest/{base}
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[1] != "latest":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        base = parts[2]
+        base_rate = server.rates.get(base, 1.0)
+        payload = {
+            "result": "success",
+            "base_code": base,
+            "conversion_rates": {k: round(v / base_rate, 6) for k, v in server.rates.items()},
+        }
+        body = json.dumps(payload).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if server.etag and self.headers.get("If-None-Match") == etag:
+            with server.lock:
+                server.not_modified_count += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if server.etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubExchangeServer:
+    """
+    Context manager que sobe o servidor em uma thread.
+    :param latency: atraso artificial (segundos) por requisição
+    :param rates: taxas com base USD usadas para gerar as respostas
+    :param etag: envia ETag e responde 304 a If-None-Match quando o conteúdo não mudou
+    """
+
+    def __init__(self, latency=0.0, rates=None, etag=True):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.rates = rates or DEFAULT_RATES
+        self.httpd.etag = etag
+        self.httpd.request_count = 0
+        self.httpd.not_modified_count = 0
+        self.httpd.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def not_modified_count(self):
+        return self.httpd.not_modified_count
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
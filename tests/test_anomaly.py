@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import anomaly, llm_enrich
+from src.anomaly import AnomalyDetector
+
+
+def _snapshots(days=40, currencies=("BRL", "EUR", "JPY"), seed=3, base="USD"):
+    rng = np.random.default_rng(seed)
+    rates = np.exp(np.cumsum(rng.normal(0, 0.002, (days, len(currencies))), axis=0))
+    dates = pd.date_range("2025-08-01 10:00", periods=days, freq="D")
+    return pd.DataFrame({
+        "base_currency": base,
+        "target_currency": np.tile(currencies, days),
+        "rate": rates.ravel(),
+        "retrieved_at": np.repeat(dates.strftime("%Y-%m-%dT%H:%M:%S"), len(currencies)),
+        "date": np.repeat(dates.strftime("%Y-%m-%d"), len(currencies)),
+    })
+
+
+def test_detector_flags_zscore_and_jump():
+    detector = AnomalyDetector()
+    history = _snapshots()
+    assert anomaly.detect(history, detector).empty
+
+    last = history.tail(3)
+    shock = last.assign(retrieved_at="2025-09-20T10:00:00", date="2025-09-20",
+                        rate=last["rate"].to_numpy() * np.array([1.02, 1.0005, 1.10]))
+    found = anomaly.detect(shock, detector, run_id="r1").set_index("target_currency")
+    assert list(found.index) == ["BRL", "JPY"]
+    assert found.loc["BRL", "severity"] in ("medium", "high") and not found.loc["BRL", "jump"]
+    assert found.loc["JPY", "jump"] and found.loc["JPY", "severity"] == "high"
+    assert found.loc["JPY", "return_pct"] == pytest.approx(np.log(1.10) * 100)
+
+    # Reexecução do mesmo snapshot e cotação repetida não geram anomalias nem mexem no estado
+    count = detector.count.copy()
+    assert anomaly.detect(shock, detector).empty
+    repeated = shock.assign(retrieved_at="2025-09-20T11:00:00")
+    assert anomaly.detect(repeated, detector).empty
+    np.testing.assert_array_equal(detector.count, count)
+
+
+def test_gate_levels():
+    found = pd.DataFrame({"base_currency": ["USD", "USD", "EUR"], "target_currency": ["BRL", "EUR", "BRL"],
+                          "severity": ["low", "medium", "high"]})
+    assert anomaly.gate(found, "low") == [("EUR", "BRL"), ("USD", "BRL"), ("USD", "EUR")]
+    assert anomaly.gate(found, "high") == [("EUR", "BRL")]
+    assert anomaly.gate(found.head(0), "medium") == []
+    assert anomaly.gate(found, "always") is None
+    with pytest.raises(ValueError):
+        anomaly.gate(found, "critical")
+
+
+def test_detect_files_writes_table_and_state(tmp_path):
+    history = _snapshots()
+    jumped = history.tail(3).assign(retrieved_at="2025-09-20T10:00:00", date="2025-09-20")
+    jumped["rate"] *= np.array([1.0, 1.0, 0.8])
+    silver = tmp_path / "silver.parquet"
+    pd.concat([history, jumped]).to_parquet(silver, index=False)
+
+    state_path = tmp_path / "state.npz"
+    summary = anomaly.detect_files([silver], run_id="r1", state_path=state_path, gold_dir=tmp_path, severity="high")
+    assert summary["enrich"] and summary["pairs"] == [["USD", "JPY"]] and summary["currencies"] == ["JPY"]
+    table = pd.read_parquet(tmp_path / "2025-09-20-anomalies.parquet")
+    assert table["target_currency"].tolist() == ["JPY"] and table["run_id"].tolist() == ["r1"]
+
+    # Estado persistido: o mesmo arquivo processado de novo não gera anomalias nem chama o LLM
+    restored = AnomalyDetector.load(state_path)
+    assert list(restored.codes) == ["BRL", "EUR", "JPY"] and set(restored.bases) == {"USD"}
+    again = anomaly.detect_files([silver], state_path=state_path, gold_dir=tmp_path, severity="high")
+    assert again == {"outputs": [], "anomalies": 0, "enrich": False, "pairs": [], "currencies": []}
+
+
+def test_bases_are_independent_series():
+    # USD→BRL ~5.3 e EUR→BRL ~6.2 no mesmo snapshot: misturadas, cada linha seria um salto de ~16%
+    usd = _snapshots(currencies=("BRL", "JPY"))
+    eur = _snapshots(currencies=("BRL", "JPY"), seed=4, base="EUR").assign(rate=lambda d: d["rate"] * 1.17)
+    history = pd.concat([usd, eur]).sort_values("retrieved_at", kind="stable")
+    detector = AnomalyDetector()
+    assert not anomaly.detect(history, detector)["jump"].any()
+    assert len(detector.codes) == 4
+
+    last = eur.tail(2)
+    shock = last.assign(retrieved_at="2025-09-20T10:00:00", rate=last["rate"].to_numpy() * np.array([1.10, 1.0]))
+    found = anomaly.detect(pd.concat([usd.tail(2).assign(retrieved_at="2025-09-20T10:00:00"), shock]), detector)
+    assert found[["base_currency", "target_currency"]].values.tolist() == [["EUR", "BRL"]]
+    assert anomaly.gate(found, "high") == [("EUR", "BRL")]
+
+
+def test_enrich_prompt_only_gated_currencies():
+    history = _snapshots(days=60)
+    movers = llm_enrich.calculate_metrics(history, top_n=None, currencies=["EUR"])
+    assert movers["target_currency"].tolist() == ["EUR"]
+    # Nomes antigos (N=, n=) continuam aceitos, com aviso
+    with pytest.warns(DeprecationWarning):
+        old = llm_enrich.calculate_metrics(history, N=30, n=None, currencies=["EUR"])
+    pd.testing.assert_frame_equal(old, movers)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.asof import AsOfIndex, build_index
+
+
+def _silver(path, retrieved_at, rates):
+    pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": list(rates),
+        "rate": list(rates.values()),
+        "retrieved_at": retrieved_at,
+        "date": retrieved_at[:10],
+    }).to_parquet(path, index=False)
+
+
+def test_asof_lookup_and_incremental_refresh(tmp_path):
+    _silver(tmp_path / "2025-09-29.parquet", "2025-09-29T00:38:43", {"BRL": 5.30, "EUR": 0.85})
+    _silver(tmp_path / "2025-09-29_140547.parquet", "2025-09-29T14:05:47", {"BRL": 5.35})
+    index = build_index(silver_dir=tmp_path)
+    assert len(index) == 3
+
+    assert np.isnan(index.lookup("USD", "BRL", "2025-09-28T23:59:59"))
+    assert index.lookup("USD", "BRL", "2025-09-29T14:05:46") == 5.30
+    assert index.lookup("USD", "BRL", "2025-09-29T14:32:00") == 5.35
+    assert index.lookup("USD", "EUR", "2025-09-29T14:32:00") == 0.85
+    assert np.isnan(index.lookup("USD", "XXX", "2025-09-29T14:32:00"))
+
+    result = index.lookup_many(
+        ["USD", "USD", "USD"], ["BRL", "EUR", "BRL"],
+        ["2025-09-29T12:00:00", "2025-09-29T12:00:00", "2025-09-29T23:00:00"],
+    )
+    np.testing.assert_allclose(result, [5.30, 0.85, 5.35])
+
+    # Refresh só lê o arquivo novo
+    assert index.refresh(silver_dir=tmp_path) == 0
+    _silver(tmp_path / "2025-09-29_200045.parquet", "2025-09-29T20:00:45", {"BRL": 5.40, "EUR": 0.86})
+    assert index.refresh(silver_dir=tmp_path) == 2
+    assert index.lookup("USD", "BRL", "2025-09-29T23:00:00") == 5.40
+    assert index.lookup("USD", "BRL", 1759155000) == 5.35  # epoch em segundos (14:10 UTC)
+    # Float e datetime seguem a mesma conversão do lookup_many
+    for ts in (1759155000.0, pd.Timestamp("2025-09-29 14:10:00")):
+        assert index.lookup("USD", "BRL", ts) == index.lookup_many(["USD"], ["BRL"], [ts])[0] == 5.35
+
+
+def test_lookup_ids_vectorized():
+    index = AsOfIndex()
+    ts = np.arange(0, 1000, 10)
+    index.add(pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": np.repeat(["A", "B"], len(ts)),
+        "rate": np.concatenate([ts * 1.0, ts * -1.0]),
+        "retrieved_at": np.tile(ts, 2),
+    }))
+    ids = np.array([index.pair_id("USD", "A"), index.pair_id("USD", "B"), -1])
+    out = index.lookup_ids(ids, np.array([15, 999, 50]))
+    assert out[0] == 10.0 and out[1] == -990.0 and np.isnan(out[2])
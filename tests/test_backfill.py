@@ -0,0 +1,61 @@
+import json
+import pandas as pd
+
+from src import backfill, transform, load
+
+
+def _setup(monkeypatch, tmp_path):
+    raw_dir, silver_dir, gold_dir = tmp_path / "raw", tmp_path / "silver", tmp_path / "gold"
+    for d in (raw_dir, silver_dir, gold_dir):
+        d.mkdir()
+    monkeypatch.setattr(transform, "RAW_DIR", raw_dir)
+    monkeypatch.setattr(transform, "SILVER_DIR", silver_dir)
+    monkeypatch.setattr(transform, "REJECTS_DIR", raw_dir / "rejects")
+    monkeypatch.setattr(load, "SILVER_DIR", str(silver_dir))
+    monkeypatch.setattr(load, "GOLD_DIR", str(gold_dir))
+    monkeypatch.setattr(load, "DB_URI", None)
+
+    for day in ("2025-09-01", "2025-09-02", "2025-09-04"):
+        for hour in ("08", "16"):
+            data = {
+                "base_code": "USD",
+                "conversion_rates": {"USD": 1.0, "BRL": 5.0, "EUR": 0.9},
+                "_metadata": {"timestamp": f"{day}T{hour}:00:00", "status_code": 200, "url": "fake_url"},
+            }
+            (raw_dir / f"{day}_{hour}0000.json").write_text(json.dumps(data))
+    return gold_dir
+
+
+def test_backfill_parallel(monkeypatch, tmp_path):
+    gold_dir = _setup(monkeypatch, tmp_path)
+
+    summary = backfill.backfill("2025-09-01", "2025-09-05", max_workers=2)
+    assert summary["completed"] == ["2025-09-01", "2025-09-02", "2025-09-04"]
+    assert summary["failed"] == {}
+    assert summary["rows"] == 3 * 6
+
+    gold = pd.read_parquet(gold_dir / "2025-09-02.parquet")
+    assert sorted(gold["target_currency"]) == ["BRL", "EUR", "USD"]
+
+    # Todos os processos registraram seus arquivos no manifesto
+    assert len(load.load_manifest()) == 3
+
+
+def test_backfill_resumes_from_checkpoint(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    real_day = backfill.backfill_day
+
+    def flaky(date_str, raw_files, run_id=None):
+        if date_str == "2025-09-02":
+            raise RuntimeError("interrompido")
+        return real_day(date_str, raw_files, run_id)
+
+    monkeypatch.setattr(backfill, "backfill_day", flaky)
+    first = backfill.backfill("2025-09-01", "2025-09-04", max_workers=1)
+    assert first["completed"] == ["2025-09-01", "2025-09-04"]
+    assert list(first["failed"]) == ["2025-09-02"]
+
+    monkeypatch.setattr(backfill, "backfill_day", real_day)
+    second = backfill.backfill("2025-09-01", "2025-09-04", max_workers=1)
+    assert second["completed"] == ["2025-09-02"]
+    assert set(backfill.load_checkpoint()) == {"2025-09-01", "2025-09-02", "2025-09-04"}
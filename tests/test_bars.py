@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import bars, dashboard_data, metrics
+from src.asof import to_epoch_seconds
+
+
+def _write_silver(path, snapshots):
+    """snapshots: {retrieved_at ISO: {moeda: taxa}}"""
+    rows = [
+        {"base_currency": "USD", "target_currency": c, "rate": r, "retrieved_at": ts, "date": ts[:10]}
+        for ts, rates in snapshots.items() for c, r in rates.items()
+    ]
+    pd.DataFrame(rows).to_parquet(path, index=False)
+    return str(path)
+
+
+def test_rollup_ohlc_and_buckets():
+    rows = pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": ["BRL"] * 4,
+        "rate": [5.0, 5.4, 4.9, 5.1],
+        "ts": to_epoch_seconds(np.array(["2025-09-29T10:05:00", "2025-09-29T10:40:00",
+                                         "2025-09-29T11:10:00", "2025-10-01T09:00:00"], dtype=object)),
+    }).sample(frac=1, random_state=1)  # ordem de chegada não importa
+
+    daily = bars.rollup(rows, "daily").set_index("interval_start")
+    first = daily.iloc[0]
+    assert (first["open"], first["high"], first["low"], first["close"], first["count"]) == (5.0, 5.4, 4.9, 4.9, 3)
+    assert first["vwap"] == pytest.approx((5.0 + 5.4 + 4.9) / 3)
+
+    assert bars.rollup(rows, "hourly")["count"].tolist() == [2, 1, 1]
+    weekly = bars.rollup(rows, "weekly")
+    # 2025-09-29 é segunda-feira: as quatro coletas caem na mesma semana
+    assert weekly["count"].tolist() == [4]
+    assert pd.Timestamp(int(weekly["interval_start"][0]), unit="s") == pd.Timestamp("2025-09-29")
+
+
+def test_incremental_updates_match_rebuild(tmp_path):
+    silver = tmp_path / "silver"
+    silver.mkdir()
+    day1 = _write_silver(silver / "2025-09-29.parquet", {
+        "2025-09-29T08:00:00": {"BRL": 5.0, "EUR": 0.90},
+        "2025-09-29T16:00:00": {"BRL": 5.2, "EUR": 0.91},
+    })
+    day2 = _write_silver(silver / "2025-09-30.parquet", {
+        "2025-09-30T08:00:00": {"BRL": 5.1, "EUR": 0.92},
+        "2025-09-30T16:00:00": {"BRL": 5.3},
+    })
+    incremental, full = tmp_path / "incremental", tmp_path / "full"
+
+    # Fora de ordem (como no backfill paralelo) e com reprocessamento do mesmo arquivo
+    bars.update_bars([day2], intervals=["daily", "weekly"], bars_dir=incremental)
+    bars.update_bars([day1], intervals=["daily", "weekly"], bars_dir=incremental)
+    assert bars.update_bars([day1, day2], intervals=["daily", "weekly"], bars_dir=incremental) == []
+    bars.rebuild(silver_dir=silver, intervals=["daily", "weekly"], bars_dir=full)
+
+    for interval in ("daily", "weekly"):
+        pd.testing.assert_frame_equal(bars.read_bars(interval, bars_dir=incremental),
+                                      bars.read_bars(interval, bars_dir=full))
+    weekly = bars.read_bars("weekly", bars_dir=incremental).set_index("target_currency")
+    assert weekly.loc["BRL", ["open", "high", "low", "close", "count"]].tolist() == [5.0, 5.3, 5.0, 5.3, 4]
+
+    # Métricas sobre as barras diárias = métricas sobre o último snapshot de cada dia (gold)
+    gold = pd.DataFrame({"date": ["2025-09-29", "2025-09-29", "2025-09-30", "2025-09-30"],
+                         "target_currency": ["BRL", "EUR", "BRL", "EUR"], "rate": [5.2, 0.91, 5.3, 0.92]})
+    daily = bars.read_bars("daily", bars_dir=incremental)
+    pd.testing.assert_frame_equal(metrics.compute_metrics(bars.as_rates(daily)), metrics.compute_metrics(gold))
+
+
+def test_dashboard_reads_bars(tmp_path):
+    silver = tmp_path / "silver.parquet"
+    _write_silver(silver, {f"2025-09-{d:02d}T{h:02d}:00:00": {"BRL": 5 + d / 100 + h / 1000, "EUR": 0.9}
+                           for d in (1, 2, 3) for h in (8, 12, 16)})
+    bars.update_bars([silver], intervals=["hourly", "daily"], bars_dir=tmp_path / "bars")
+
+    assert dashboard_data.available_intervals(tmp_path) == ["hourly", "daily"]
+    df = dashboard_data.load_bars(tmp_path, "daily", ["BRL"], "2025-09-02", "2025-09-03")
+    assert df["date"].dt.strftime("%Y-%m-%d").tolist() == ["2025-09-02", "2025-09-03"]
+    assert df["rate"].tolist() == df["close"].tolist() == [5.036, 5.046]
+    assert df["count"].tolist() == [3, 3]
+    assert len(dashboard_data.load_bars(tmp_path, "hourly", ["BRL", "EUR"])) == 18
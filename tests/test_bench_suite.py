@@ -0,0 +1,34 @@
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from benchmarks import bench_suite, synthetic
+from src import load
+
+
+def test_synthetic_generator_is_deterministic(tmp_path):
+    a = synthetic.generate(tmp_path / "a", currencies=5, days=2, snapshots=3, seed=1)
+    b = synthetic.generate(tmp_path / "b", currencies=5, days=2, snapshots=3, seed=1)
+    assert len(a) == 6
+    assert [open(p).read() for p in a] == [open(p).read() for p in b]
+
+
+def test_run_scale_and_compare(tmp_path):
+    gold_dir = load.GOLD_DIR
+    results = bench_suite.run_scale(currencies=6, days=3, snapshots=2)
+    assert set(results) == set(bench_suite.STAGES)
+    assert results["transform"]["rows"] > 0
+    assert load.GOLD_DIR == gold_dir  # globais restaurados
+
+    def entry(seconds):
+        return {"scale": "small", "revision": None,
+                "stages": {"transform": {"seconds": seconds}, "metrics": {"seconds": 1.0}}}
+
+    history = [entry(1.0), entry(1.5)]
+    assert bench_suite.compare(history, threshold=0.2) == [{"scale": "small", "stage": "transform", "change": 0.5}]
+    assert bench_suite.compare(history, threshold=0.6) == []
+
+
+def test_compare_ignores_tiny_timings():
+    history = [{"scale": "small", "stages": {"metrics": {"seconds": s}}} for s in (0.001, 0.004)]
+    assert bench_suite.compare(history, threshold=0.2) == []
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src import compact_schema, load, transform, dashboard_data
+
+
+def _gold_table(days=30, currencies=("BRL", "EUR", "JPY", "GBP", "FOK")):
+    dates = pd.date_range("2025-01-01", periods=days).strftime("%Y-%m-%d")
+    n = days * len(currencies)
+    return pa.Table.from_pandas(pd.DataFrame({
+        "date": np.repeat(dates, len(currencies)),
+        "base_currency": "USD",
+        "target_currency": list(currencies) * days,
+        "rate": np.round(np.linspace(1, 2, n), 6),
+        "retrieved_at": np.int64(1759104001),
+        "run_id": "20250929_100000.000000",
+        "pipeline_version": "1.0",
+    }), preserve_index=False)
+
+
+def test_roundtrip_and_footprint(tmp_path):
+    table = _gold_table(days=365)
+    legacy_path, compact_path = tmp_path / "legacy.parquet", tmp_path / "compact.parquet"
+    pq.write_table(table, legacy_path, compression="snappy")
+    compact_schema.write_table(table, compact_path)
+
+    schema = pq.read_schema(compact_path)
+    assert compact_schema.is_compact(schema)
+    assert "run_id" not in schema.names and schema.field("date").type == pa.date32()
+    assert compact_schema.file_metadata(schema)["pipeline_version"] == "1.0"
+
+    # Leitura padrão devolve o formato antigo, idêntico ao arquivo original
+    legacy = pd.read_parquet(legacy_path)
+    pd.testing.assert_frame_equal(compact_schema.read_frame(compact_path), legacy)
+
+    compact = compact_schema.read_frame(compact_path, compact=True)
+    assert compact["target_currency"].dtype == "category"
+    assert list(compact["target_currency"].cat.categories) == list(compact_schema.CURRENCY_CODES)
+    assert compact.memory_usage(deep=True).sum() < legacy.memory_usage(deep=True).sum() / 2
+    assert os.path.getsize(compact_path) < os.path.getsize(legacy_path)
+
+
+def test_unknown_currency_rejected():
+    with pytest.raises(ValueError, match="XYZ"):
+        compact_schema.encode_currencies(pa.array(["BRL", "XYZ"]))
+
+
+def test_validate_and_migrate(tmp_path):
+    paths = []
+    for day in ("2025-01-01", "2025-01-02"):
+        path = tmp_path / f"{day}.parquet"
+        pq.write_table(_gold_table(days=1).set_column(0, "date", pa.array([day] * 5)), path)
+        paths.append(str(path))
+    assert compact_schema.validate(paths[0]) == []
+    broken = tmp_path / "broken.parquet"
+    pq.write_table(_gold_table(days=1).drop_columns(["run_id"]), broken)
+    assert compact_schema.validate(str(broken)) == ["coluna ausente: run_id"]
+
+    assert compact_schema.migrate(paths, dry_run=True)["files"] == 2
+    assert not compact_schema.is_compact(pq.read_schema(paths[0]))
+
+    summary = compact_schema.migrate(paths)
+    assert summary["files"] == 2 and summary["skipped"] == 0
+    assert all(compact_schema.validate(p) == [] for p in paths)
+    assert compact_schema.migrate(paths)["skipped"] == 2
+
+    # Dashboard lê arquivos antigos e compactos misturados
+    compact_schema.migrate(paths[:1], to="legacy")
+    assert dashboard_data.available_currencies(tmp_path) == ["BRL", "EUR", "FOK", "GBP", "JPY"]
+    df = dashboard_data.load_rates(tmp_path, ["BRL"])
+    assert len(df) == 2 and df["target_currency"].tolist() == ["BRL", "BRL"]
+    history = compact_schema.read_history(paths)
+    assert len(history) == 10 and history["target_currency"].dtype == "category"
+
+
+def test_pipeline_writes_compact_silver_and_gold(monkeypatch, tmp_path):
+    silver_dir, gold_dir = tmp_path / "silver", tmp_path / "gold"
+    monkeypatch.setattr(compact_schema, "SCHEMA", "compact")
+    monkeypatch.setattr(load, "SILVER_DIR", str(silver_dir))
+    monkeypatch.setattr(load, "GOLD_DIR", str(gold_dir))
+    monkeypatch.setattr(load, "DB_URI", None)
+
+    snapshot = {"base_code": "USD", "conversion_rates": {"BRL": 5.3, "EUR": 0.9},
+                "_metadata": {"timestamp": "2025-09-29T10:00:00"}}
+    silver_files = transform.transform_files([], silver_dir=silver_dir, rejects_dir=tmp_path / "rejects",
+                                             snapshots=[snapshot])
+    assert compact_schema.validate(str(silver_files[0]), layer="silver") == []
+
+    gold_file = load.aggregate_silver_files(date_str="2025-09-29")
+    assert compact_schema.validate(gold_file, layer="gold") == []
+    gold = compact_schema.read_frame(gold_file)
+    assert gold.set_index("target_currency")["rate"].to_dict() == {"BRL": 5.3, "EUR": 0.9}
+    assert gold["run_id"].nunique() == 1
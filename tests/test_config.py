@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+from src import config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_settings_from_env():
+    settings = config.Settings.from_env({
+        "DB_URI": "sqlite:///x.db",
+        "LLM_CACHE_TTL": "60",
+        "PIPELINE_PROFILE": "1",
+    })
+    assert settings.db_uri == "sqlite:///x.db"
+    assert settings.llm_cache_ttl == 60
+    assert settings.pipeline_profile is True
+    assert settings.raw_storage == "files" and settings.exchange_api_key is None
+
+
+def test_resolve_prefers_module_override(monkeypatch):
+    monkeypatch.setattr(config, "_settings", config.Settings(db_uri="sqlite:///a.db"))
+    assert config.resolve(config.UNSET, "db_uri") == "sqlite:///a.db"
+    assert config.resolve(None, "db_uri") is None  # None explícito desliga o banco
+
+    config.configure(db_uri="sqlite:///b.db")
+    assert config.get_settings().db_uri == "sqlite:///b.db"
+
+
+def test_imports_have_no_side_effects():
+    # Processo novo: importar os módulos não lê o ambiente, não configura handlers
+    # nem importa SQLAlchemy/OpenAI
+    code = (
+        "import json, logging, sys\n"
+        "import main, src.ingest, src.load, src.transform, src.llm_enrich, src.llm_batch\n"
+        "from src import config\n"
+        "print(json.dumps({'settings_loaded': config._settings is not None,\n"
+        "                  'handlers': len(logging.getLogger().handlers),\n"
+        "                  'modules': [m for m in ('sqlalchemy', 'openai') if m in sys.modules]}))\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout) == {"settings_loaded": False, "handlers": 0, "modules": []}
+
+
+def test_cli_lists_commands():
+    out = subprocess.run([sys.executable, "-m", "src", "--help"], cwd=ROOT, capture_output=True, text=True, check=True)
+    for command in ("run", "ingest", "transform", "load", "backfill"):
+        assert command in out.stdout
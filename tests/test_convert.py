@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.asof import AsOfIndex
+from src import convert
+
+
+def _index():
+    index = AsOfIndex()
+    index.add(pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": ["BRL", "EUR", "BRL", "EUR"],
+        "rate": [5.0, 0.8, 5.5, 0.9],
+        "retrieved_at": ["2025-09-29T00:00:00", "2025-09-29T00:00:00", "2025-09-29T12:00:00", "2025-09-29T12:00:00"],
+    }))
+    return index
+
+
+def _ledger():
+    return pd.DataFrame({
+        "timestamp": ["2025-09-29T06:00:00", "2025-09-29T13:00:00", "2025-09-29T13:00:00", "2025-09-28T23:00:00"] * 50,
+        "amount": [100.0, 100.0, 10.0, 1.0] * 50,
+        "currency": ["USD", "EUR", "BRL", "USD"] * 50,
+    })
+
+
+def test_convert_frame_asof_cross_rates():
+    out = convert.convert_frame(_ledger().head(4), _index(), target_currency="BRL")
+    np.testing.assert_allclose(out["rate"][:3], [5.0, 5.5 / 0.9, 1.0])
+    np.testing.assert_allclose(out["converted_amount"][:3], [500.0, 100 * 5.5 / 0.9, 10.0])
+    assert np.isnan(out["rate"][3])  # antes do primeiro snapshot
+
+
+@pytest.mark.parametrize("suffix,workers", [(".csv", 1), (".parquet", 2)])
+def test_convert_file_chunked(tmp_path, suffix, workers):
+    ledger = _ledger()
+    input_path = tmp_path / f"ledger{suffix}"
+    if suffix == ".csv":
+        ledger.to_csv(input_path, index=False)
+    else:
+        ledger.to_parquet(input_path, index=False, row_group_size=30)
+
+    output_path = tmp_path / "out.parquet"
+    stats = convert.convert_file(input_path, output_path, target_currency="EUR", index=_index(),
+                                 chunksize=30, max_workers=workers)
+    assert stats == {"rows": 200, "missing_rates": 50, "output": str(output_path)}
+
+    out = pd.read_parquet(output_path)
+    assert list(out["amount"]) == list(ledger["amount"])  # ordem preservada
+    assert out["converted_amount"].iloc[0] == pytest.approx(80.0)
+    assert (out["target_currency"] == "EUR").all()
+
+
+def test_convert_file_schema_independent_of_first_chunk(monkeypatch, tmp_path):
+    # Leitores com inferência por bloco: primeiro bloco só com inteiros, depois float
+    chunks = [
+        pd.DataFrame({"timestamp": ["2025-09-29T06:00:00"] * 2, "amount": [10, 20], "currency": ["USD", "USD"]}),
+        pd.DataFrame({"timestamp": ["2025-09-29T06:00:00"] * 2, "amount": [30.5, 40.25], "currency": ["BRL", "USD"]}),
+    ]
+    monkeypatch.setattr(convert, "iter_chunks", lambda path, chunksize: iter([c.copy() for c in chunks]))
+    output_path = tmp_path / "out.parquet"
+    convert.convert_file("ledger.csv", output_path, index=_index(), chunksize=2, max_workers=1)
+    assert pd.read_parquet(output_path)["amount"].tolist() == [10.0, 20.0, 30.5, 40.25]
+
+    # Falha depois do primeiro bloco gravado: o .tmp parcial é removido
+    chunks[1]["timestamp"] = "inválido"
+    with pytest.raises(ValueError):
+        convert.convert_file("ledger.csv", tmp_path / "bad.parquet", index=_index(), chunksize=2, max_workers=1)
+    assert not (tmp_path / "bad.parquet.tmp").exists() and not (tmp_path / "bad.parquet").exists()
@@ -0,0 +1,47 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import cross_rates
+
+
+SNAPSHOT = {
+    "base_code": "USD",
+    "conversion_rates": {"USD": 1.0, "EUR": 0.9, "BRL": 5.0, "JPY": 150.0, "XXX": None, "ZZZ": 0},
+    "_metadata": {"timestamp": "2025-09-29T14:32:00", "status_code": 200, "url": "fake_url"},
+}
+
+
+def test_cross_matrix_triangulation():
+    cross = cross_rates.from_snapshot(SNAPSHOT)
+
+    assert len(cross) == 4  # taxas nulas/zero descartadas
+    assert cross.rate("USD", "BRL") == pytest.approx(5.0)
+    assert cross.rate("EUR", "BRL") == pytest.approx(5.0 / 0.9)
+    assert cross.rate("BRL", "JPY") == pytest.approx(30.0)
+    assert cross.rate("JPY", "JPY") == pytest.approx(1.0)
+    np.testing.assert_allclose(cross.rates(["EUR", "BRL"], ["USD", "EUR"]), [1 / 0.9, 0.9 / 5.0])
+    with pytest.raises(KeyError):
+        cross.rate("USD", "XXX")
+
+    # Base com taxa nula no payload continua na matriz (r_base = 1)
+    cross = cross_rates.from_snapshot({**SNAPSHOT, "conversion_rates": {**SNAPSHOT["conversion_rates"], "USD": None}})
+    assert len(cross) == 4
+    assert cross.rate("USD", "BRL") == pytest.approx(5.0)
+
+
+def test_cross_long_table_and_cache(tmp_path):
+    raw_file = tmp_path / "2025-09-29.json"
+    raw_file.write_text(json.dumps(SNAPSHOT))
+
+    first = cross_rates.load_cross_matrix(raw_file)
+    assert cross_rates.load_cross_matrix(raw_file) is first
+
+    outfile = cross_rates.write_cross_silver(raw_file, out_dir=tmp_path / "cross")
+    df = pd.read_parquet(outfile)
+    assert len(df) == 4 * 3
+    assert set(df.columns) == {"base_currency", "target_currency", "rate", "retrieved_at", "date"}
+    row = df[(df["base_currency"] == "EUR") & (df["target_currency"] == "BRL")]
+    assert row["rate"].iloc[0] == pytest.approx(round(5.0 / 0.9, 6))
+    assert (df["date"] == "2025-09-29").all()
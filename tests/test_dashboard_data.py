@@ -0,0 +1,71 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from src import dashboard_data, gold_dataset
+
+
+def _write_daily(gold_dir, day, rates):
+    pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": list(rates),
+        "rate": list(rates.values()),
+        "retrieved_at": 1759104001,
+        "date": day,
+        "run_id": "r1",
+        "pipeline_version": "1.0",
+    }).to_parquet(gold_dir / f"{day}.parquet", index=False)
+
+
+def test_load_rates_pushdown_and_signature(tmp_path):
+    for i, day in enumerate(["2025-09-27", "2025-09-28", "2025-09-29"]):
+        _write_daily(tmp_path, day, {"BRL": 5.0 + i, "EUR": 0.9, "JPY": 148.0})
+    (tmp_path / "2025-09-29-insights.json").write_text(json.dumps({"summary": "ok"}))
+
+    signature = dashboard_data.gold_signature(tmp_path)
+    assert len(signature) == 4
+    assert dashboard_data.available_currencies(tmp_path) == ["BRL", "EUR", "JPY"]
+    assert [str(d) for d in dashboard_data.date_bounds(tmp_path)] == ["2025-09-27", "2025-09-29"]
+
+    df = dashboard_data.load_rates(tmp_path, ["BRL"], "2025-09-28", "2025-09-29")
+    assert list(df.columns) == ["date", "target_currency", "rate"]
+    assert list(df["rate"]) == [6.0, 7.0]
+    assert dashboard_data.load_insights(tmp_path) == {"summary": "ok"}
+
+    # Com o dataset compactado a leitura passa por gold_dataset.read_gold
+    gold_dataset.compact(gold_dir=tmp_path, dataset_dir=tmp_path / "dataset")
+    df = dashboard_data.load_rates(tmp_path, ["BRL", "EUR"], "2025-09-29", "2025-09-29")
+    assert sorted(df["target_currency"]) == ["BRL", "EUR"]
+    assert dashboard_data.gold_signature(tmp_path) != signature
+
+    # Dias carregados depois da compactação continuam visíveis pelos arquivos diários
+    _write_daily(tmp_path, "2025-09-30", {"BRL": 8.0, "GBP": 0.75})
+    assert [str(d) for d in dashboard_data.date_bounds(tmp_path)] == ["2025-09-27", "2025-09-30"]
+    assert dashboard_data.available_currencies(tmp_path) == ["BRL", "EUR", "GBP", "JPY"]
+    df = dashboard_data.load_rates(tmp_path, ["BRL"], "2025-09-29")
+    assert df["date"].dt.strftime("%Y-%m-%d").tolist() == ["2025-09-29", "2025-09-30"]
+    assert list(df["rate"]) == [7.0, 8.0]
+
+
+def test_lttb_and_downsample():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 5.0  # pico deve ser preservado
+    idx = dashboard_data.lttb(x, y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert 4321 in idx
+    assert np.all(np.diff(idx) >= 0)
+
+    idx = dashboard_data.minmax_buckets(y, 200)
+    assert len(idx) <= 200 and 4321 in idx
+
+    df = pd.DataFrame({
+        "date": np.tile(pd.date_range("2020-01-01", periods=2000), 2),
+        "target_currency": np.repeat(["BRL", "EUR"], 2000),
+        "rate": np.tile(y[:2000], 2),
+    })
+    wide = dashboard_data.downsample(df, max_points=100)
+    assert list(wide.columns) == ["BRL", "EUR"]
+    assert wide["BRL"].notna().sum() == 100
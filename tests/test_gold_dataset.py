@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src import compact_schema, gold_dataset
+
+
+def _write_daily_gold(gold_dir, day, currencies):
+    df = pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": currencies,
+        "rate": np.arange(1, len(currencies) + 1, dtype="float64"),
+        "retrieved_at": 1759104001,
+        "date": day,
+        "run_id": "r1",
+        "pipeline_version": "1.0",
+    })
+    df.to_parquet(gold_dir / f"{day}.parquet", index=False)
+
+
+def test_compact_and_pushdown(tmp_path):
+    gold_dir, dataset_dir = tmp_path / "gold", tmp_path / "dataset"
+    gold_dir.mkdir()
+    currencies = [f"C{i:03d}" for i in range(100)]
+    days = pd.date_range("2024-12-01", "2025-01-31").strftime("%Y-%m-%d")
+    for day in days:
+        _write_daily_gold(gold_dir, day, currencies)
+
+    written = gold_dataset.compact(gold_dir=gold_dir, dataset_dir=dataset_dir, row_group_size=500)
+    assert len(written) == 2  # USD/2024 e USD/2025
+    schema = pq.read_schema(written[0])
+    assert "run_id" not in schema.names  # execuções nos metadados, não por linha
+    assert compact_schema.file_metadata(schema)["run_ids"] == ["r1"]
+
+    df = gold_dataset.read_gold("2025-01-10", "2025-01-20", currencies=["C042"], dataset_dir=dataset_dir)
+    assert len(df) == 11
+    assert set(df["target_currency"]) == {"C042"}
+    assert (df["base_currency"] == "USD").all()
+
+    total = gold_dataset.scanned_row_groups(dataset_dir=dataset_dir)
+    scanned = gold_dataset.scanned_row_groups(
+        "2025-01-01", "2025-01-31", currencies=["C042"], dataset_dir=dataset_dir
+    )
+    assert total > 10
+    assert scanned <= 2
+
+    # Recompactação de um dia alterado não duplica linhas
+    _write_daily_gold(gold_dir, "2025-01-31", currencies)
+    gold_dataset.compact(files=[gold_dir / "2025-01-31.parquet"], dataset_dir=dataset_dir, row_group_size=500)
+    assert len(gold_dataset.read_gold(dataset_dir=dataset_dir)) == len(days) * len(currencies)
+    # Primeira e última data pelos rodapés (partições de 2024 e 2025)
+    assert [str(d) for d in gold_dataset.date_bounds(dataset_dir)] == ["2024-12-01", "2025-01-31"]
@@ -14,6 +14,7 @@ def test_fetch_exchange_rates(monkeypatch, tmp_path):
         return MockResponse()
 
     monkeypatch.setattr("requests.get", mock_get)
+    monkeypatch.setattr(ingest, "RAW_DIR", str(tmp_path))
 
     filepath = ingest.fetch_exchange_rates(base_currency="USD")
     assert os.path.exists(filepath)
@@ -22,3 +23,139 @@ def test_fetch_exchange_rates(monkeypatch, tmp_path):
         data = json.load(f)
     assert "conversion_rates" in data
     assert "_metadata" in data
+
+
+def test_fetch_many_stub_server(monkeypatch, tmp_path):
+    from tests.fixtures.stub_server import StubExchangeServer
+
+    monkeypatch.setattr(ingest, "RAW_DIR", str(tmp_path))
+    monkeypatch.setattr(ingest, "API_KEY", "test-key")
+
+    with StubExchangeServer(latency=0.01) as server:
+        monkeypatch.setattr(ingest, "BASE_URL", server.base_url)
+        results = ingest.fetch_many(["USD", "EUR", "BRL", "USD"], max_workers=3)
+        assert server.request_count == 3
+
+    assert list(results) == ["USD", "EUR", "BRL"]
+    for base, filepath in results.items():
+        assert filepath and os.path.exists(filepath)
+        assert filepath.endswith(f"_{base}.json")
+        with open(filepath, "r") as f:
+            data = json.load(f)
+        assert data["base_code"] == base
+        assert data["_metadata"]["status_code"] == 200
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_fetch_many_failure_returns_none(monkeypatch, tmp_path):
+    from tests.fixtures.stub_server import StubExchangeServer
+
+    monkeypatch.setattr(ingest, "RAW_DIR", str(tmp_path))
+    monkeypatch.setattr(ingest, "API_KEY", "test-key/extra")  # rota inválida -> 404
+    monkeypatch.setattr(ingest._fetch_base.retry, "sleep", lambda s: None)
+
+    with StubExchangeServer() as server:
+        monkeypatch.setattr(ingest, "BASE_URL", server.base_url)
+        results = ingest.fetch_many(["USD"], max_workers=1)
+
+    assert results == {"USD": None}
+
+
+def test_host_rate_limiter_spacing():
+    import time
+
+    limiter = ingest.HostRateLimiter(max_per_second=50)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait("http://example.com/x")
+    assert time.monotonic() - start >= 4 / 50 * 0.9
+
+
+def _read_heartbeats(raw_dir):
+    path = raw_dir / ingest.HEARTBEAT_NAME
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+@pytest.mark.parametrize("etag,reason", [(True, "not_modified"), (False, "unchanged")])
+def test_fetch_many_skips_unchanged_payload(monkeypatch, tmp_path, etag, reason):
+    from tests.fixtures.stub_server import StubExchangeServer
+
+    monkeypatch.setattr(ingest, "RAW_DIR", str(tmp_path))
+    monkeypatch.setattr(ingest, "API_KEY", "test-key")
+
+    with StubExchangeServer(etag=etag) as server:
+        monkeypatch.setattr(ingest, "BASE_URL", server.base_url)
+        first = ingest.fetch_many(["USD", "EUR"], max_workers=2)
+        second = ingest.fetch_many(["USD", "EUR"], max_workers=2)
+        assert server.not_modified_count == (2 if etag else 0)
+
+        # Conteúdo novo volta a gerar snapshot
+        server.httpd.rates = {**server.httpd.rates, "BRL": 5.5}
+        third = ingest.fetch_many(["USD"], max_workers=1)
+
+    assert second == first
+    with open(third["USD"], "r") as f:
+        assert json.load(f)["conversion_rates"]["BRL"] == 5.5
+    assert ingest.load_fetch_state()["USD"]["raw_file"] == third["USD"]
+    assert sorted((h["base"], h["reason"]) for h in _read_heartbeats(tmp_path)) == [("EUR", reason), ("USD", reason)]
+
+
+def test_fetch_exchange_rates_waits_for_next_update(monkeypatch, tmp_path):
+    import time
+
+    monkeypatch.setattr(ingest, "RAW_DIR", str(tmp_path))
+    calls = []
+
+    class MockResponse:
+        status_code = 200
+        headers = {}
+        def json(self):
+            return {"base_code": "USD", "conversion_rates": {"USD": 1.0, "EUR": 0.9},
+                    "time_next_update_unix": int(time.time()) + 3600}
+
+    def mock_get(*args, **kwargs):
+        calls.append(kwargs)
+        return MockResponse()
+
+    monkeypatch.setattr("requests.get", mock_get)
+    first = ingest.fetch_exchange_rates(base_currency="USD")
+    assert ingest.fetch_exchange_rates(base_currency="USD") == first
+    assert len(calls) == 1  # a segunda coleta nem chega ao provedor
+    assert _read_heartbeats(tmp_path)[0]["reason"] == "not_due"
+
+    ingest.fetch_exchange_rates(base_currency="USD", force=True)
+    assert len(calls) == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2  # snapshot + estado, sem cópia nova
+
+
+def test_not_modified_refreshes_fetch_state(monkeypatch, tmp_path):
+    import time
+
+    monkeypatch.setattr(ingest, "RAW_DIR", str(tmp_path))
+    responses = []
+
+    class MockResponse:
+        def __init__(self, status_code, headers):
+            self.status_code, self.headers = status_code, headers
+        def json(self):
+            return {"base_code": "USD", "conversion_rates": {"USD": 1.0, "EUR": 0.9},
+                    "time_next_update_unix": int(time.time()) - 60}
+
+    def mock_get(*args, **kwargs):
+        responses.append(kwargs["headers"])
+        if len(responses) == 1:
+            return MockResponse(200, {"ETag": '"v1"'})
+        return MockResponse(304, {"ETag": '"v1"', "Cache-Control": "max-age=600"})
+
+    monkeypatch.setattr("requests.get", mock_get)
+    first = ingest.fetch_exchange_rates(base_currency="USD")
+    before = ingest.load_fetch_state()["USD"]
+    assert ingest.fetch_exchange_rates(base_currency="USD") == first
+    assert responses[1] == {"If-None-Match": '"v1"'}
+
+    state = ingest.load_fetch_state()["USD"]
+    assert state["checked_at"] > before["checked_at"]
+    assert state["time_next_update_unix"] >= time.time() + 590
+    # Próxima coleta espera o max-age do 304, sem chamar o provedor
+    assert ingest.fetch_exchange_rates(base_currency="USD") == first
+    assert len(responses) == 2
@@ -0,0 +1,92 @@
+import os
+import json
+import gc
+import hashlib
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from openai import AsyncOpenAI
+from src import llm_batch, llm_enrich
+from tests.fixtures.fake_openai import FakeOpenAIServer
+
+
+def _gold_history(days=40):
+    currencies = ["BRL", "EUR", "JPY", "ARS"]
+    dates = pd.date_range("2025-08-20", periods=days).strftime("%Y-%m-%d")
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        "date": np.repeat(dates, len(currencies)),
+        "base_currency": "USD",
+        "target_currency": np.tile(currencies, days),
+        "rate": np.exp(rng.normal(0, 0.01, days * len(currencies)).cumsum()),
+    })
+
+
+def test_enrich_batch_fake_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_enrich, "LOG_FILE", str(tmp_path / "prompts.log"))
+    df = _gold_history()
+    dates = ["2025-09-25", "2025-09-26", "2025-09-27"]
+    segments = {"LatAm": ["BRL", "ARS"], "G10": ["EUR", "JPY"]}
+
+    with FakeOpenAIServer(latency=0.05, reply=lambda p: f"resumo:{hashlib.md5(p.encode()).hexdigest()}") as server:
+        client = AsyncOpenAI(api_key="test", base_url=server.base_url)
+        jobs = llm_batch.build_jobs(df, dates=dates, segments=segments)
+        assert len(jobs) == 6
+
+        gc.collect()  # pausa de coleta completa (heap com pandas/pyarrow) fora da medição
+        start = time.perf_counter()
+        responses = asyncio.run(llm_batch.run_batch(jobs, client=client, max_concurrency=3, requests_per_minute=6000))
+        elapsed = time.perf_counter() - start
+
+        assert len(server.requests) == 6
+        assert server.max_in_flight <= 3
+        assert elapsed < 6 * 0.05  # chamadas simultâneas
+
+    # Ordem preservada: cada resposta corresponde ao prompt do seu job
+    assert responses == [f"resumo:{hashlib.md5(job['prompt'].encode()).hexdigest()}" for job in jobs]
+
+    paths = llm_batch.save_results(jobs, responses, base_path=tmp_path)
+    assert sorted(os.path.basename(p) for p in paths) == [f"{d}-insights.json" for d in dates]
+    with open(tmp_path / "2025-09-26-insights.json", encoding="utf-8") as f:
+        insights = json.load(f)
+    assert insights["date"] == "2025-09-26"
+    assert set(insights["segments"]) == {"LatAm", "G10"}
+    assert set(insights["segments"]["LatAm"]["top_movers"]) <= {"BRL", "ARS"}
+
+
+def test_token_bucket_limits_rate():
+    async def take(n):
+        bucket = llm_batch.TokenBucket(per_minute=600)  # 10/s, rajada inicial de 600
+        bucket.tokens = 0
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(take(3)) >= 0.25
+
+
+def test_failed_job_keeps_other_results(monkeypatch, tmp_path):
+    from tenacity import wait_none
+
+    monkeypatch.setattr(llm_enrich, "LOG_FILE", str(tmp_path / "prompts.log"))
+    monkeypatch.setattr(llm_batch, "RETRY_WAIT", wait_none())
+    jobs = llm_batch.build_jobs(_gold_history(), dates=["2025-09-25", "2025-09-26"])
+
+    def reply(prompt):
+        if prompt == jobs[0]["prompt"]:
+            raise RuntimeError("falha no endpoint")
+        return "resumo"
+
+    with FakeOpenAIServer(reply=reply) as server:
+        client = AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+        responses = asyncio.run(llm_batch.run_batch(jobs, client=client, requests_per_minute=6000))
+        assert len(server.requests) == 4  # 3 tentativas do job que falha + 1
+
+    assert responses == [None, "resumo"]
+    paths = llm_batch.save_results(jobs, responses, base_path=tmp_path)
+    assert [os.path.basename(p) for p in paths] == ["2025-09-26-insights.json"]
@@ -0,0 +1,65 @@
+import os
+import pandas as pd
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src import llm_cache, llm_enrich
+from src.llm_cache import LLMCache
+
+
+def test_cache_ttl_and_lru(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(tmp_path / "cache.sqlite", ttl_seconds=60, max_entries=2)
+
+    key = llm_cache.make_key("gpt", "prompt A", temperature=0.7)
+    assert key != llm_cache.make_key("gpt", "prompt A", temperature=0.2)
+    assert cache.get(key) is None
+    cache.set(key, "resposta A")
+    assert cache.get(key) == "resposta A"
+
+    now[0] += 1
+    cache.set("b", "resposta B")
+    now[0] += 1
+    cache.get(key)  # A passa a ser a mais recente
+    now[0] += 1
+    cache.set("c", "resposta C")  # remove B (LRU)
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    now[0] += 120
+    assert cache.get(key) is None  # expirada
+    assert cache.stats() == {"hits": 2, "misses": 3, "hit_rate": 0.4, "evictions": 1, "entries": 1}
+
+
+def test_call_llm_uses_cache(monkeypatch, tmp_path):
+    calls = []
+
+    class FakeCompletions:
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            message = type("M", (), {"content": " insight "})
+            return type("R", (), {"choices": [type("C", (), {"message": message})]})
+
+    fake_client = type("Client", (), {"chat": type("Chat", (), {"completions": FakeCompletions()})})
+    monkeypatch.setattr(llm_enrich, "client", fake_client)
+    monkeypatch.setattr(llm_enrich, "LOG_FILE", str(tmp_path / "prompts.log"))
+    cache = LLMCache(tmp_path / "cache.sqlite")
+
+    movers = pd.DataFrame({"target_currency": ["BRL"], "current_price": [5.35123], "pct_change": [1.2345], "volatility": [0.51]})
+    nearby = movers.assign(current_price=5.35119, pct_change=1.2301)
+    prompts = [llm_enrich.generate_llm_prompt(m, quantize=True) for m in (movers, nearby)]
+    assert prompts[0] == prompts[1]
+
+    assert llm_enrich.call_llm(prompts[0], "run1", cache=cache) == "insight"
+    assert llm_enrich.call_llm(prompts[1], "run2", cache=cache) == "insight"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_quantize_metrics_significant_digits():
+    df = pd.DataFrame({"current_price": [5.351234, 148.2391, 0.00123456], "pct_change": [1.26, -0.04, 3.0]})
+    out = llm_cache.quantize_metrics(df)
+    assert list(out["current_price"]) == pytest.approx([5.351, 148.2, 0.001235])
+    assert list(out["pct_change"]) == pytest.approx([1.3, -0.0, 3.0])
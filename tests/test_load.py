@@ -37,3 +37,114 @@ def test_save_to_sqlite(tmp_path):
 
     assert len(rows) == 2
     assert rows[0][0] in ("USD", "EUR")
+
+
+def _write_silver(path, rates, retrieved_at="2025-09-29T10:00:00"):
+    pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": list(rates),
+        "rate": list(rates.values()),
+        "retrieved_at": retrieved_at,
+        "date": retrieved_at[:10],
+    }).to_parquet(path, index=False)
+
+
+def test_aggregate_silver_files_incremental(monkeypatch, tmp_path):
+    silver_dir, gold_dir = tmp_path / "silver", tmp_path / "gold"
+    silver_dir.mkdir()
+    gold_dir.mkdir()
+    monkeypatch.setattr(load, "SILVER_DIR", str(silver_dir))
+    monkeypatch.setattr(load, "GOLD_DIR", str(gold_dir))
+    monkeypatch.setattr(load, "DB_URI", None)
+
+    _write_silver(silver_dir / "2025-09-29.parquet", {"BRL": 5.3, "EUR": 0.9})
+    _write_silver(silver_dir / "2025-09-28.parquet", {"BRL": 5.0}, "2025-09-28T10:00:00")
+    gold_file = load.aggregate_silver_files(date_str="2025-09-29")
+    assert len(pd.read_parquet(gold_file)) == 2
+
+    manifest = load.load_manifest()
+    assert set(manifest) == {"2025-09-29.parquet"}
+    assert manifest["2025-09-29.parquet"]["sha256"]
+
+    # Re-execução sem entradas novas não relê nem reescreve o gold
+    mtime = os.stat(gold_file).st_mtime_ns
+    real_read_parquet = pd.read_parquet
+    reads = []
+    monkeypatch.setattr(load.pd, "read_parquet", lambda *a, **k: reads.append(a) or real_read_parquet(*a, **k))
+    assert load.aggregate_silver_files(date_str="2025-09-29") == gold_file
+    assert reads == []
+    assert os.stat(gold_file).st_mtime_ns == mtime
+
+    # Novo snapshot intradiário é mesclado ao gold existente
+    _write_silver(silver_dir / "2025-09-29_120000.parquet", {"BRL": 5.4, "JPY": 148.0}, "2025-09-29T12:00:00")
+    load.aggregate_silver_files(date_str="2025-09-29")
+    gold = pd.read_parquet(gold_file).set_index("target_currency")
+    assert sorted(gold.index) == ["BRL", "EUR", "JPY"]
+    assert gold.loc["BRL", "rate"] == 5.4
+    assert set(load.load_manifest()) == {"2025-09-29.parquet", "2025-09-29_120000.parquet"}
+    assert len(reads) == 3  # só o arquivo novo + o gold atual (+ leitura de verificação)
+
+
+def test_aggregate_silver_files_newest_snapshot_wins(monkeypatch, tmp_path):
+    silver_dir, gold_dir = tmp_path / "silver", tmp_path / "gold"
+    silver_dir.mkdir()
+    monkeypatch.setattr(load, "SILVER_DIR", str(silver_dir))
+    monkeypatch.setattr(load, "GOLD_DIR", str(gold_dir))
+    monkeypatch.setattr(load, "DB_URI", None)
+
+    # O arquivo por data ordena antes do intradiário, mas tem a coleta mais nova
+    _write_silver(silver_dir / "2025-09-29.parquet", {"BRL": 5.4}, "2025-09-29T12:00:00")
+    _write_silver(silver_dir / "2025-09-29_100000.parquet", {"BRL": 5.3, "EUR": 0.9}, "2025-09-29T10:00:00")
+    gold_file = load.aggregate_silver_files(date_str="2025-09-29")
+    gold = pd.read_parquet(gold_file).set_index("target_currency")
+    assert gold.loc["BRL", "rate"] == 5.4
+    assert gold.loc["BRL", "retrieved_at"] == 1759147200  # epoch em segundos
+
+    # Retransformação tardia de uma coleta antiga não sobrescreve a mais nova do gold
+    _write_silver(silver_dir / "2025-09-29_100000.parquet", {"BRL": 5.25, "EUR": 0.9}, "2025-09-29T10:00:00")
+    load.aggregate_silver_files(date_str="2025-09-29")
+    assert pd.read_parquet(gold_file).set_index("target_currency").loc["BRL", "rate"] == 5.4
+
+
+def _gold_rows(date_str, rates, run_id="r1"):
+    return pd.DataFrame({
+        "base_currency": "USD",
+        "target_currency": list(rates),
+        "rate": list(rates.values()),
+        "retrieved_at": 1759104001,
+        "date": date_str,
+        "run_id": run_id,
+        "pipeline_version": "1.0",
+    })
+
+
+def test_bulk_upsert_sqlite(tmp_path):
+    dbfile = tmp_path / "rates.db"
+    # Tabela legada sem chave única e com duplicatas
+    load.save_to_sqlite(_gold_rows("2025-09-29", {"BRL": 5.0, "EUR": 0.9}), dbfile, "exchange_rates")
+    load.save_to_sqlite(_gold_rows("2025-09-29", {"BRL": 5.1}), dbfile, "exchange_rates")
+
+    db_uri = f"sqlite:///{dbfile}"
+    assert load.bulk_upsert(_gold_rows("2025-09-29", {"BRL": 5.2, "JPY": 148.0}, "r2"), db_uri) == 2
+    assert load.get_engine(db_uri) is load.get_engine(db_uri)
+
+    conn = sqlite3.connect(dbfile)
+    rows = dict(conn.execute("SELECT target_currency, rate FROM exchange_rates").fetchall())
+    indexes = [r[1] for r in conn.execute("PRAGMA index_list('exchange_rates')").fetchall()]
+    conn.close()
+
+    assert rows == {"BRL": 5.2, "EUR": 0.9, "JPY": 148.0}
+    assert "ux_exchange_rates_key" in indexes
+
+
+def test_bulk_upsert_keeps_lineage_of_unchanged_rows(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'rates.db'}"
+    load.bulk_upsert(_gold_rows("2025-09-29", {"BRL": 5.0, "EUR": 0.9}, "r1"), db_uri)
+    # Gold reescrito por r2 (ex.: compacto, com o último run_id em todas as linhas): só BRL mudou
+    load.bulk_upsert(_gold_rows("2025-09-29", {"BRL": 5.1, "EUR": 0.9}, "r2"), db_uri)
+
+    conn = sqlite3.connect(tmp_path / "rates.db")
+    rows = {c: (rate, run_id) for c, rate, run_id in conn.execute(
+        "SELECT target_currency, rate, run_id FROM exchange_rates")}
+    conn.close()
+    assert rows == {"BRL": (5.1, "r2"), "EUR": (0.9, "r1")}
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from src import logging_config
+from src.logging_config import span, current_span, start_profiling, stop_profiling
+
+
+def test_span_nesting_and_rows():
+    with span("stage") as outer:
+        with span("read") as inner:
+            inner.add(rows_out=10, bytes_read=1024)
+        assert current_span() is outer
+        outer.add(rows_in=10, rows_out=8)
+    assert current_span() is None
+
+    assert inner.record["span"] == "stage/read"
+    assert inner.record["bytes_read"] == 1024
+    assert outer.record["rows_out"] == 8
+    assert outer.record["wall_seconds"] >= inner.record["wall_seconds"]
+    assert outer.record["cpu_seconds"] >= 0
+    assert outer.record["status"] == "ok"
+
+
+def test_span_decorator_creates_fresh_span():
+    @span("step")
+    def work(n):
+        current_span().add(rows_out=n)
+        return current_span()
+
+    first, second = work(3), work(5)
+    assert first is not second
+    assert (first.record["rows_out"], second.record["rows_out"]) == (3, 5)
+
+
+def test_profiling_outputs(tmp_path):
+    profiler = start_profiling("run-test", out_dir=str(tmp_path))
+    with span("pipeline"):
+        with span("load") as s:
+            data = [bytearray(1024) for _ in range(100)]
+            s.add(rows_out=len(data))
+    stop_profiling()
+    assert logging_config._profiler is None
+
+    records = [json.loads(line) for line in open(profiler.jsonl_file)]
+    spans = {r["span"]: r for r in records if r["span"] != "tracemalloc_top"}
+    assert set(spans) == {"pipeline", "pipeline/load"}
+    assert spans["pipeline/load"]["python_peak_bytes"] >= 100 * 1024
+    assert spans["pipeline"]["python_peak_bytes"] >= spans["pipeline/load"]["python_peak_bytes"]
+    assert any(r["span"] == "tracemalloc_top" for r in records)
+
+    prom = open(profiler.prom_file).read()
+    assert '# TYPE pipeline_span_wall_seconds gauge' in prom
+    assert 'pipeline_span_rows_out{run_id="run-test",span="pipeline/load"} 100' in prom
+    assert os.path.getsize(profiler.pstats_file) > 0
+
+
+def test_async_writer_batches_and_never_blocks(tmp_path):
+    writer = logging_config.AsyncLogWriter(batch_size=10, flush_interval=0.01, max_queue=1000)
+    target = str(tmp_path / "sub" / "app.log")
+    for i in range(25):
+        writer.write(target, json.dumps({"i": i}))
+    writer.flush()
+    lines = [json.loads(line)["i"] for line in open(target).read().splitlines()]
+    assert lines == list(range(25))
+    writer.close()
+
+    full = logging_config.AsyncLogWriter(batch_size=1, max_queue=1)
+    release = threading.Event()
+    full._flush = lambda batch: release.wait()
+    full.write(target, "a")
+    while not full.queue.empty():  # thread parada gravando "a"
+        time.sleep(0.001)
+    full.write(target, "b")
+    full.write(target, "c")  # fila cheia: descarta em vez de esperar
+    assert full.dropped == 1
+    release.set()
+    full.close()
+
+
+def test_async_writer_after_close(capsys, tmp_path):
+    writer = logging_config.AsyncLogWriter(flush_interval=0.01)
+    handler = logging_config.AsyncLogHandler(str(tmp_path / "app.log"), writer=writer)
+    writer.dropped = 2
+    writer.close()
+    assert '"dropped":2' in capsys.readouterr().err
+
+    # Como no logging.shutdown depois do atexit: emit descarta e flush não trava
+    handler.emit(logging.LogRecord("x", logging.INFO, __file__, 1, "depois do close", None, None))
+    handler.flush()
+    assert writer.dropped == 3
+
+
+def test_sampling_drops_noisy_events(monkeypatch):
+    import pytest
+    import structlog
+
+    monkeypatch.setattr(logging_config, "SAMPLE_RATES", {"noisy": 0.25})
+    monkeypatch.setattr(logging_config, "_sample_counters", {})
+    kept = []
+    for _ in range(8):
+        try:
+            kept.append(logging_config.sample_events(None, "info", {"event": "noisy"}))
+        except structlog.DropEvent:
+            pass
+    assert len(kept) == 2 and kept[0]["sample_rate"] == 0.25
+    assert logging_config.sample_events(None, "warning", {"event": "noisy"})["event"] == "noisy"
+    assert logging_config.sample_events(None, "info", {"event": "other"}) == {"event": "other"}
+    logging_config.sample_events(None, "info", {"event": "noisy"})  # 9º evento: mantido
+    with pytest.raises(structlog.DropEvent):
+        logging_config.sample_events(None, "info", {"event": "noisy"})
+
+
+def test_log_prompt_uses_background_writer(monkeypatch, tmp_path):
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    from src import llm_enrich
+
+    monkeypatch.setattr(llm_enrich, "LOG_FILE", str(tmp_path / "prompts.log"))
+    llm_enrich.log_prompt("resumo do dia", run_id="r1")
+    logging_config.get_writer().flush()
+    entry = json.loads((tmp_path / "prompts.log").read_text())
+    assert entry["run_id"] == "r1" and entry["prompt"] == "resumo do dia"
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import metrics
+
+
+def _history(currencies, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=days).strftime("%Y-%m-%d")
+    rates = np.exp(np.cumsum(rng.normal(0, 0.01, (days, len(currencies))), axis=0))
+    return pd.DataFrame({
+        "date": np.repeat(dates, len(currencies)),
+        "base_currency": "USD",
+        "target_currency": np.tile(currencies, days),
+        "rate": rates.ravel(),
+    })
+
+
+def _legacy_volatility(df, N):
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    return df.groupby("target_currency").apply(
+        lambda x: x.sort_values("date").tail(N)["rate"].pct_change().std() * 100
+    )
+
+
+def test_pct_change_simple_numbers():
+    df = pd.DataFrame({
+        "date": ["2025-08-01", "2025-08-15", "2025-09-29", "2025-08-01", "2025-08-15", "2025-09-29"],
+        "target_currency": ["BRL", "BRL", "BRL", "EUR", "EUR", "EUR"],
+        "rate": [5.0, 5.0, 5.5, 1.0, 1.0, 0.9],
+    })
+    result = metrics.compute_metrics(df, windows=(3,)).set_index("target_currency")
+    assert result.loc["BRL", "pct_change"] == pytest.approx(10.0)
+    assert result.loc["EUR", "pct_change"] == pytest.approx(-10.0)
+    assert result.loc["BRL", "pct_change_3d"] == pytest.approx(10.0)
+    assert result.loc["EUR", "drawdown_3d"] == pytest.approx(-10.0)
+
+
+def test_compute_metrics_matches_legacy_and_is_pure():
+    df = _history(["BRL", "EUR", "JPY"], 120)
+    before = df.copy()
+    result = metrics.compute_metrics(df, windows=(7, 30, 90)).set_index("target_currency")
+
+    pd.testing.assert_frame_equal(df, before)
+    for w in (7, 30, 90):
+        expected = _legacy_volatility(df, w)
+        np.testing.assert_allclose(result[f"volatility_{w}d"], expected.loc[result.index])
+        assert {f"pct_change_{w}d", f"drawdown_{w}d", f"zscore_{w}d"} <= set(result.columns)
+    assert (result["drawdown_90d"] <= 0).all()
+
+
+def test_compute_metrics_scale():
+    df = _history([f"C{i:03d}" for i in range(160)], 3 * 365)
+    # O tempo desta escala é medido em benchmarks/bench_suite.py (escala "history")
+    result = metrics.compute_metrics(df)
+    assert len(result) == 160
+    assert result["volatility_30d"].notna().all()
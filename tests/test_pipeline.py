@@ -0,0 +1,87 @@
+import json
+import threading
+import pytest
+
+from src.pipeline import Pipeline, Stage, raw_payload_digest
+
+
+def _pipeline(tmp_path, calls, fail=None, payload=None, parallel=True):
+    raw_file, out_file = tmp_path / "raw.json", tmp_path / "out.txt"
+    barrier = threading.Barrier(2, timeout=5)
+
+    def source(results, run_id):
+        calls.append("source")
+        raw_file.write_text(json.dumps({**(payload or {"rates": 1}), "_metadata": {"timestamp": run_id}}))
+        return {"outputs": [str(raw_file)]}
+
+    def build(results, run_id):
+        calls.append("build")
+        out_file.write_text(raw_file.read_text())
+        return {"outputs": [str(out_file)]}
+
+    def side(name):
+        def func(results, run_id):
+            calls.append(name)
+            if parallel:
+                barrier.wait()  # só passa se as duas etapas rodarem ao mesmo tempo
+            if fail == name:
+                raise RuntimeError("falhou")
+            return {"outputs": []}
+        return func
+
+    return Pipeline([
+        Stage("source", source),
+        Stage("build", build, deps=["source"], inputs=lambda r: r["source"]["outputs"],
+              fingerprint=raw_payload_digest),
+        Stage("a", side("a"), deps=["build"], inputs=lambda r: r["build"]["outputs"]),
+        Stage("b", side("b"), deps=["build"], inputs=lambda r: r["build"]["outputs"]),
+    ], state_file=str(tmp_path / "state.json"))
+
+
+def test_pipeline_skips_unchanged_inputs(tmp_path):
+    calls = []
+    _pipeline(tmp_path, calls).run("run1")
+    assert sorted(calls) == ["a", "b", "build", "source"]
+
+    # Mesmo payload (só _metadata muda): apenas a fonte executa
+    calls.clear()
+    _pipeline(tmp_path, calls).run("run2")
+    assert calls == ["source"]
+
+    calls.clear()
+    _pipeline(tmp_path, calls, payload={"rates": 2}).run("run3")
+    assert sorted(calls) == ["a", "b", "build", "source"]
+
+
+def test_pipeline_resumes_failed_stage(tmp_path):
+    calls = []
+    with pytest.raises(RuntimeError):
+        _pipeline(tmp_path, calls, fail="b").run("run1")
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert state["last_run"] == {**state["last_run"], "status": "failed", "failed_stage": "b"}
+
+    # Retomada: nem a fonte é refeita, só a etapa que falhou
+    calls.clear()
+    results = _pipeline(tmp_path, calls, parallel=False).run("run2")
+    assert calls == ["b"]
+    assert set(results) == {"source", "build", "a", "b"}
+    assert json.loads((tmp_path / "state.json").read_text())["last_run"]["status"] == "ok"
+
+
+def test_pipeline_rejects_unknown_dependency(tmp_path):
+    pipeline = Pipeline([Stage("x", lambda r, run_id: {}, deps=["y"])], state_file=str(tmp_path / "s.json"))
+    with pytest.raises(ValueError):
+        pipeline.levels()
+
+
+def test_main_keeps_original_error_when_pipeline_span_fails(monkeypatch):
+    import main
+    from src.logging_config import Span
+
+    class BrokenSpan(Span):
+        def __enter__(self):
+            raise RuntimeError("profiler quebrado")
+
+    monkeypatch.setattr(main, "span", lambda name, logger=None: BrokenSpan(name, logger))
+    with pytest.raises(RuntimeError, match="profiler quebrado"):
+        main.main(run_id="test")
@@ -0,0 +1,100 @@
+import pandas as pd
+
+from src import prompt_builder
+from src.prompt_builder import build_prompt, count_tokens
+
+
+def _metrics(n):
+    return pd.DataFrame({
+        "target_currency": [f"C{i:02d}" for i in range(n)],
+        "current_price": [5.353412 + i for i in range(n)],
+        "pct_change": [float(i) - n / 2 for i in range(n)],
+        "volatility": [0.123456] * n,
+    })
+
+
+def test_compact_prompt_fits_budget_and_drops_least_significant():
+    metrics = _metrics(40)
+    full = build_prompt(metrics, token_budget=10_000)
+    assert len(full.included) == 40
+    assert full.included[0] == "C00"  # maior |pct_change|
+    assert "C00|5.353|-20.00|0.12" in full.text
+
+    small = build_prompt(metrics, token_budget=full.tokens // 2)
+    assert small.tokens <= full.tokens // 2
+    assert 0 < len(small.included) < 40
+    assert small.included == full.included[:len(small.included)]
+    assert set(small.dropped) == set(full.included[len(small.included):])
+    # Nenhuma linha cortada no meio: todas as linhas de dados têm 4 campos
+    table = small.text[len(prompt_builder.PROMPT_HEADER):-len(prompt_builder.PROMPT_FOOTER)]
+    assert all(len(line.split("|")) == 4 for line in table.splitlines())
+
+
+def test_shrink_halves_budget_until_one_row():
+    prompt = build_prompt(_metrics(20), token_budget=10_000)
+    sizes = []
+    while prompt is not None:
+        sizes.append(len(prompt.included))
+        prompt = prompt.shrink()
+    assert sizes[0] == 20 and sizes[-1] == 1
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_count_tokens_fallback(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "tiktoken", None)
+    assert count_tokens("abcdef") == 2
+
+
+def test_call_llm_retries_empty_answer_with_smaller_prompt(monkeypatch, tmp_path):
+    import os
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    from src import llm_enrich
+
+    prompts = []
+
+    class FakeCompletions:
+        def create(self, **kwargs):
+            prompts.append(kwargs["messages"][0]["content"])
+            content = "" if len(prompts) == 1 else "ok"
+            message = type("M", (), {"content": content})
+            usage = type("U", (), {"prompt_tokens": 10, "completion_tokens": 1})
+            return type("R", (), {"choices": [type("C", (), {"message": message})], "usage": usage})
+
+    fake_client = type("Client", (), {"chat": type("Chat", (), {"completions": FakeCompletions()})})
+    monkeypatch.setattr(llm_enrich, "client", fake_client)
+    monkeypatch.setattr(llm_enrich, "LOG_FILE", str(tmp_path / "prompts.log"))
+
+    prompt = build_prompt(_metrics(20), token_budget=10_000)
+    assert llm_enrich.call_llm(prompt, "run1") == "ok"
+    assert prompts[0] == prompt.text
+    assert prompts[1] == prompt.shrink().text
+    assert len(prompts[1]) < len(prompts[0])
+
+
+def test_call_llm_empty_answer_does_not_nest_retries(monkeypatch, tmp_path):
+    import os
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    import pytest
+    from tenacity import RetryError
+    from src import llm_enrich
+
+    prompts = []
+
+    class FakeCompletions:
+        def create(self, **kwargs):
+            prompts.append(kwargs["messages"][0]["content"])
+            if len(prompts) > 1:
+                raise ConnectionError("api fora do ar")
+            message = type("M", (), {"content": ""})
+            return type("R", (), {"choices": [type("C", (), {"message": message})]})
+
+    fake_client = type("Client", (), {"chat": type("Chat", (), {"completions": FakeCompletions()})})
+    monkeypatch.setattr(llm_enrich, "client", fake_client)
+    monkeypatch.setattr(llm_enrich, "LOG_FILE", str(tmp_path / "prompts.log"))
+    monkeypatch.setattr(llm_enrich._complete.retry, "sleep", lambda seconds: None)
+
+    prompt = build_prompt(_metrics(20), token_budget=10_000)
+    with pytest.raises(RetryError):
+        llm_enrich.call_llm(prompt, "run1")
+    # 1 resposta vazia + 3 tentativas com o prompt reduzido (sem retry aninhado)
+    assert prompts == [prompt.text] + [prompt.shrink().text] * 3
@@ -0,0 +1,65 @@
+import json
+import pandas as pd
+
+from src import raw_archive, ingest, transform
+
+
+def _snapshot(timestamp, base="USD", brl=5.0):
+    return {
+        "base_code": base,
+        "conversion_rates": {"USD": 1.0, "BRL": brl, "EUR": 0.9} if base == "USD" else {"USD": 1.1, base: 1.0},
+        "_metadata": {"timestamp": timestamp, "status_code": 200, "url": "fake_url"},
+    }
+
+
+def test_append_and_read_range(tmp_path):
+    refs = [
+        raw_archive.append_snapshot(_snapshot(f"2025-09-29T{h:02d}:00:00", brl=5.0 + h / 100), archive_dir=tmp_path)
+        for h in range(24)
+    ]
+    raw_archive.append_snapshot(_snapshot("2025-09-29T12:00:00", base="EUR"), archive_dir=tmp_path)
+    raw_archive.append_snapshot(_snapshot("2025-09-30T01:00:00"), archive_dir=tmp_path)
+
+    # Um segmento + um índice por dia
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.endswith(".lock")) == [
+        "2025-09-29.idx", "2025-09-29.ndjson.zst", "2025-09-30.idx", "2025-09-30.ndjson.zst",
+    ]
+    assert raw_archive.read_snapshot(refs[3])["conversion_rates"]["BRL"] == 5.03
+
+    found = list(raw_archive.iter_range("2025-09-29T10:00:00", "2025-09-29T12:00:00", bases=["USD"],
+                                        archive_dir=tmp_path))
+    assert [s["_metadata"]["timestamp"][11:13] for s in found] == ["10", "11", "12"]
+    assert len(list(raw_archive.iter_range("2025-09-29T23:00:00", None, archive_dir=tmp_path))) == 2
+
+
+def test_torn_write_is_ignored_and_repaired(tmp_path):
+    raw_archive.append_snapshot(_snapshot("2025-09-29T01:00:00"), archive_dir=tmp_path)
+    segment, index_file = raw_archive.segment_paths("2025-09-29", tmp_path)
+
+    # Escrita interrompida: lixo no segmento e linha de índice incompleta
+    with open(segment, "ab") as f:
+        f.write(b"\x00garbage")
+    with open(index_file, "ab") as f:
+        f.write(b'{"ts": 1')
+    assert len(list(raw_archive.iter_segment(segment))) == 1
+
+    ref = raw_archive.append_snapshot(_snapshot("2025-09-29T02:00:00", brl=6.0), archive_dir=tmp_path)
+    assert [s["conversion_rates"]["BRL"] for s in raw_archive.iter_segment(segment)] == [5.0, 6.0]
+    assert raw_archive.read_snapshot(ref)["conversion_rates"]["BRL"] == 6.0
+
+
+def test_ingest_archive_mode_and_transform(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, "RAW_STORAGE", "archive")
+    monkeypatch.setattr(raw_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    for h in (8, 12, 16):
+        ingest._save_raw(_snapshot(f"2025-09-29T{h:02d}:00:00"), "USD")
+
+    df = ingest.load_local_file(str(tmp_path / "archive"), start="2025-09-29T09:00:00")
+    assert len(df) == 2 * 3
+    assert set(df["retrieved_at"]) == {"2025-09-29T12:00:00", "2025-09-29T16:00:00"}
+
+    silver_files = transform.transform_archive("2025-09-29T00:00:00", "2025-09-29T23:59:59",
+                                               silver_dir=tmp_path / "silver", rejects_dir=tmp_path / "rejects")
+    silver = pd.read_parquet(silver_files[0])
+    assert len(silver) == 9
+    assert silver["retrieved_at"].nunique() == 3
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import metrics
+from src.rolling_state import RollingState, update_state
+
+
+def _history(currencies, days, seed=1):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-06-01", periods=days).strftime("%Y-%m-%d")
+    rates = np.exp(np.cumsum(rng.normal(0, 0.01, (days, len(currencies))), axis=0))
+    return pd.DataFrame({
+        "date": np.repeat(dates, len(currencies)),
+        "target_currency": np.tile(currencies, days),
+        "rate": rates.ravel(),
+    })
+
+
+def test_state_metrics_match_full_recompute(tmp_path):
+    df = _history(["BRL", "EUR", "JPY"], 150)
+    state = RollingState.from_history(df, capacity=90)
+    assert len(state.dates) == 90
+
+    expected = metrics.compute_metrics(df).set_index("target_currency")
+    result = state.metrics().set_index("target_currency")
+    for col in expected.columns:
+        np.testing.assert_allclose(result[col], expected[col], err_msg=col)
+
+    wide = metrics.to_wide(df)
+    returns = wide.pct_change(fill_method=None)
+    np.testing.assert_allclose(result["volatility_all"], returns.std() * 100)
+
+    path = tmp_path / "state.npz"
+    state.save(path)
+    restored = RollingState.load(path)
+    pd.testing.assert_frame_equal(restored.metrics(), state.metrics())
+
+
+def test_incremental_update_and_same_day_replace(tmp_path):
+    df = _history(["BRL", "EUR"], 40)
+    last_date = df["date"].max()
+    path = tmp_path / "state.npz"
+
+    update_state(df[df["date"] < last_date], path=path)
+    wrong = df[df["date"] == last_date].assign(rate=99.0)
+    update_state(wrong, path=path)
+    # Novo snapshot do mesmo dia substitui o anterior; datas antigas são ignoradas
+    state = update_state(df[df["date"] >= df["date"].unique()[-2]], path=path)
+
+    expected = RollingState.from_history(df).metrics()
+    pd.testing.assert_frame_equal(state.metrics(), expected)
+    assert state.metrics().loc[0, "current_price"] == pytest.approx(df[df["date"] == last_date]["rate"].iloc[0])
+
+
+def test_new_currency_is_added():
+    df = _history(["BRL"], 5)
+    state = RollingState.from_history(df)
+    state.update(pd.DataFrame({"date": ["2025-06-06"] * 2, "target_currency": ["BRL", "GBP"], "rate": [5.0, 0.8]}))
+    assert list(state.codes) == ["BRL", "GBP"]
+    assert state.metrics().set_index("target_currency").loc["GBP", "current_price"] == 0.8
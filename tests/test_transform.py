@@ -14,7 +14,9 @@ def test_transform_file(tmp_path):
     }
     test_file.write_text(json.dumps(data))
 
-    silver_file = transform.transform_file(str(test_file))
+    silver_file = transform.transform_file(
+        str(test_file), silver_dir=tmp_path / "silver", rejects_dir=tmp_path / "rejects"
+    )
     df = pd.read_parquet(silver_file)
 
  
@@ -23,3 +25,49 @@ def test_transform_file(tmp_path):
     assert df["rate"].notnull().all()
     assert (df["rate"] > 0).all()
     assert "JPY" not in df["target_currency"].values  # taxa nula removida
+
+
+def _write_snapshot(path, timestamp, rates):
+    data = {
+        "base_code": "USD",
+        "conversion_rates": rates,
+        "_metadata": {"timestamp": timestamp, "status_code": 200, "url": "fake_url"}
+    }
+    path.write_text(json.dumps(data))
+    return path
+
+
+def test_transform_files_batches_and_rejects(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    files = [
+        _write_snapshot(raw_dir / "2025-09-28.json", "2025-09-28T10:00:00", {"USD": 1, "BRL": 5.3, "EUR": 0}),
+        _write_snapshot(raw_dir / "2025-09-29.json", "2025-09-29T10:00:00", {"USD": 1, "BRL": 5.35123456}),
+        _write_snapshot(raw_dir / "2025-09-29_120000.json", "2025-09-29T12:00:00", {"USD": 1, "BRL": None}),
+    ]
+
+    # Silver por snapshot do pipeline (transform_file): o lote do dia o substitui
+    transform.transform_file(str(files[1]), silver_dir=tmp_path / "silver", rejects_dir=tmp_path / "rejects")
+
+    silver_files = transform.transform_files(
+        files, batch_size=2, silver_dir=tmp_path / "silver", rejects_dir=tmp_path / "rejects"
+    )
+    assert sorted(f.name for f in silver_files) == ["2025-09-28.batch.parquet", "2025-09-29.batch.parquet"]
+    assert sorted(f.name for f in (tmp_path / "silver").iterdir()) == ["2025-09-28.batch.parquet", "2025-09-29.batch.parquet"]
+
+    df = pd.read_parquet(tmp_path / "silver" / "2025-09-29.batch.parquet")
+    assert len(df) == 3
+    assert (df["date"] == "2025-09-29").all()
+    assert df.loc[df["target_currency"] == "BRL", "rate"].iloc[0] == 5.351235
+
+    rejects = json.loads((tmp_path / "rejects" / "2025-09-29_rejects.json").read_text())
+    assert [(r["target_currency"], r["rate"], r["reason"]) for r in rejects] == [("BRL", None, "Rate inválida")]
+    rejects = json.loads((tmp_path / "rejects" / "2025-09-28_rejects.json").read_text())
+    assert rejects[0]["target_currency"] == "EUR"
+
+
+def test_clean_data_list_format():
+    df = pd.DataFrame({"currency": ["USD", "EUR", "JPY"], "rate": [1.0, -1.0, None]})
+    clean = transform.clean_data(df)
+    assert list(clean["target_currency"]) == ["USD"]
+    assert (clean["base_currency"] == "USD").all()
@@ -14,7 +14,9 @@ def test_transform_file(tmp_path):
     }
     test_file.write_text(json.dumps(data))
 
-    silver_file = transform.transform_file(str(test_file))
+    silver_file = transform.transform_file(
+        str(test_file), silver_dir=tmp_path / "silver", rejects_dir=tmp_path / "rejects"
+    )
     df = pd.read_parquet(silver_file)
 
    